@@ -0,0 +1 @@
+from .fake_docker import FakeDockerDaemon, FakeDockerState, FakeDockerError
@@ -0,0 +1,561 @@
+from collections import Counter
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import urlsplit, parse_qs, unquote
+import socketserver
+import threading
+import hashlib
+import random
+import queue
+import json
+import time
+import re
+
+API_VERSION = "1.45"
+
+# the API version prefix is optional, e.g. `/v1.45/containers/json` or `/containers/json`
+VERSION_PREFIX = re.compile(r"^/v\d+\.\d+")
+
+ROUTES = [
+    ("GET", re.compile(r"^/_ping$"), "ping"),
+    ("GET", re.compile(r"^/version$"), "version"),
+    ("GET", re.compile(r"^/events$"), "events"),
+    ("GET", re.compile(r"^/containers/json$"), "list_containers"),
+    ("POST", re.compile(r"^/containers/create$"), "create_container"),
+    ("GET", re.compile(r"^/containers/(?P<ref>[^/]+)/json$"), "inspect_container"),
+    ("POST", re.compile(r"^/containers/(?P<ref>[^/]+)/(?P<action>start|stop|restart|pause|unpause|kill)$"), "container_action"),
+    ("DELETE", re.compile(r"^/containers/(?P<ref>[^/]+)$"), "remove_container"),
+    ("GET", re.compile(r"^/images/json$"), "list_images"),
+    ("POST", re.compile(r"^/images/create$"), "pull_image"),
+    ("GET", re.compile(r"^/images/(?P<ref>.+)/json$"), "inspect_image"),
+    ("DELETE", re.compile(r"^/images/(?P<ref>.+)$"), "remove_image"),
+]
+
+# endpoints a client needs to connect at all, never delayed or failed
+HANDSHAKE = {"ping", "version"}
+
+ACTION_STATES = {
+    "start": "running",
+    "restart": "running",
+    "unpause": "running",
+    "pause": "paused",
+    "stop": "exited",
+    "kill": "exited",
+}
+
+def image_reference(reference: str) -> str:
+    """
+    Complete an image reference with the `latest` tag if it has none.
+
+    :param reference: The image reference, e.g. `nextcloud`.
+    :return: The complete reference, e.g. `nextcloud:latest`.
+    """
+    if "@" not in reference and ":" not in reference.rsplit("/", 1)[-1]:
+        return f"{reference}:latest"
+    return reference
+
+def make_id(value: str) -> str:
+    """
+    Derive a stable 64 character ID, the way Docker formats container and image IDs.
+
+    :param value: The value to derive the ID from.
+    :return: The ID.
+    """
+    return hashlib.sha256(value.encode()).hexdigest()
+
+class FakeDockerError(Exception):
+    """
+    Error answered to the client with a status code and a JSON message, like the Docker daemon does.
+    """
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class FakeDockerState:
+    """
+    In-memory containers and images of the fake daemon.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.containers: dict[str, dict[str, Any]] = {}
+        self.images: dict[str, dict[str, Any]] = {}
+        self._subscribers: list[queue.Queue] = []
+
+    def subscribe(self) -> queue.Queue:
+        """
+        Subscribe to events.
+
+        :return: A queue receiving every event from now on.
+        """
+        subscriber = queue.Queue()
+        with self.lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        """
+        Stop receiving events.
+
+        :param subscriber: The queue returned by `subscribe`.
+        """
+        with self.lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def emit(self, kind: str, action: str, actor_id: str, attributes: dict[str, str]) -> None:
+        """
+        Send an event to all subscribers. Must be called with the lock held.
+
+        :param kind: The type of the event, `container` or `image`.
+        :param action: The action, e.g. `start`.
+        :param actor_id: The ID of the container or image.
+        :param attributes: The attributes of the actor, e.g. its name.
+        """
+        now = time.time()
+        event = {
+            "Type": kind,
+            "Action": action,
+            "Actor": {"ID": actor_id, "Attributes": attributes},
+            "time": int(now),
+            "timeNano": int(now * 1e9),
+        }
+        for subscriber in self._subscribers:
+            subscriber.put(event)
+
+    def add_image(self, reference: str, size: int = 100 * 1024 ** 2) -> dict[str, Any]:
+        """
+        Add an image, as if it had been pulled.
+
+        :param reference: The image reference.
+        :param size: The size of the image in bytes.
+        :return: The image.
+        """
+        reference = image_reference(reference)
+        with self.lock:
+            image = self.images.setdefault(reference, {"Id": f"sha256:{make_id(reference)}", "RepoTags": [reference], "RepoDigests": [], "Size": size})
+            self.emit("image", "pull", image["Id"], {"name": reference})
+        return image
+
+    def add_container(self, name: str, image: str, state: str = "created", health: Optional[str] = None,
+                      labels: Optional[dict[str, str]] = None) -> dict[str, Any]:
+        """
+        Add a container.
+
+        :param name: The name of the container.
+        :param image: The image reference of the container.
+        :param state: The state of the container, e.g. `running`.
+        :param health: The health of the container, or None if it has no healthcheck.
+        :param labels: The labels of the container.
+        :raises FakeDockerError: if a container of that name exists.
+        :return: The container.
+        """
+        with self.lock:
+            if name in self.containers:
+                raise FakeDockerError(409, f"Conflict. The container name \"/{name}\" is already in use.")
+            container = {
+                "Id": make_id(f"{name}-{time.time_ns()}"),
+                "Name": name,
+                "Image": image_reference(image),
+                "State": state,
+                "Health": health,
+                "Labels": labels or {},
+                "Created": int(time.time()),
+            }
+            self.containers[name] = container
+            self.emit("container", "create", container["Id"], {"name": name, "image": container["Image"]})
+        return container
+
+    def container(self, ref: str) -> dict[str, Any]:
+        """
+        Look up a container by name, ID or unique ID prefix. Must be called with the lock held.
+
+        :param ref: The name or ID of the container.
+        :raises FakeDockerError: if there is no such container.
+        :return: The container.
+        """
+        ref = ref.lstrip("/")
+        if ref in self.containers:
+            return self.containers[ref]
+        matches = [container for container in self.containers.values() if container["Id"].startswith(ref)]
+        if len(matches) != 1:
+            raise FakeDockerError(404, f"No such container: {ref}")
+        return matches[0]
+
+    def image(self, ref: str) -> dict[str, Any]:
+        """
+        Look up an image by reference or ID. Must be called with the lock held.
+
+        :param ref: The reference or ID of the image.
+        :raises FakeDockerError: if there is no such image.
+        :return: The image.
+        """
+        for prefix in ("docker.io/library/", "docker.io/"):
+            ref = ref.removeprefix(prefix)
+        reference = image_reference(ref)
+        if reference in self.images:
+            return self.images[reference]
+        for image in self.images.values():
+            if image["Id"] == ref or image["Id"].removeprefix("sha256:").startswith(ref.removeprefix("sha256:")):
+                return image
+        raise FakeDockerError(404, f"No such image: {ref}")
+
+    def set_state(self, container: dict[str, Any], action: str) -> None:
+        """
+        Apply a lifecycle action to a container and emit its events. Must be called with the lock held.
+
+        :param container: The container.
+        :param action: The action, e.g. `start`.
+        :raises FakeDockerError: if the action is not possible in the state of the container.
+        """
+        state = container["State"]
+        if action in ("pause", "unpause", "kill") and state not in ("running", "paused"):
+            raise FakeDockerError(409, f"Container {container['Id']} is not running")
+        attributes = {"name": container["Name"], "image": container["Image"]}
+        if action in ("stop", "kill", "restart") and state in ("running", "paused"):
+            self.emit("container", "kill", container["Id"], attributes)
+            self.emit("container", "die", container["Id"], {**attributes, "exitCode": "0"})
+        container["State"] = ACTION_STATES[action]
+        if action != "kill":
+            self.emit("container", action, container["Id"], attributes)
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    """
+    Answers Docker Engine API requests from the state of the fake daemon.
+    """
+    protocol_version = "HTTP/1.1"
+    server: "FakeDockerServer"
+
+    def log_message(self, format: str, *args) -> None:
+        # client addresses of Unix sockets cannot be formatted, and the output is not wanted anyway
+        pass
+
+    def do_GET(self) -> None:
+        self._dispatch()
+
+    def do_POST(self) -> None:
+        self._dispatch()
+
+    def do_DELETE(self) -> None:
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """
+        Route a request to its endpoint, injecting latency and failures as configured.
+        """
+        url = urlsplit(self.path)
+        path = VERSION_PREFIX.sub("", unquote(url.path))
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+
+        for method, pattern, endpoint in ROUTES:
+            match = pattern.match(path)
+            if method == self.command and match:
+                break
+        else:
+            self._send_json(404, {"message": f"page not found: {self.command} {path}"})
+            return
+
+        daemon = self.server.daemon
+        daemon.count(endpoint)
+        try:
+            if endpoint not in HANDSHAKE:
+                daemon.delay()
+                if daemon.should_fail():
+                    raise FakeDockerError(500, f"injected failure of {endpoint}")
+            getattr(self, f"_{endpoint}")(query, body, **match.groupdict())
+        except FakeDockerError as e:
+            self._send_json(e.status, {"message": e.message})
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _send_json(self, status: int, payload: Any = None) -> None:
+        """
+        Send a complete response.
+
+        :param status: The status code.
+        :param payload: The JSON body, or None for an empty body.
+        """
+        content = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _start_stream(self) -> None:
+        """
+        Start a chunked response of JSON messages, as used by the events and pull endpoints.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_chunk(self, payload: Optional[Any]) -> None:
+        """
+        Send one JSON message of a chunked response, or end the response.
+
+        :param payload: The message, or None to end the response.
+        """
+        data = b"" if payload is None else json.dumps(payload).encode() + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _ping(self, query, body) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"OK")
+
+    def _version(self, query, body) -> None:
+        self._send_json(200, {"Version": "fake", "ApiVersion": API_VERSION, "MinAPIVersion": "1.24", "Os": "linux", "Arch": "amd64"})
+
+    def _events(self, query, body) -> None:
+        state = self.server.daemon.state
+        subscriber = state.subscribe()
+        self._start_stream()
+        try:
+            while not self.server.daemon.stopped.is_set():
+                try:
+                    event = subscriber.get(timeout=.2)
+                except queue.Empty:
+                    continue
+                self._send_chunk(event)
+            self._send_chunk(None)
+        finally:
+            state.unsubscribe(subscriber)
+            self.close_connection = True
+
+    @staticmethod
+    def _summary(container: dict[str, Any]) -> dict[str, Any]:
+        if container["State"] in ("running", "paused"):
+            status = "Up 5 minutes" + (" (Paused)" if container["State"] == "paused" else "")
+            if container["Health"]:
+                status += f" ({container['Health']})"
+        else:
+            status = "Exited (0) 5 minutes ago" if container["State"] == "exited" else container["State"].capitalize()
+        return {
+            "Id": container["Id"],
+            "Names": [f"/{container['Name']}"],
+            "Image": container["Image"],
+            "State": container["State"],
+            "Status": status,
+            "Labels": container["Labels"],
+            "Created": container["Created"],
+            "SizeRw": 0,
+        }
+
+    def _list_containers(self, query, body) -> None:
+        state = self.server.daemon.state
+        with state.lock:
+            containers = [
+                self._summary(container) for container in state.containers.values()
+                if query.get("all") in ("1", "true", "True") or container["State"] == "running"
+            ]
+        self._send_json(200, containers)
+
+    def _create_container(self, query, body) -> None:
+        state = self.server.daemon.state
+        body = body or {}
+        name = query.get("name") or make_id(str(time.time_ns()))[:12]
+        with state.lock:
+            state.image(body.get("Image", ""))
+        container = state.add_container(name, body["Image"], labels=body.get("Labels"))
+        self._send_json(201, {"Id": container["Id"], "Warnings": []})
+
+    def _inspect_container(self, query, body, ref: str) -> None:
+        state = self.server.daemon.state
+        with state.lock:
+            container = state.container(ref)
+            image = state.images.get(container["Image"])
+            running = container["State"] in ("running", "paused")
+            self._send_json(200, {
+                "Id": container["Id"],
+                "Name": f"/{container['Name']}",
+                "Image": image["Id"] if image else "",
+                "Created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(container["Created"])),
+                "State": {
+                    "Status": container["State"],
+                    "Running": running,
+                    "Paused": container["State"] == "paused",
+                    "ExitCode": 0,
+                    **({"Health": {"Status": container["Health"]}} if container["Health"] else {}),
+                },
+                "Config": {"Image": container["Image"], "Labels": container["Labels"]},
+                "HostConfig": {},
+                "NetworkSettings": {"Networks": {}},
+            })
+
+    def _container_action(self, query, body, ref: str, action: str) -> None:
+        state = self.server.daemon.state
+        with state.lock:
+            container = state.container(ref)
+            if (action == "start" and container["State"] == "running") or (action == "stop" and container["State"] not in ("running", "paused")):
+                self._send_json(304)
+                return
+            state.set_state(container, action)
+        self._send_json(204)
+
+    def _remove_container(self, query, body, ref: str) -> None:
+        state = self.server.daemon.state
+        with state.lock:
+            container = state.container(ref)
+            if container["State"] in ("running", "paused") and query.get("force") not in ("1", "true", "True"):
+                raise FakeDockerError(409, f"You cannot remove a running container {container['Id']}.")
+            del state.containers[container["Name"]]
+            state.emit("container", "destroy", container["Id"], {"name": container["Name"], "image": container["Image"]})
+        self._send_json(204)
+
+    def _list_images(self, query, body) -> None:
+        state = self.server.daemon.state
+        with state.lock:
+            self._send_json(200, list(state.images.values()))
+
+    def _pull_image(self, query, body) -> None:
+        daemon = self.server.daemon
+        reference = query.get("fromImage", "")
+        if query.get("tag"):
+            reference = f"{reference}:{query['tag']}"
+        self._start_stream()
+        self._send_chunk({"status": f"Pulling from {reference}", "id": query.get("tag", "latest")})
+        layer_size = daemon.image_size // daemon.pull_layers
+        for layer in range(daemon.pull_layers):
+            layer_id = make_id(f"{reference}-{layer}")[:12]
+            for done in (layer_size // 2, layer_size):
+                time.sleep(daemon.pull_latency / daemon.pull_layers / 2)
+                self._send_chunk({"status": "Downloading", "id": layer_id, "progressDetail": {"current": done, "total": layer_size}})
+            self._send_chunk({"status": "Pull complete", "id": layer_id, "progressDetail": {}})
+        daemon.state.add_image(reference, daemon.image_size)
+        self._send_chunk({"status": f"Status: Downloaded newer image for {reference}"})
+        self._send_chunk(None)
+
+    def _inspect_image(self, query, body, ref: str) -> None:
+        state = self.server.daemon.state
+        with state.lock:
+            self._send_json(200, state.image(ref))
+
+    def _remove_image(self, query, body, ref: str) -> None:
+        state = self.server.daemon.state
+        with state.lock:
+            image = state.image(ref)
+            users = [container["Name"] for container in state.containers.values() if container["Image"] in image["RepoTags"]]
+            if users and query.get("force") not in ("1", "true", "True"):
+                raise FakeDockerError(409, f"conflict: unable to remove repository reference (must force) - image is being used by {users[0]}")
+            for reference in image["RepoTags"]:
+                del state.images[reference]
+            state.emit("image", "delete", image["Id"], {"name": image["RepoTags"][0]})
+        self._send_json(200, [{"Untagged": reference} for reference in image["RepoTags"]] + [{"Deleted": image["Id"]}])
+
+class FakeDockerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # the daemon owning the server, named to keep clear of `socketserver`'s own attributes
+    daemon: "FakeDockerDaemon"
+
+class FakeDockerDaemon:
+    """
+    Local stand-in for the Docker daemon, serving the subset of the Docker Engine API used by Eigen
+    over a Unix socket.
+
+    Every request except the handshake is delayed by `latency` seconds and fails with a server
+    error with probability `failure_rate`. The number of requests per endpoint is counted.
+    """
+    def __init__(self, socket_path: Path, latency: float = 0, failure_rate: float = 0,
+                 pull_latency: float = .5, pull_layers: int = 4, image_size: int = 100 * 1024 ** 2, seed: Optional[int] = None):
+        """
+        Initialize the fake daemon. It does not listen until it is started.
+
+        :param socket_path: Path of the Unix socket to listen on.
+        :param latency: Seconds every request is delayed by.
+        :param failure_rate: Probability between 0 and 1 of a request failing with status 500.
+        :param pull_latency: Seconds an image pull takes.
+        :param pull_layers: Number of layers reported per pulled image.
+        :param image_size: Size in bytes of pulled images.
+        :param seed: Seed of the injected failures, for reproducible runs.
+        """
+        self.socket_path = socket_path
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.pull_latency = pull_latency
+        self.pull_layers = pull_layers
+        self.image_size = image_size
+        self.state = FakeDockerState()
+        self.stopped = threading.Event()
+
+        self._random = random.Random(seed)
+        self._calls: Counter[str] = Counter()
+        self._calls_lock = threading.Lock()
+        self._server: Optional[FakeDockerServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """
+        Get the address of the daemon as expected in `DOCKER_HOST`.
+
+        :return: The address, e.g. `unix:///tmp/docker.sock`.
+        """
+        return f"unix://{self.socket_path}"
+
+    def count(self, endpoint: str) -> None:
+        with self._calls_lock:
+            self._calls[endpoint] += 1
+
+    def delay(self) -> None:
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def should_fail(self) -> bool:
+        with self._calls_lock:
+            return self.failure_rate > 0 and self._random.random() < self.failure_rate
+
+    def calls(self, include_handshake: bool = False) -> Counter[str]:
+        """
+        Get the number of requests served per endpoint.
+
+        :param include_handshake: Whether to include the requests made to connect.
+        :return: The number of requests keyed by endpoint, e.g. `list_containers`.
+        """
+        with self._calls_lock:
+            return Counter({endpoint: count for endpoint, count in self._calls.items() if include_handshake or endpoint not in HANDSHAKE})
+
+    def reset_calls(self) -> None:
+        """
+        Reset the request counters.
+        """
+        with self._calls_lock:
+            self._calls.clear()
+
+    def start(self) -> None:
+        """
+        Start listening on the socket in a background thread.
+        """
+        self.socket_path.unlink(missing_ok=True)
+        self.stopped.clear()
+        self._server = FakeDockerServer(str(self.socket_path), FakeDockerHandler)
+        self._server.daemon = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-docker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop listening, ending all event streams, and remove the socket.
+        """
+        self.stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.socket_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "FakeDockerDaemon":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.stop()
+        return False
@@ -0,0 +1,310 @@
+from .fake_docker import FakeDockerDaemon
+from pathlib import Path
+from typing import Any, Callable, Optional
+import argparse
+import tempfile
+import threading
+import platform
+import subprocess
+import statistics
+import random
+import json
+import time
+import sys
+import os
+
+CATALOG_SIZES = (1, 10, 100, 1000)
+# distinct images shared by the services of a catalog, as many services use the same image
+IMAGES = 20
+
+EIGEN_CONFIG = """\
+[general]
+version = "0.1.0"
+root-domain = "bench.local"
+subdomain = "bench"
+
+[services]
+lock-dir = "{lock_dir}"
+location = "services/"
+
+[metrics]
+enable = false
+"""
+
+SERVICE_CONFIG = """\
+enable = true
+
+[info]
+name = "Service {index}"
+description = "Benchmark service {index}"
+website = "https://example.com/"
+categories = ["Benchmark"]
+icon = ""
+
+[provider]
+slug = "docker"
+
+[provider.options]
+image = "{image}"
+container_name = "{slug}"
+memory = "256m"
+ports = {{}}
+volumes = []
+environment = {{}}
+"""
+
+def summarize(values: list[float]) -> dict[str, float]:
+    """
+    Summarize repeated measurements.
+
+    :param values: The measurements.
+    :return: The minimum, median, mean, 95th percentile and maximum.
+    """
+    ordered = sorted(values)
+    return {
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * .95))],
+        "max": ordered[-1],
+    }
+
+def write_catalog(directory: Path, size: int) -> Path:
+    """
+    Write an Eigen configuration with a catalog of Docker services.
+
+    :param directory: The directory to write the configuration to.
+    :param size: The number of services.
+    :return: The path of the Eigen configuration.
+    """
+    services = directory / "services"
+    services.mkdir(parents=True)
+    for index in range(size):
+        slug = f"bench-{index:04d}"
+        image = f"bench/image-{index % IMAGES}:latest"
+        (services / f"{slug}.toml").write_text(SERVICE_CONFIG.format(index=index, slug=slug, image=image))
+    config_path = directory / "eigen.toml"
+    config_path.write_text(EIGEN_CONFIG.format(lock_dir=directory / "locks"))
+    return config_path
+
+def populate(daemon: FakeDockerDaemon, size: int) -> None:
+    """
+    Give the fake daemon the images and containers of a catalog: most services are installed, of
+    which most are running, some stopped and some have no container yet.
+
+    :param daemon: The fake daemon.
+    :param size: The number of services.
+    """
+    for index in range(size):
+        if index % 10 == 9:
+            continue
+        image = f"bench/image-{index % IMAGES}:latest"
+        daemon.state.add_image(image)
+        if index % 5 != 4:
+            daemon.state.add_container(f"bench-{index:04d}", image, state="running" if index % 3 else "exited")
+
+class Worker:
+    """
+    Runs the benchmarks against one catalog size, in a process of its own so that module level
+    state such as the shared Docker client does not carry over between catalog sizes.
+    """
+    def __init__(self, size: int, args: argparse.Namespace):
+        self.size = size
+        self.args = args
+        self.results: list[dict[str, Any]] = []
+
+    def record(self, name: str, value: float, unit: str, **extra: Any) -> None:
+        """
+        Record a result.
+
+        :param name: The name of the benchmark.
+        :param value: The headline value.
+        :param unit: The unit of the value.
+        :param extra: Further details, e.g. a summary of repeated measurements.
+        """
+        self.results.append({"name": name, "catalog": self.size, "value": value, "unit": unit, **extra})
+
+    def run(self) -> list[dict[str, Any]]:
+        """
+        Run all benchmarks.
+
+        :return: The results.
+        """
+        with tempfile.TemporaryDirectory(prefix="eigen-bench-") as directory:
+            directory = Path(directory)
+            config_path = write_catalog(directory, self.size)
+            daemon = FakeDockerDaemon(directory / "docker.sock", latency=self.args.latency, failure_rate=self.args.failure_rate, seed=self.args.seed)
+            with daemon:
+                populate(daemon, self.size)
+                # must be set before eigen is imported, as the providers are created on import
+                os.environ["DOCKER_HOST"] = daemon.url
+                started = time.perf_counter()
+                from eigen import Eigen
+                from eigen.providers import PROVIDERS
+                self.record("import", time.perf_counter() - started, "s")
+
+                eigen = self.bench_startup(Eigen, config_path)
+                self.bench_refresh(eigen, daemon, PROVIDERS["docker"])
+                self.bench_status(eigen, daemon)
+                self.bench_locks(eigen)
+                eigen.scheduler.shutdown()
+        return self.results
+
+    def bench_startup(self, eigen_class: type, config_path: Path) -> Any:
+        """
+        Measure the time `Eigen.__init__` takes to load the catalog, the first time without and
+        then with the compiled catalog cache.
+
+        :return: The last Eigen instance created.
+        """
+        durations = []
+        eigen = None
+        for _ in range(self.args.repeat):
+            if eigen is not None:
+                eigen.scheduler.shutdown()
+            started = time.perf_counter()
+            eigen = eigen_class(config_path)
+            durations.append(time.perf_counter() - started)
+        self.record("startup_cold", durations[0], "s", services=len(eigen.services))
+        stats = summarize(durations[1:] or durations)
+        self.record("startup", stats["median"], "s", stats=stats, services=len(eigen.services))
+        return eigen
+
+    def bench_refresh(self, eigen: Any, daemon: FakeDockerDaemon, docker: Any) -> None:
+        """
+        Count the Docker API calls of a dashboard refresh, i.e. one status snapshot of all
+        services, before and after the state cache has synchronized with the event stream.
+        """
+        daemon.reset_calls()
+        started = time.perf_counter()
+        self._attempt(eigen.statuses)
+        cold = time.perf_counter() - started
+        self.record("refresh_calls_cold", sum(daemon.calls().values()), "calls", duration=cold, endpoints=dict(daemon.calls()))
+
+        docker.state._synced.wait(10)
+        daemon.reset_calls()
+        durations = []
+        for _ in range(self.args.repeat):
+            started = time.perf_counter()
+            self._attempt(eigen.statuses)
+            durations.append(time.perf_counter() - started)
+        calls = daemon.calls()
+        self.record("refresh_calls", sum(calls.values()) / self.args.repeat, "calls", endpoints=dict(calls), stats=summarize(durations))
+
+    def bench_status(self, eigen: Any, daemon: FakeDockerDaemon) -> None:
+        """
+        Measure how many `Service.status` reads per second can be served, cycling through all services.
+        """
+        services = list(eigen.services.values())
+        daemon.reset_calls()
+        reads, errors = 0, 0
+        started = time.perf_counter()
+        deadline = started + self.args.duration
+        while time.perf_counter() < deadline:
+            for service in services:
+                if self._attempt(lambda: service.status) is None:
+                    errors += 1
+                reads += 1
+        elapsed = time.perf_counter() - started
+        self.record("status_throughput", reads / elapsed, "reads/s", reads=reads, errors=errors, calls=sum(daemon.calls().values()))
+
+    def bench_locks(self, eigen: Any) -> None:
+        """
+        Measure the time spent waiting for service locks while several threads lock random
+        services of the catalog, holding each lock briefly.
+        """
+        services = list(eigen.services.values())
+        waits: list[float] = []
+        waits_lock = threading.Lock()
+        generator = random.Random(self.args.seed)
+        plans = [[generator.choice(services) for _ in range(self.args.lock_rounds)] for _ in range(self.args.lock_threads)]
+
+        def worker(plan: list[Any]) -> None:
+            for service in plan:
+                started = time.perf_counter()
+                with service.lock:
+                    waited = time.perf_counter() - started
+                    time.sleep(self.args.lock_hold)
+                with waits_lock:
+                    waits.append(waited)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(plan,)) for plan in plans]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        self.record("lock_wait", statistics.fmean(waits), "s", stats=summarize(waits), threads=self.args.lock_threads,
+                    acquisitions=len(waits), throughput=len(waits) / elapsed)
+
+    @staticmethod
+    def _attempt(operation: Callable[[], Any]) -> Optional[Any]:
+        """
+        Run an operation, tolerating the errors of injected failures.
+
+        :return: The result, or None if the operation failed.
+        """
+        from eigen import ServiceError
+        try:
+            return operation()
+        except ServiceError:
+            return None
+
+def git_commit() -> Optional[str]:
+    """
+    Get the commit the benchmarks run against.
+
+    :return: The commit hash, or None if it cannot be determined.
+    """
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).parent, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark Eigen against a fake Docker daemon.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(CATALOG_SIZES), help="catalog sizes to benchmark")
+    parser.add_argument("--latency", type=float, default=.001, help="seconds every Docker API request is delayed by")
+    parser.add_argument("--failure-rate", type=float, default=0, help="probability of a Docker API request failing")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions of the startup and refresh measurements")
+    parser.add_argument("--duration", type=float, default=1, help="seconds to measure the status throughput for")
+    parser.add_argument("--lock-threads", type=int, default=4, help="threads competing for service locks")
+    parser.add_argument("--lock-rounds", type=int, default=10, help="locks acquired per thread")
+    parser.add_argument("--lock-hold", type=float, default=.001, help="seconds each lock is held")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the injected failures and lock order")
+    parser.add_argument("--output", type=Path, help="file to write the JSON results to, stdout if omitted")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.worker is not None:
+        args.output.write_text(json.dumps(Worker(args.worker, args).run()))
+        return
+
+    forwarded = [argument for argument in (argv if argv is not None else sys.argv[1:])]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="eigen-bench-") as directory:
+        for size in args.sizes:
+            print(f"Benchmarking a catalog of {size} services", file=sys.stderr)
+            output = Path(directory) / f"{size}.json"
+            # later arguments win, so the worker writes to its own file
+            subprocess.run([sys.executable, "-m", "benchmarks", *forwarded, "--worker", str(size), "--output", str(output)],
+                           cwd=Path(__file__).parent.parent, check=True)
+            results.extend(json.loads(output.read_text()))
+
+    report = {
+        "timestamp": time.time(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {name: value for name, value in vars(args).items() if name not in ("output", "worker", "sizes")},
+        "results": results,
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        args.output.write_text(json.dumps(report, indent=2))
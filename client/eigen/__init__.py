@@ -1,7 +1,7 @@
 from pathlib import Path
 from tomllib import load as load_toml
 from typing import Optional
-from .core import Eigen, Config, Service, ServiceStatus, Provider, ServiceConfig, ServiceError
+from .core import Eigen, Config, Service, ServiceStatus, ServiceProgress, ServiceState, StatusSnapshot, StatusChange, Subscription, CatalogPage, Provider, ServiceConfig, ServiceError
 
 config: Optional[Config] = None
 def load_config(config_path: Path) -> None:
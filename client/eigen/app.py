@@ -1,25 +1,95 @@
 from argparse import ArgumentParser
 from pathlib import Path
-from . import load_config
+from . import load_config, Eigen, StatusSnapshot, StatusChange, CatalogPage
+from datetime import datetime
 import logging
 
 DEFAULT_CONFIG_PATH = Path(__file__).parent / "config.toml"
 
+def print_snapshot(snapshot: StatusSnapshot) -> None:
+    """
+    Print the states of a status snapshot, one service per line.
+
+    :param snapshot: The snapshot to print.
+    """
+    for slug, state in sorted(snapshot.states.items()):
+        flags = ", ".join(flag for flag, value in (("installed", state.installed), ("busy", state.busy)) if value)
+        print(f"{slug:<24} {state.status.value:<12} {flags}")
+
+def print_change(change: StatusChange) -> None:
+    """
+    Print a status change on one line.
+
+    :param change: The change to print.
+    """
+    timestamp = datetime.fromtimestamp(change.timestamp).strftime("%H:%M:%S")
+    print(f"{timestamp} {change.slug:<24} {change.old_status.value} -> {change.new_status.value}", flush=True)
+
+def print_page(eigen: Eigen, page: CatalogPage) -> None:
+    """
+    Print a page of catalog search results, one service per line, followed by the categories of
+    all results and the cursor of the next page.
+
+    :param eigen: The Eigen instance searched.
+    :param page: The page to print.
+    """
+    for slug in page.slugs:
+        info = eigen.services[slug].config.info
+        print(f"{slug:<24} {info.name:<24} {', '.join(info.categories)}")
+    print(f"{len(page.slugs)} of {page.total} services")
+    if page.facets:
+        print("Categories: " + ", ".join(f"{label} ({count})" for label, count in page.facets.items()))
+    if page.cursor is not None:
+        print(f"Next page: --cursor {page.cursor}")
+
 def main():
     parser = ArgumentParser()
     #parser.add_argument("--host", type=str, default="localhost", help="Host to run the server on")
     #parser.add_argument("--port", type=int, default=8000, help="Port to run the server on")
     parser.add_argument("command", type=str, help="Command to run")
     parser.add_argument("args", nargs="*", help="Arguments for the command")
-    parser.add_argument("--config", type=str, default=DEFAULT_CONFIG_PATH, help="Path to the configuration file")
+    parser.add_argument("--config", type=Path, default=DEFAULT_CONFIG_PATH, help="Path to the configuration file")
+    parser.add_argument("--category", type=str, default=None, help="Category to restrict a search to")
+    parser.add_argument("--limit", type=int, default=20, help="Number of services per page of a search")
+    parser.add_argument("--cursor", type=str, default=None, help="Cursor of the page of a search to print")
     args = parser.parse_args()
 
     load_config(args.config)
 
     match args.command:
         case "list":
-            # Placeholder for listing all services
             logging.info("Listing all services...")
+            print_snapshot(Eigen(args.config).statuses())
+            return
+        case "search":
+            eigen = Eigen(args.config)
+            try:
+                page = eigen.catalog.search(" ".join(args.args), args.category, args.limit, args.cursor)
+            except ValueError as e:
+                logging.error(str(e))
+                return
+            print_page(eigen, page)
+            return
+        case "assets":
+            rewritten = Eigen(args.config).externalize_icons()
+            logging.info(f"Moved the icons of {len(rewritten)} services into the asset store.")
+            for slug in rewritten:
+                print(slug)
+            return
+        case "watch":
+            eigen = Eigen(args.config)
+            unknown = [slug for slug in args.args if slug not in eigen.services]
+            if unknown:
+                logging.error(f"Unknown service: {unknown[0]}")
+                return
+            print_snapshot(eigen.statuses(args.args or None))
+            try:
+                with eigen.subscribe(slugs=args.args or None) as subscription:
+                    for change in subscription:
+                        print_change(change)
+            except KeyboardInterrupt:
+                pass
+            return
 
     if len(args.args) == 0:
         logging.error("No service slug provided. Please provide a service slug as an argument.")
@@ -39,9 +109,14 @@ def main():
             slug = args.args[0]
             logging.info("Restarting the service...")
         case "status":
-            # Placeholder for checking the status of the service
             slug = args.args[0]
             logging.info("Checking the status of the service...")
+            eigen = Eigen(args.config)
+            if slug not in eigen.services:
+                logging.error(f"Unknown service: {slug}")
+                return
+            print_snapshot(eigen.statuses([slug]))
+            return
         case _:
             logging.error(f"Unknown command: {args.command}")
             return
@@ -1,4 +1,16 @@
 from .config import ServiceConfig, EigenConfig, TomlConfig, Config
-from .service import ServiceConfig, Service, ServiceError, ServiceStatus
+from .service import ServiceConfig, Service, ServiceError, OperationJournal, ServiceStatus, ServiceProgress, ServiceState, StatusSnapshot, StatusChange, ServiceUsage, MetricsSample, LogLine
 from .provider import Provider, ProviderError
+from .async_service import AsyncService, SyncServiceWrapper, AsyncServiceWrapper, as_async, run_sync
+from .async_provider import AsyncProvider
+from .scheduler import OperationScheduler, Job, JobState
+from .storage import StorageManager
+from .metrics import MetricsBuffer, MetricsCollector
+from .idle import IdleManager
+from .reconciler import Reconciler
+from .watch import StatusWatcher, Subscription
+from .probe import HealthProber
+from .assets import AssetStore, AssetServer
+from .reload import ConfigWatcher
+from .catalog import CatalogIndex, CatalogPage
 from .eigen import Eigen
@@ -0,0 +1,281 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+import mimetypes
+import threading
+import binascii
+import hashlib
+import logging
+import base64
+import io
+import os
+import re
+
+try:
+    from PIL import Image
+except ImportError:
+    # without Pillow, icons are displayed at their original size
+    Image = None
+
+REFERENCE_PREFIX = "asset:"
+# name of a stored asset, the SHA-256 of its content, optionally followed by the size of a thumbnail
+ASSET_NAME = re.compile(r"^(?P<digest>[0-9a-f]{64})(?:-(?P<size>\d+))?\.(?P<extension>[a-z0-9]+)$")
+DATA_URL = re.compile(r"^data:(?P<mime>[\w.+-]+/[\w.+-]+)?(?P<parameters>(?:;[^;,]*)*?);base64,(?P<data>.*)$", re.DOTALL)
+EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/svg+xml": "svg",
+}
+# formats Pillow can scale down, by extension
+THUMBNAIL_FORMATS = {"jpg": "JPEG", "png": "PNG", "webp": "WEBP"}
+
+class AssetStore:
+    """
+    Content-addressed store of service icons and other assets.
+
+    Every asset is stored once, named after the SHA-256 of its content, and referred to from
+    service configurations as `asset:<name>`. Since the content of a name never changes, assets
+    can be cached by browsers indefinitely. Raster images are also stored as thumbnails scaled
+    down to `thumbnail_size`, if Pillow is available.
+    """
+    def __init__(self, directory: Path, thumbnail_size: int):
+        """
+        Initialize the store. The directory is created once the first asset is stored.
+
+        :param directory: The directory holding the assets.
+        :param thumbnail_size: The edge length in pixels thumbnails are scaled down to fit.
+        """
+        self.directory = directory
+        self.thumbnail_size = thumbnail_size
+        self._lock = threading.Lock()
+        # assets a thumbnail has been made of, or found to be unnecessary for
+        self._thumbnailed: set[str] = set()
+
+    @staticmethod
+    def is_reference(value: str) -> bool:
+        """
+        Check if a value refers to an asset of the store, rather than being a URL.
+
+        :param value: The value, e.g. the icon of a service.
+        :return: True if the value is an asset reference, False otherwise.
+        """
+        return value.startswith(REFERENCE_PREFIX)
+
+    @staticmethod
+    def _name(reference: str) -> str:
+        """
+        Get the file name an asset reference refers to.
+
+        :param reference: The reference, e.g. `asset:<sha256>.png`.
+        :raises ValueError: if the reference is invalid.
+        :return: The file name of the asset.
+        """
+        name = reference.removeprefix(REFERENCE_PREFIX)
+        if not reference.startswith(REFERENCE_PREFIX) or ASSET_NAME.match(name) is None:
+            raise ValueError(f"Invalid asset reference '{reference}'.")
+        return name
+
+    def put(self, data: bytes, extension: str) -> str:
+        """
+        Store an asset, unless it is already stored, along with its thumbnail.
+
+        :param data: The content of the asset.
+        :param extension: The file extension of the asset, e.g. `png`.
+        :raises OSError: if the asset cannot be written.
+        :return: The reference to the asset.
+        """
+        name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = self.directory / name
+        with self._lock:
+            if not path.exists():
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._write(path, data)
+            if name not in self._thumbnailed and not self._thumbnail_path(path).exists():
+                self._make_thumbnail(path, data)
+            self._thumbnailed.add(name)
+        return f"{REFERENCE_PREFIX}{name}"
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        """
+        Write a file atomically, so that it is never served half written. The temporary file is
+        named after the process and thread, so that concurrent writers never share it.
+
+        :param path: The path of the file.
+        :param data: The content of the file.
+        """
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            temporary.write_bytes(data)
+            os.replace(temporary, path)
+        except BaseException:
+            temporary.unlink(missing_ok=True)
+            raise
+
+    def _make_thumbnail(self, path: Path, data: bytes) -> None:
+        """
+        Store a scaled down copy of a raster image next to it, if it is larger than a thumbnail.
+
+        :param path: The path of the image.
+        :param data: The content of the image.
+        """
+        image_format = THUMBNAIL_FORMATS.get(path.suffix[1:])
+        if Image is None or image_format is None:
+            return
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                if max(image.size) <= self.thumbnail_size:
+                    return
+                image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                output = io.BytesIO()
+                image.save(output, image_format)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Cannot create a thumbnail of asset '{path.name}': {e}")
+            return
+        self._write(self._thumbnail_path(path), output.getvalue())
+
+    def _thumbnail_path(self, path: Path) -> Path:
+        """
+        Get the path of the thumbnail of an asset.
+
+        :param path: The path of the asset.
+        :return: The path the thumbnail is stored at, if there is one.
+        """
+        return path.with_name(f"{path.stem}-{self.thumbnail_size}{path.suffix}")
+
+    def import_data_url(self, url: str) -> str:
+        """
+        Store the content of a base64 data URL, e.g. an icon embedded in a service configuration.
+
+        :param url: The data URL, e.g. `data:image/png;base64,...`.
+        :raises ValueError: if the URL is not a base64 data URL of a known type of image.
+        :raises OSError: if the asset cannot be written.
+        :return: The reference to the asset.
+        """
+        match = DATA_URL.match(url)
+        if match is None:
+            raise ValueError("Not a base64 data URL.")
+        extension = EXTENSIONS.get((match.group("mime") or "").lower())
+        if extension is None:
+            raise ValueError(f"Unsupported asset type '{match.group('mime')}'.")
+        try:
+            data = base64.b64decode(match.group("data"), validate=False)
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 data: {e}")
+        return self.put(data, extension)
+
+    def path(self, reference: str) -> Path:
+        """
+        Get the path of an asset.
+
+        :param reference: The reference to the asset.
+        :raises ValueError: if the reference is invalid.
+        :raises FileNotFoundError: if the asset is not stored.
+        :return: The path of the asset.
+        """
+        path = self.directory / self._name(reference)
+        if not path.is_file():
+            raise FileNotFoundError(f"Asset '{reference}' is not stored.")
+        return path
+
+    def thumbnail(self, reference: str) -> str:
+        """
+        Get the name of the file to display an asset from: its thumbnail if it has one, the asset
+        otherwise. The thumbnail of an asset stored by an earlier run is made on first use.
+
+        :param reference: The reference to the asset.
+        :raises ValueError: if the reference is invalid.
+        :raises FileNotFoundError: if the asset is not stored.
+        :return: The file name, relative to the asset directory.
+        """
+        path = self.path(reference)
+        thumbnail = self._thumbnail_path(path)
+        with self._lock:
+            if path.name not in self._thumbnailed and not thumbnail.exists():
+                self._make_thumbnail(path, path.read_bytes())
+            self._thumbnailed.add(path.name)
+        return thumbnail.name if thumbnail.is_file() else path.name
+
+
+class _AssetHandler(BaseHTTPRequestHandler):
+    """
+    Serves the files of an asset store, to be cached by browsers indefinitely.
+    """
+    store: AssetStore
+    CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+    def do_HEAD(self) -> None:
+        self._serve(body=False)
+
+    def do_GET(self) -> None:
+        self._serve(body=True)
+
+    def _serve(self, body: bool) -> None:
+        name = self.path.split("?", 1)[0].lstrip("/")
+        path = self.store.directory / name
+        if ASSET_NAME.match(name) is None or not path.is_file():
+            self.send_error(404)
+            return
+        etag = f'"{name}"'
+        if etag in (self.headers.get("If-None-Match") or ""):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", self.CACHE_CONTROL)
+            self.end_headers()
+            return
+        data = path.read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", mimetypes.guess_type(name)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", self.CACHE_CONTROL)
+        self.send_header("X-Content-Type-Options", "nosniff")
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        logging.debug(f"Asset request: {format % args}")
+
+
+class AssetServer:
+    """
+    Serves an asset store over HTTP on a background thread.
+    """
+    def __init__(self, store: AssetStore, host: str, port: int):
+        """
+        Initialize the server. Nothing is served until it is started.
+
+        :param store: The asset store to serve.
+        :param host: The address to listen on.
+        :param port: The port to listen on.
+        """
+        self.store = store
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> None:
+        """
+        Start serving in the background, if not already running.
+
+        :raises OSError: if the port cannot be listened on.
+        """
+        if self._server is not None:
+            return
+        handler = type("AssetHandler", (_AssetHandler,), {"store": self.store})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="eigen-assets", daemon=True).start()
+
+    def stop(self) -> None:
+        """
+        Stop serving.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,59 @@
+from abc import abstractmethod
+from . import Service, ServiceConfig, EigenConfig, StatusSnapshot, Provider
+from .async_service import AsyncService, SyncServiceWrapper, run_sync
+import asyncio
+import time
+
+class AsyncProvider(Provider):
+    """
+    Abstract base class for a provider whose services are driven by an asyncio event loop.
+
+    Synchronous callers keep working: `create_service` wraps the asynchronous service so that
+    its operations run on a background event loop.
+    """
+    @abstractmethod
+    def create_async_service(self, slug: str, service_config: ServiceConfig, eigen_config: EigenConfig) -> AsyncService:
+        """
+        Obtain an asynchronous service by its name.
+
+        :param slug: The slug of the service.
+        :param service_config: The configuration for the service.
+        :param eigen_config: The Eigen configuration.
+        :return: An instance of AsyncService.
+        :raises ProviderError: if the service cannot be obtained.
+        """
+        ...
+
+    def create_service(self, slug: str, service_config: ServiceConfig, eigen_config: EigenConfig) -> Service:
+        """
+        Obtain a synchronous wrapper around an asynchronous service.
+
+        :param slug: The slug of the service.
+        :param service_config: The configuration for the service.
+        :param eigen_config: The Eigen configuration.
+        :return: An instance of Service.
+        :raises ProviderError: if the service cannot be obtained.
+        """
+        return SyncServiceWrapper(self.create_async_service(slug, service_config, eigen_config))
+
+    def bulk_status(self, services: list[SyncServiceWrapper]) -> StatusSnapshot:
+        """
+        Resolve the state of several services of this provider concurrently on the background loop.
+
+        :param services: The services to resolve.
+        :raises ServiceError: if the status cannot be retrieved.
+        :return: A snapshot of the states of the services.
+        """
+        return run_sync(self.bulk_status_async([service.async_service for service in services]))
+
+    async def bulk_status_async(self, services: list[AsyncService]) -> StatusSnapshot:
+        """
+        Resolve the state of several asynchronous services of this provider concurrently.
+
+        :param services: The services to resolve.
+        :raises ServiceError: if the status cannot be retrieved.
+        :return: A snapshot of the states of the services.
+        """
+        timestamp = time.time()
+        states = await asyncio.gather(*(service.state() for service in services))
+        return StatusSnapshot(timestamp=timestamp, states={service.slug: state for service, state in zip(services, states)})
@@ -0,0 +1,407 @@
+from abc import ABC, abstractmethod
+from .config import ServiceConfig, EigenConfig
+from .service import Service, ServiceLock, ServiceError, ServiceBusyError
+from ..models import ServiceStatus, ServiceState, LogLine
+from pydantic import BaseModel
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional, TypeVar
+import threading
+import asyncio
+
+T = TypeVar("T")
+
+class AsyncService(ABC):
+    """
+    Abstract base class for a service driven by an asyncio event loop.
+    """
+    @staticmethod
+    def ensure_lock(func):
+        """
+        Decorator to ensure that a lock is acquired before awaiting the coroutine function.
+
+        :param func: The coroutine function to be decorated.
+        :return: The wrapped coroutine function.
+        """
+        async def wrapper(self, *args, **kwargs):
+            if not self.lock.is_locked():
+                raise ServiceBusyError(f"Lock required to perform action on '{self.slug}'.")
+            return await func(self, *args, **kwargs)
+        return wrapper
+
+    def __init__(self, slug: str, config: ServiceConfig, eigen_config: EigenConfig, provider_model: type[BaseModel]):
+        """
+        Initialize the service with a model.
+
+        :param slug: The unique identifier for the service.
+        :param config: An instance of ServiceModel containing service details.
+        :param eigen_config: An Eigen configuration.
+        :param provider_model: The model class for the provider data.
+        :raises ValidationError: If the data does not match the provider model.
+        """
+        self.slug = slug
+        self.lock = ServiceLock(slug, eigen_config.services.lock_dir)
+        self._config = config
+        self._config.provider.options = provider_model(**config.provider.options)
+        self._provider_model = provider_model
+
+    @property
+    def config(self) -> ServiceConfig:
+        """
+        Get the service configuration.
+
+        :return: The service configuration.
+        """
+        return self._config
+
+    def reconfigure(self, config: ServiceConfig) -> None:
+        """
+        Replace the configuration of the service, e.g. after its file changed. The service is not
+        stopped and keeps its lock, the new configuration applies from the next operation on.
+
+        :param config: The new configuration, of the same provider.
+        :raises ValidationError: If the provider options do not match the provider model.
+        """
+        config.provider.options = self._provider_model(**config.provider.options)
+        self._config = config
+
+    def is_busy(self) -> bool:
+        """
+        Check if the service is busy.
+
+        :return: True if the service is busy, False otherwise.
+        """
+        return self.lock.is_locked()
+
+    @abstractmethod
+    async def is_installed(self) -> bool:
+        """
+        Check if the service is installed.
+
+        :return: True if the service is installed, False otherwise.
+        """
+        ...
+
+    @ensure_lock
+    async def install(self) -> None:
+        """
+        Install the service.
+
+        :raises ServiceError: if the service cannot be installed.
+        """
+        if await self.is_installed():
+            raise ServiceError(f"Service '{self.slug}' is already installed.")
+        await self._install()
+
+    @abstractmethod
+    async def _install(self) -> None:
+        """
+        Install the service without acquiring the lock.
+        """
+        ...
+
+    @ensure_lock
+    async def uninstall(self) -> None:
+        """
+        Uninstall the service.
+
+        :raises ServiceError: if the service cannot be uninstalled.
+        """
+        if not await self.is_installed():
+            raise ServiceError(f"Service '{self.slug}' is not installed.")
+        await self._uninstall()
+
+    @abstractmethod
+    async def _uninstall(self) -> None:
+        """
+        Uninstall the service without acquiring the lock.
+        """
+        ...
+
+    @ensure_lock
+    async def start(self) -> None:
+        """
+        Start the service.
+
+        :raises ServiceError: if the service cannot be started.
+        """
+        await self._start()
+
+    @abstractmethod
+    async def _start(self) -> None:
+        """
+        Start the service without acquiring the lock.
+        """
+        ...
+
+    @ensure_lock
+    async def stop(self) -> None:
+        """
+        Stop the service.
+
+        :raises ServiceError: if the service cannot be stopped.
+        """
+        await self._stop()
+
+    @abstractmethod
+    async def _stop(self) -> None:
+        """
+        Stop the service without acquiring the lock.
+        """
+        ...
+
+    @ensure_lock
+    async def restart(self) -> None:
+        """
+        Restart the service.
+
+        :raises ServiceError: if the service cannot be restarted.
+        """
+        await self._restart()
+
+    @abstractmethod
+    async def _restart(self) -> None:
+        """
+        Restart the service without acquiring the lock.
+        """
+        ...
+
+    @ensure_lock
+    async def pause(self) -> None:
+        """
+        Pause the service, suspending its processes while keeping their memory.
+
+        :raises ServiceError: if the service cannot be paused.
+        """
+        await self._pause()
+
+    async def _pause(self) -> None:
+        """
+        Pause the service without acquiring the lock.
+
+        Providers supporting pausing should override this.
+        :raises ServiceError: if the service cannot be paused.
+        """
+        raise ServiceError(f"Service '{self.slug}' cannot be paused.")
+
+    @ensure_lock
+    async def unpause(self) -> None:
+        """
+        Resume the processes of a paused service.
+
+        :raises ServiceError: if the service cannot be unpaused.
+        """
+        await self._unpause()
+
+    async def _unpause(self) -> None:
+        """
+        Unpause the service without acquiring the lock.
+
+        Providers supporting pausing should override this.
+        :raises ServiceError: if the service cannot be unpaused.
+        """
+        raise ServiceError(f"Service '{self.slug}' cannot be unpaused.")
+
+    async def status(self) -> ServiceStatus:
+        """
+        Get the status of the service.
+
+        :return: The status of the service.
+        :raises ServiceError: if the status cannot be retrieved.
+        """
+        return await self._status()
+
+    @abstractmethod
+    async def _status(self) -> ServiceStatus:
+        """
+        Get the status of the service without acquiring the lock.
+        """
+        ...
+
+    async def logs(self, tail: Optional[int] = None, follow: bool = False, since: Optional[float] = None,
+                   until: Optional[float] = None) -> AsyncIterator[LogLine]:
+        """
+        Stream the output of the service line by line, without loading it into memory at once.
+
+        :param tail: Only return this many of the most recent lines, or all lines if None.
+        :param follow: Whether to keep streaming new lines as they are written.
+        :param since: Only return lines written after this Unix time, if given.
+        :param until: Only return lines written before this Unix time, if given.
+        :return: An asynchronous iterator over the lines, oldest first.
+        :raises ServiceError: if the output cannot be retrieved.
+        """
+        raise ServiceError(f"Service '{self.slug}' does not provide logs.")
+        yield
+
+    async def state(self) -> ServiceState:
+        """
+        Get the status, installation and busy state of the service at once.
+
+        :return: The state of the service.
+        :raises ServiceError: if the status cannot be retrieved.
+        """
+        status, installed = await asyncio.gather(self.status(), self.is_installed())
+        return ServiceState(status=status, installed=installed, busy=self.is_busy())
+
+
+class _LoopThread:
+    """
+    A background thread running an event loop on behalf of synchronous callers.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """
+        Run a coroutine on the background loop and block until it is done.
+
+        :param coroutine: The coroutine to run.
+        :return: The result of the coroutine.
+        """
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="eigen-async", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+_loop_thread = _LoopThread()
+
+def run_sync(coroutine: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine from synchronous code on the shared background event loop.
+
+    :param coroutine: The coroutine to run.
+    :return: The result of the coroutine.
+    """
+    return _loop_thread.run(coroutine)
+
+
+class SyncServiceWrapper(Service):
+    """
+    Synchronous service running the operations of an asynchronous service on a background loop.
+    """
+    def __init__(self, async_service: AsyncService):
+        """
+        Wrap an asynchronous service. Slug, lock and configuration are shared with it.
+
+        :param async_service: The asynchronous service to wrap.
+        """
+        self.async_service = async_service
+        self.slug = async_service.slug
+        self.lock = async_service.lock
+
+    @property
+    def config(self) -> ServiceConfig:
+        return self.async_service.config
+
+    def reconfigure(self, config: ServiceConfig) -> None:
+        self.async_service.reconfigure(config)
+
+    def is_installed(self) -> bool:
+        return run_sync(self.async_service.is_installed())
+
+    def _install(self) -> None:
+        run_sync(self.async_service._install())
+
+    def _uninstall(self) -> None:
+        run_sync(self.async_service._uninstall())
+
+    def _start(self) -> None:
+        run_sync(self.async_service._start())
+
+    def _stop(self) -> None:
+        run_sync(self.async_service._stop())
+
+    def _restart(self) -> None:
+        run_sync(self.async_service._restart())
+
+    def _pause(self) -> None:
+        run_sync(self.async_service._pause())
+
+    def _unpause(self) -> None:
+        run_sync(self.async_service._unpause())
+
+    def _status(self) -> ServiceStatus:
+        return run_sync(self.async_service._status())
+
+    def logs(self, tail: Optional[int] = None, follow: bool = False, since: Optional[float] = None,
+             until: Optional[float] = None) -> Iterator[LogLine]:
+        lines = self.async_service.logs(tail, follow, since, until)
+        try:
+            while True:
+                try:
+                    yield run_sync(anext(lines))
+                except StopAsyncIteration:
+                    return
+        finally:
+            run_sync(lines.aclose())
+
+
+class AsyncServiceWrapper(AsyncService):
+    """
+    Asynchronous service running the operations of a synchronous service in worker threads.
+    """
+    def __init__(self, service: Service):
+        """
+        Wrap a synchronous service. Slug, lock and configuration are shared with it.
+
+        :param service: The synchronous service to wrap.
+        """
+        self.service = service
+        self.slug = service.slug
+        self.lock = service.lock
+
+    @property
+    def config(self) -> ServiceConfig:
+        return self.service.config
+
+    def reconfigure(self, config: ServiceConfig) -> None:
+        self.service.reconfigure(config)
+
+    async def is_installed(self) -> bool:
+        return await asyncio.to_thread(self.service.is_installed)
+
+    async def _install(self) -> None:
+        await asyncio.to_thread(self.service._install)
+
+    async def _uninstall(self) -> None:
+        await asyncio.to_thread(self.service._uninstall)
+
+    async def _start(self) -> None:
+        await asyncio.to_thread(self.service._start)
+
+    async def _stop(self) -> None:
+        await asyncio.to_thread(self.service._stop)
+
+    async def _restart(self) -> None:
+        await asyncio.to_thread(self.service._restart)
+
+    async def _pause(self) -> None:
+        await asyncio.to_thread(self.service._pause)
+
+    async def _unpause(self) -> None:
+        await asyncio.to_thread(self.service._unpause)
+
+    async def _status(self) -> ServiceStatus:
+        return await asyncio.to_thread(self.service._status)
+
+    async def logs(self, tail: Optional[int] = None, follow: bool = False, since: Optional[float] = None,
+                   until: Optional[float] = None) -> AsyncIterator[LogLine]:
+        lines = self.service.logs(tail, follow, since, until)
+        done = object()
+        try:
+            while (line := await asyncio.to_thread(next, lines, done)) is not done:
+                yield line
+        finally:
+            lines.close()
+
+
+def as_async(service: Service) -> AsyncService:
+    """
+    Get an asynchronous view of a service.
+
+    :param service: The service.
+    :return: The native asynchronous service if the service wraps one, a threaded wrapper otherwise.
+    """
+    if isinstance(service, SyncServiceWrapper):
+        return service.async_service
+    return AsyncServiceWrapper(service)
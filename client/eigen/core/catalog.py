@@ -0,0 +1,272 @@
+from .config import ServiceConfig
+from ..models import CatalogPage
+from typing import Optional
+import threading
+import binascii
+import bisect
+import base64
+import json
+import re
+
+TOKEN = re.compile(r"[^\W_]+")
+# weight of a word by the field it occurs in
+FIELD_WEIGHTS = {"name": 3., "categories": 2., "description": 1.}
+# weight of a match by how the searched word matched the indexed one
+PREFIX_WEIGHT = .6
+FUZZY_WEIGHT = .4
+# searched words shorter than this are not matched with typos
+FUZZY_MIN_LENGTH = 4
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split a text into lowercase words.
+
+    :param text: The text.
+    :return: The words of the text, in order.
+    """
+    return TOKEN.findall(text.lower())
+
+def _deletions(word: str) -> set[str]:
+    """
+    Get the word itself and every variant of it with one character removed.
+
+    :param word: The word.
+    :return: The variants of the word.
+    """
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """
+    Check if two words differ by at most one insertion, deletion, substitution or swap of adjacent characters.
+
+    :param a: The first word.
+    :param b: The second word.
+    :return: True if the words are at most one edit apart, False otherwise.
+    """
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i + 1:] or (a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1])
+
+class CatalogIndex:
+    """
+    Searchable index of the services of the catalog by their name, description and categories.
+
+    Words are kept in an inverted index mapping every word to the services it occurs in, weighted
+    by the field it occurs in, so that a search only looks at the services containing the searched
+    words. Every searched word matches the words it equals, the words it is a prefix of and, if it
+    is long enough, the words one typo away from it, found through an index of the words with one
+    character removed. A service matches a search if it matches all searched words.
+
+    Results are ordered by relevance, then by name, and returned in pages. The cursor of a page
+    points past its last service, so paging stays consistent while services are added or removed.
+    """
+    def __init__(self, configs: Optional[dict[str, ServiceConfig]] = None):
+        """
+        Initialize the index.
+
+        :param configs: The configurations of the services to index, keyed by their slug.
+        """
+        self._lock = threading.Lock()
+        # word -> slug -> weight
+        self._postings: dict[str, dict[str, float]] = {}
+        # slug -> word -> weight, to remove a service from the postings
+        self._documents: dict[str, dict[str, float]] = {}
+        # word with one character removed -> words
+        self._deletions: dict[str, set[str]] = {}
+        # all words in order, for prefix search, None until needed after a change
+        self._vocabulary: Optional[list[str]] = None
+        self._names: dict[str, str] = {}
+        self._categories: dict[str, list[str]] = {}
+        for slug, config in (configs or {}).items():
+            self.add(slug, config)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self._documents
+
+    def add(self, slug: str, config: ServiceConfig) -> None:
+        """
+        Index a service, replacing its previous entry if it is already indexed.
+
+        :param slug: The slug of the service.
+        :param config: The configuration of the service.
+        """
+        info = config.info
+        fields = {"name": info.name, "categories": " ".join(info.categories), "description": info.description}
+        document: dict[str, float] = {}
+        for field, text in fields.items():
+            for word in set(tokenize(text)):
+                document[word] = document.get(word, 0.) + FIELD_WEIGHTS[field]
+        with self._lock:
+            self._remove(slug)
+            self._documents[slug] = document
+            self._names[slug] = info.name
+            self._categories[slug] = list(dict.fromkeys(info.categories))
+            for word, weight in document.items():
+                if word not in self._postings:
+                    self._postings[word] = {}
+                    for deletion in _deletions(word):
+                        self._deletions.setdefault(deletion, set()).add(word)
+                    self._vocabulary = None
+                self._postings[word][slug] = weight
+
+    def remove(self, slug: str) -> None:
+        """
+        Remove a service from the index, if it is indexed.
+
+        :param slug: The slug of the service.
+        """
+        with self._lock:
+            self._remove(slug)
+
+    def _remove(self, slug: str) -> None:
+        """
+        Remove a service from the index. The lock has to be held.
+
+        :param slug: The slug of the service.
+        """
+        document = self._documents.pop(slug, None)
+        if document is None:
+            return
+        del self._names[slug]
+        del self._categories[slug]
+        for word in document:
+            postings = self._postings[word]
+            del postings[slug]
+            if postings:
+                continue
+            del self._postings[word]
+            for deletion in _deletions(word):
+                words = self._deletions[deletion]
+                words.discard(word)
+                if not words:
+                    del self._deletions[deletion]
+            self._vocabulary = None
+
+    def _expand(self, term: str) -> dict[str, float]:
+        """
+        Find the indexed words a searched word matches. The lock has to be held.
+
+        :param term: The searched word.
+        :return: The weight of the match with every indexed word matched.
+        """
+        matches: dict[str, float] = {}
+        if len(term) >= FUZZY_MIN_LENGTH:
+            for deletion in _deletions(term):
+                for word in self._deletions.get(deletion, ()):
+                    if _within_one_edit(term, word):
+                        matches[word] = FUZZY_WEIGHT
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        for i in range(bisect.bisect_left(self._vocabulary, term), len(self._vocabulary)):
+            word = self._vocabulary[i]
+            if not word.startswith(term):
+                break
+            matches[word] = PREFIX_WEIGHT
+        if term in self._postings:
+            matches[term] = 1.
+        return matches
+
+    def _match(self, query: str) -> dict[str, float]:
+        """
+        Find the services matching all words of a search. The lock has to be held.
+
+        :param query: The search.
+        :return: The relevance of every service matched.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return {slug: 0. for slug in self._documents}
+        scores: Optional[dict[str, float]] = None
+        # the rarest words first, so that the candidates shrink as fast as possible
+        for term_scores in sorted((self._score(term) for term in terms), key=len):
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {slug: score + term_scores[slug] for slug, score in scores.items() if slug in term_scores}
+            if not scores:
+                break
+        return scores
+
+    def _score(self, term: str) -> dict[str, float]:
+        """
+        Score the services matching a searched word. The lock has to be held.
+
+        :param term: The searched word.
+        :return: The relevance of every service matched, by its best matching word.
+        """
+        scores: dict[str, float] = {}
+        for word, match_weight in self._expand(term).items():
+            for slug, weight in self._postings[word].items():
+                scores[slug] = max(scores.get(slug, 0.), weight * match_weight)
+        return scores
+
+    def search(self, query: str = "", category: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None) -> CatalogPage:
+        """
+        Search the catalog.
+
+        :param query: The words to search for, all services if empty.
+        :param category: The category to restrict the results to, case-insensitive, or None for all categories.
+        :param limit: The maximum number of services on the page.
+        :param cursor: The cursor of the page to get, as returned with the previous page, or None for the first page.
+        :raises ValueError: if the limit is not positive or the cursor is invalid.
+        :return: The page of results, with the number of results per category.
+        """
+        if limit < 1:
+            raise ValueError("The limit has to be positive.")
+        after = self._decode_cursor(cursor) if cursor is not None else None
+        with self._lock:
+            scores = self._match(query)
+            facets: dict[str, int] = {}
+            for slug in scores:
+                for label in self._categories[slug]:
+                    facets[label] = facets.get(label, 0) + 1
+            if category is not None:
+                category = category.lower()
+                scores = {slug: score for slug, score in scores.items() if any(label.lower() == category for label in self._categories[slug])}
+            keys = sorted((-score, self._names[slug].lower(), slug) for slug, score in scores.items())
+        start = bisect.bisect_right(keys, after) if after is not None else 0
+        page = keys[start:start + limit]
+        more = start + limit < len(keys)
+        return CatalogPage(
+            slugs=[slug for _, _, slug in page],
+            total=len(keys),
+            facets=dict(sorted(facets.items(), key=lambda item: (-item[1], item[0].lower()))),
+            cursor=self._encode_cursor(page[-1]) if more else None,
+        )
+
+    @staticmethod
+    def _encode_cursor(key: tuple[float, str, str]) -> str:
+        """
+        Encode the sort key of the last service of a page as an opaque cursor.
+
+        :param key: The sort key.
+        :return: The cursor.
+        """
+        return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[float, str, str]:
+        """
+        Decode a cursor into the sort key of the last service of the previous page.
+
+        :param cursor: The cursor.
+        :raises ValueError: if the cursor is invalid.
+        :return: The sort key.
+        """
+        try:
+            score, name, slug = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+            raise ValueError(f"Invalid cursor '{cursor}'.") from e
+        if not isinstance(score, (int, float)) or not isinstance(name, str) or not isinstance(slug, str):
+            raise ValueError(f"Invalid cursor '{cursor}'.")
+        return float(score), name, slug
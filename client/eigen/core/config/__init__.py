@@ -2,3 +2,4 @@ from .config import Config
 from .toml_config import TomlConfig
 from .service_config import ServiceConfig
 from .eigen_config import EigenConfig
+from .catalog_cache import CatalogCache
@@ -0,0 +1,189 @@
+from .service_config import ServiceConfig
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Optional
+import hashlib
+import logging
+import json
+import time
+import os
+
+@dataclass
+class CatalogEntry:
+    """
+    The compiled configuration of one service configuration file.
+    """
+    # None if the file was modified too recently for its modification time to be trusted
+    mtime_ns: Optional[int]
+    size: int
+    digest: str
+    # the validated configuration in its JSON form, free of types private to the TOML parser
+    config: dict
+
+class CatalogCache:
+    """
+    Compiled snapshot of the validated service configurations of a service directory.
+
+    Every configuration is stored in its JSON form, keyed by the path of its file and recorded with the
+    modification time, size and SHA-256 of the file. A file whose modification time and size are
+    unchanged is not read at all, a file that was touched but not changed is only hashed, and only
+    changed files are parsed and validated again. The snapshot is discarded as a whole when the
+    configuration model changes.
+    """
+    VERSION = 3
+    # modification times this close to the time a file was compiled may be followed by further
+    # changes within the resolution of the file system clock, such files are hashed the next time
+    RACY_NS = 2_000_000_000
+
+    def __init__(self, path: Path):
+        """
+        Initialize an empty cache. Nothing is read until the snapshot is loaded.
+
+        :param path: The path of the snapshot file.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, CatalogEntry] = {}
+        self._fingerprint = self.fingerprint()
+        self._dirty = False
+
+    @staticmethod
+    def fingerprint() -> str:
+        """
+        Identify the configuration model, so that snapshots taken with a different one are not used.
+
+        :return: A hash of the JSON schema of the service configuration.
+        """
+        schema = json.dumps(ServiceConfig.model_json_schema(by_alias=True), sort_keys=True)
+        return hashlib.sha256(f"{CatalogCache.VERSION}:{schema}".encode()).hexdigest()
+
+    def load(self) -> None:
+        """
+        Load the snapshot. A missing, unsafe, outdated or corrupt snapshot is ignored.
+        """
+        try:
+            with open(self.path, "rb") as file:
+                info = os.fstat(file.fileno())
+                # the snapshot stands in for the service configuration files
+                if info.st_uid != os.getuid() or info.st_mode & 0o022:
+                    logging.warning(f"Ignoring service catalog cache {self.path}, as others can write to it.")
+                    return
+                snapshot = json.load(file)
+            if not isinstance(snapshot, dict) or snapshot.get("fingerprint") != self._fingerprint:
+                self._dirty = True
+                return
+            entries = {key: CatalogEntry(**entry) for key, entry in snapshot["entries"].items()}
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable service catalog cache {self.path}: {e}")
+            self._dirty = True
+            return
+        self._entries = entries
+
+    def save(self) -> None:
+        """
+        Write the snapshot, if anything changed since it was loaded.
+
+        :raises OSError: if the snapshot cannot be written.
+        """
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(descriptor, "w") as file:
+                json.dump({"fingerprint": self._fingerprint, "entries": {key: asdict(entry) for key, entry in self._entries.items()}}, file)
+            os.replace(temporary, self.path)
+        except BaseException:
+            temporary.unlink(missing_ok=True)
+            raise
+        self._dirty = False
+
+    def get(self, filepath: Path, compile: Callable[[Path], ServiceConfig]) -> ServiceConfig:
+        """
+        Get the configuration of a file, from the snapshot if the file is unchanged.
+
+        :param filepath: The path of the service configuration file.
+        :param compile: A function loading and validating the configuration of a changed file.
+        :raises FileNotFoundError: If the service configuration file does not exist.
+        :raises ValidationError: If the service configuration is invalid.
+        :raises TomlDecodeError: If the file is not a valid TOML file.
+        :return: The configuration, a fresh copy on every call.
+        """
+        key = str(filepath.resolve())
+        info = filepath.stat()
+        entry = self._entries.get(key)
+        if entry is not None and entry.mtime_ns == info.st_mtime_ns and entry.size == info.st_size:
+            config = self._restore(filepath, entry)
+            if config is not None:
+                return config
+
+        digest = hashlib.sha256(filepath.read_bytes()).hexdigest()
+        if entry is not None and entry.digest == digest:
+            config = self._restore(filepath, entry)
+            if config is not None:
+                entry.mtime_ns, entry.size = self._trusted_mtime(info), info.st_size
+                self._dirty = True
+                return config
+
+        self.misses += 1
+        self._entries.pop(key, None)
+        self._dirty = True
+        config = compile(filepath)
+        try:
+            data = config.model_dump(mode="json", by_alias=True)
+        except Exception as e:
+            # not cached, the file is compiled again on the next load
+            logging.warning(f"Cannot cache the compiled configuration of {key}: {e}")
+            return config
+        self._entries[key] = CatalogEntry(self._trusted_mtime(info), info.st_size, digest, data)
+        return config
+
+    def digest(self, filepath: Path) -> Optional[str]:
+        """
+        Get the SHA-256 of a file as of the time its configuration was last compiled or found unchanged.
+
+        :param filepath: The path of the service configuration file.
+        :return: The digest, or None if the snapshot holds no configuration of the file.
+        """
+        entry = self._entries.get(str(filepath.resolve()))
+        return entry.digest if entry is not None else None
+
+    def _restore(self, filepath: Path, entry: CatalogEntry) -> Optional[ServiceConfig]:
+        """
+        Rebuild a compiled configuration.
+
+        :param filepath: The path of the service configuration file.
+        :param entry: The entry.
+        :return: The configuration, or None if it cannot be restored.
+        """
+        try:
+            config = ServiceConfig(filepath, entry.config)
+        except Exception as e:
+            logging.warning(f"Discarding compiled configuration of {filepath}: {e}")
+            return None
+        self.hits += 1
+        return config
+
+    def _trusted_mtime(self, info: os.stat_result) -> Optional[int]:
+        """
+        Get the modification time of a file to record, unless it is too recent to be trusted.
+
+        :param info: The status of the file.
+        :return: The modification time, or None if the file has to be hashed the next time.
+        """
+        return info.st_mtime_ns if time.time_ns() - info.st_mtime_ns > self.RACY_NS else None
+
+    def retain(self, filepaths: list[Path]) -> None:
+        """
+        Forget the configurations of all files but the given ones, e.g. of deleted files.
+
+        :param filepaths: The paths of the service configuration files to keep.
+        """
+        keys = {str(filepath.resolve()) for filepath in filepaths}
+        for key in [key for key in self._entries if key not in keys]:
+            del self._entries[key]
+            self._dirty = True
@@ -16,6 +16,10 @@ class EigenConfig(EigenConfigModel, TomlConfig):
 
         self.services._location = self.services.location
         self.services.location = self._path.parent / Path(self.services._location)
+        if self.assets.directory is None:
+            self.assets.directory = self.services.location.parent / "assets"
+        else:
+            self.assets.directory = self._path.parent / self.assets.directory
 
 
     @classmethod
@@ -1,11 +1,19 @@
 from toml import TomlDecodeError
-from . import EigenConfig, Service, Provider
-from .config import ServiceConfig
+from . import EigenConfig, Service, Provider, ProviderError, StatusSnapshot, AsyncService, as_async, OperationScheduler, Job, ServiceStatus, StorageManager, ServiceUsage, MetricsCollector, IdleManager, Reconciler, StatusWatcher, Subscription, StatusChange, HealthProber, AssetStore, ConfigWatcher, CatalogIndex
+from ..models import ConfigChange, ConfigChangeKind
+from .config import ServiceConfig, CatalogCache
 from ..providers import PROVIDERS
 from tomllib import load as load_toml
+import threading
 import logging
 from pydantic import ValidationError
 from pathlib import Path
+from typing import Callable, Iterable, Optional
+import time
+import re
+
+# an icon embedded into a service configuration file as a base64 data URL
+EMBEDDED_ICON = re.compile(r'^icon\s*=\s*"(?P<url>data:[^"]*)"', re.MULTILINE)
 
 class Eigen:
     """
@@ -17,9 +25,63 @@ class Eigen:
         if not self.config.services.lock_dir.exists():
             logging.info(f"Creating lock directory at {self.config.services.lock_dir}")
             self.config.services.lock_dir.mkdir(parents=True)
+        self.assets = AssetStore(self.config.assets.directory, self.config.assets.thumbnail_size)
+        self._catalog_cache = CatalogCache(self.config.services.catalog_cache or self.config.services.lock_dir / "catalog.cache")
+        self._catalog_cache.load()
         self._service_configs = self._gather_configs()
+        self.catalog = CatalogIndex(self._service_configs)
         self.services = self._gather_services()
+        self.async_services = self._gather_async_services()
+        self.scheduler = OperationScheduler(self.config.services.workers)
+        self.prober = HealthProber(self.services)
+        self.storage: Optional[StorageManager] = None
+        if self.config.storage is not None:
+            self.storage = StorageManager(self.services, self._provider, self.config.storage, self._on_over_quota)
+        self.metrics: Optional[MetricsCollector] = None
+        if self.config.metrics.enable:
+            self.metrics = MetricsCollector(self.services, self._provider, self.statuses, self.config.metrics)
+        self.idle = IdleManager(self.services, self.scheduler)
+        self.reconciler: Optional[Reconciler] = None
+        if self.config.reconcile is not None:
+            self.reconciler = Reconciler(self.services, self.statuses, self.scheduler, self.config.reconcile, self._over_quota)
+        providers = {service.config.provider.slug for service in self.services.values()}
+        self.watcher = StatusWatcher(self.services, self.statuses, [PROVIDERS[slug] for slug in providers])
+        self._prober_subscription: Optional[Subscription] = None
+        self._reload_lock = threading.Lock()
+        self._config_listeners: list[Callable[[ConfigChange], None]] = []
+        self.config_watcher: Optional[ConfigWatcher] = None
+        if self.config.services.watch:
+            self.config_watcher = ConfigWatcher(self.config.services.location, self.reload, self.config.services.watch_interval)
+        self._serving = False
+
+    def serve(self) -> None:
+        """
+        Start managing services in the background on behalf of a long-lived process, e.g. the web
+        interface. Short-lived processes, like a single CLI command, do not call this, so that they
+        never act on services another process is managing.
+        """
+        self._serving = True
+        if self.idle.slugs:
+            self.idle.start()
+        if self.storage is not None:
+            self.storage.start()
+        if self.reconciler is not None:
+            self.reconciler.start()
+        if self.metrics is not None:
+            self.metrics.start()
+        if self.config_watcher is not None:
+            self.config_watcher.start()
+        self._start_prober()
 
+    def _start_prober(self) -> None:
+        """
+        Start probing, once there are services with a health probe.
+        """
+        if not self.prober.slugs or self._prober_subscription is not None:
+            return
+        self.prober.start()
+        # probe services right after their status changed
+        self._prober_subscription = self.watcher.subscribe(self.prober.on_status_change)
 
     def _gather_configs(self) -> dict[str, ServiceConfig]:
         """
@@ -28,21 +90,122 @@ class Eigen:
         :return: A dictionary of service configs keyed by their slug.
         """
         service_dir = Path(self.config.services.location)
+        service_paths = [service_path for service_path in service_dir.glob("*.toml") if not service_path.is_dir()]
         service_configs = {}
-        for service_path in service_dir.glob("*.toml"):
-            if service_path.is_dir():
-                continue
+        for service_path in service_paths:
             slug = service_path.stem
             try:
-                service_configs[slug] = self._get_config(slug)
+                service_configs[slug] = self._catalog_cache.get(service_path, lambda _: self._get_config(slug))
             except ValidationError as e:
                 # invalid service configuration, log the error and continue
                 logging.error(f"Invalid service configuration for '{slug}': {e}")
             except TomlDecodeError as e:
                 # invalid TOML file, log the error and continue
                 logging.error(f"Invalid TOML file for service '{slug}': {e}")
+        self._catalog_cache.retain(service_paths)
+        try:
+            self._catalog_cache.save()
+        except OSError as e:
+            logging.warning(f"Cannot write the service catalog cache: {e}")
         return service_configs
 
+    def reload(self, slugs: Optional[Iterable[str]] = None) -> list[ConfigChange]:
+        """
+        Apply changes of service configuration files without restarting Eigen. Services whose file
+        was added are created, services whose file was removed are forgotten but not stopped, and
+        services whose configuration changed are reconfigured in place, keeping their lock and
+        their state. Files that are touched but unchanged, and invalid files, change nothing.
+
+        :param slugs: The slugs of the services whose files changed, or None to check all files.
+        :return: The changes applied, also passed to the listeners registered with `on_config_change`.
+        """
+        service_dir = Path(self.config.services.location)
+        with self._reload_lock:
+            if slugs is None:
+                slugs = {path.stem for path in service_dir.glob("*.toml") if not path.is_dir()} | set(self.services)
+            changes = []
+            for slug in sorted(slugs):
+                kind = self._reload_service(slug, service_dir / f"{slug}.toml")
+                if kind is not None:
+                    changes.append(ConfigChange(slug=slug, kind=kind, timestamp=time.time()))
+            self._catalog_cache.retain([path for path in service_dir.glob("*.toml") if not path.is_dir()])
+            try:
+                self._catalog_cache.save()
+            except OSError as e:
+                logging.warning(f"Cannot write the service catalog cache: {e}")
+        for change in changes:
+            logging.info(f"Service '{change.slug}' was {change.kind.value}.")
+            for listener in list(self._config_listeners):
+                try:
+                    listener(change)
+                except Exception as e:
+                    logging.error(f"Configuration change listener failed: {e}")
+        return changes
+
+    def _reload_service(self, slug: str, service_path: Path) -> Optional[ConfigChangeKind]:
+        """
+        Apply the current content of the configuration file of a service.
+
+        :param slug: The slug of the service.
+        :param service_path: The path of the configuration file of the service.
+        :return: The kind of change applied, or None if nothing changed.
+        """
+        if not service_path.is_file():
+            if slug not in self.services:
+                return None
+            self.catalog.remove(slug)
+            self.idle.untrack(slug)
+            self.prober.untrack(slug)
+            del self.async_services[slug]
+            del self.services[slug]
+            del self._service_configs[slug]
+            return ConfigChangeKind.REMOVED
+
+        digest = self._catalog_cache.digest(service_path)
+        try:
+            config = self._catalog_cache.get(service_path, lambda _: self._get_config(slug))
+        except (ValidationError, TomlDecodeError, OSError) as e:
+            logging.error(f"Invalid service configuration for '{slug}', keeping the previous one: {e}")
+            return None
+        previous = self._service_configs.get(slug)
+        if previous is not None and digest is not None and digest == self._catalog_cache.digest(service_path):
+            return None
+
+        service = self.services.get(slug)
+        try:
+            if service is not None and service.config.provider.slug == config.provider.slug:
+                service.reconfigure(config)
+            else:
+                if service is not None:
+                    logging.warning(f"Provider of service '{slug}' changed, it is managed by '{config.provider.slug}' from now on.")
+                service = self._create_service(slug, config)
+                self.watcher.attach(service)
+                self.services[slug] = service
+                self.async_services[slug] = as_async(service)
+        except (ValidationError, ValueError, ProviderError) as e:
+            logging.error(f"Invalid service configuration for '{slug}', keeping the previous one: {e}")
+            return None
+        self._service_configs[slug] = config
+        self.catalog.add(slug, config)
+        # apply changed idle policies and health probes, to replaced services as well
+        self.idle.track(service)
+        self.prober.track(service)
+        if self._serving:
+            if self.idle.slugs:
+                self.idle.start()
+            self._start_prober()
+        return ConfigChangeKind.ADDED if previous is None else ConfigChangeKind.UPDATED
+
+    def on_config_change(self, callback: Callable[[ConfigChange], None]) -> Callable[[], None]:
+        """
+        Register a function to be called with every change of a service configuration applied by `reload`.
+
+        :param callback: The function, called on the thread reloading the configurations.
+        :return: A function unregistering the callback.
+        """
+        self._config_listeners.append(callback)
+        return lambda: self._config_listeners.remove(callback) if callback in self._config_listeners else None
+
     def _gather_services(self) -> dict[str, ServiceConfig]:
         """
         Gather all services from the service configurations.
@@ -54,6 +217,46 @@ class Eigen:
             services[slug] = self._create_service(slug, service_config)
         return services
 
+    def _gather_async_services(self) -> dict[str, AsyncService]:
+        """
+        Gather asynchronous views of all services. Services of asynchronous providers are used
+        natively, all others run their operations in worker threads.
+
+        :return: A dictionary of asynchronous services keyed by their slug.
+        """
+        return {slug: as_async(service) for slug, service in self.services.items()}
+
+    def _provider(self, service: Service) -> Provider:
+        """
+        Get the provider of a service.
+
+        :param service: The service.
+        :return: The provider of the service.
+        """
+        return PROVIDERS[service.config.provider.slug]
+
+    def _on_over_quota(self, service: Service, usage: ServiceUsage) -> None:
+        """
+        Stop a running service exceeding its disk quota, if the storage policy says so.
+
+        :param service: The service exceeding its quota.
+        :param usage: The disk usage of the service.
+        """
+        if not self.config.storage.stop_over_quota or self.scheduler.is_pending(service.slug):
+            return
+        if service.status == ServiceStatus.RUNNING:
+            logging.warning(f"Stopping service '{service.slug}' as it exceeds its disk quota.")
+            self.scheduler.submit(service, "stop")
+
+    def _over_quota(self, service: Service) -> bool:
+        """
+        Check if a service is kept stopped for exceeding its disk quota.
+
+        :param service: The service.
+        :return: True if the storage policy stops the service for exceeding its quota, False otherwise.
+        """
+        return self.storage is not None and self.config.storage.stop_over_quota and service.slug in self.storage.over_quota()
+
     def _create_service(self, slug, service_config: ServiceConfig) -> Service:
         """
         Create a service instance from the given configuration.
@@ -68,6 +271,50 @@ class Eigen:
             raise ValueError(f"Provider '{service_config.provider.slug}' not found for service '{service_config.slug}'.")
         return provider.create_service(slug, service_config, self.config)
 
+    def statuses(self, slugs: Optional[list[str]] = None) -> StatusSnapshot:
+        """
+        Resolve the state of all services at once, with one bulk request per provider.
+
+        :param slugs: The slugs of the services to resolve, or None for all services.
+        :raises KeyError: If a slug does not belong to a known service.
+        :raises ServiceError: if the status cannot be retrieved.
+        :return: A snapshot of the states of the services.
+        """
+        services = [self.services[slug] for slug in slugs] if slugs is not None else list(self.services.values())
+        by_provider: dict[str, list[Service]] = {}
+        for service in services:
+            by_provider.setdefault(service.config.provider.slug, []).append(service)
+
+        snapshot = StatusSnapshot(timestamp=time.time())
+        for provider_slug, provider_services in by_provider.items():
+            snapshot = snapshot.merge(PROVIDERS[provider_slug].bulk_status(provider_services))
+        return self.prober.annotate(snapshot)
+
+    def subscribe(self, callback: Optional[Callable[[StatusChange], None]] = None, slugs: Optional[Iterable[str]] = None) -> Subscription:
+        """
+        Subscribe to the status changes of services instead of polling their status.
+
+        :param callback: A function called with every change on a thread of its own. If omitted,
+            the changes are consumed by iterating the subscription, synchronously or asynchronously.
+        :param slugs: The slugs of the services to receive changes of, or None for all services.
+        :return: The subscription, to be closed once no longer needed.
+        """
+        return self.watcher.subscribe(callback, slugs)
+
+    def start_enabled(self) -> list[Job]:
+        """
+        Start all enabled services that are installed but not running, in parallel.
+
+        :raises ServiceError: if the status cannot be retrieved.
+        :return: Handles for the submitted jobs.
+        """
+        snapshot = self.statuses()
+        services = [
+            service for slug, service in self.services.items()
+            if service.config.enable and snapshot[slug].installed and snapshot[slug].status == ServiceStatus.STOPPED
+        ]
+        return self.scheduler.submit_many(services, "start")
+
     def _get_config(self, slug: str) -> ServiceConfig:
         """
         Get the configuration for a service by its slug.
@@ -81,4 +328,45 @@ class Eigen:
         service_dir = self.config.services.location
         service_path = service_dir / f"{slug}.toml"
 
-        return ServiceConfig.load(service_path)
+        config = ServiceConfig.load(service_path)
+        self._store_icon(config)
+        return config
+
+    def _store_icon(self, config: ServiceConfig) -> None:
+        """
+        Move an icon embedded in a service configuration into the asset store, so that only a
+        reference to it is kept in memory.
+
+        :param config: The configuration of the service.
+        """
+        icon = config.info.icon
+        if not icon.startswith("data:"):
+            return
+        try:
+            config.info.icon = self.assets.import_data_url(icon)
+        except (ValueError, OSError) as e:
+            logging.warning(f"Cannot store the icon of '{config.info.name}': {e}")
+
+    def externalize_icons(self) -> list[str]:
+        """
+        Replace the icons embedded in service configuration files by references to the asset
+        store, so that the files no longer carry them. Nothing else in the files is changed.
+
+        :raises OSError: if a configuration file cannot be rewritten.
+        :return: The slugs of the services whose configuration file was rewritten.
+        """
+        rewritten = []
+        for slug in self._service_configs:
+            path = self.config.services.location / f"{slug}.toml"
+            text = path.read_text()
+            match = EMBEDDED_ICON.search(text)
+            if match is None:
+                continue
+            try:
+                reference = self.assets.import_data_url(match.group("url"))
+            except ValueError as e:
+                logging.warning(f"Cannot store the icon of '{slug}': {e}")
+                continue
+            path.write_text(text[:match.start("url")] + reference + text[match.end("url"):])
+            rewritten.append(slug)
+        return rewritten
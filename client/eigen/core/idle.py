@@ -0,0 +1,298 @@
+from .service import Service, ServiceError, ServiceStatus
+from .scheduler import OperationScheduler
+from ..models import IdleAction, WakeStats
+from collections import deque
+from typing import Optional
+import numpy as np
+import threading
+import asyncio
+import logging
+import time
+
+TARGET_HOST = "127.0.0.1"
+# operations suspending a service for being idle, and waking it again
+SUSPEND = {IdleAction.PAUSE: "pause", IdleAction.STOP: "stop"}
+WAKE = {ServiceStatus.PAUSED: ("unpause", IdleAction.PAUSE), ServiceStatus.STOPPED: ("start", IdleAction.STOP)}
+
+class _IdleState:
+    """
+    Traffic and wake-up bookkeeping of one service with an idle policy.
+    """
+    LATENCY_SAMPLES = 100
+
+    def __init__(self, service: Service):
+        self.service = service
+        # the policy the service is managed by, kept as it was when the service was tracked
+        self.idle = service.config.idle
+        self.connections = 0
+        self.last_activity = time.monotonic()
+        self.waking: Optional[asyncio.Future] = None
+        self.latencies: deque[tuple[IdleAction, float]] = deque(maxlen=self.LATENCY_SAMPLES)
+
+
+class IdleManager:
+    """
+    Suspends services with an idle policy while nobody uses them and wakes them on demand.
+
+    For every such service a listener accepts connections on the port of the service and forwards
+    them to the port the service actually listens on, keeping track of the traffic. Once a service
+    has seen no traffic for the configured time, it is paused or stopped. The next connection is
+    held until the service has been woken and is ready, then forwarded. All listeners share one
+    event loop on a background thread; operations go through the scheduler.
+    """
+    CHECK_INTERVAL = 10
+    POLL_INTERVAL = .1
+    BUFFER_SIZE = 65536
+
+    def __init__(self, services: dict[str, Service], scheduler: OperationScheduler):
+        """
+        Initialize the idle manager. Nothing is listened on until it is started.
+
+        :param services: The services, keyed by their slug. Only services with an idle policy are managed.
+        :param scheduler: The scheduler to run suspend and wake operations on.
+        """
+        self._scheduler = scheduler
+        self._states = {slug: _IdleState(service) for slug, service in services.items() if service.config.idle is not None}
+        # listeners of the services whose port could be bound, only those are suspended
+        self._servers: dict[str, asyncio.AbstractServer] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def slugs(self) -> list[str]:
+        """
+        Get the slugs of the services managed.
+
+        :return: The slugs of all services with an idle policy.
+        """
+        return list(self._states)
+
+    def start(self) -> None:
+        """
+        Start listening in the background, if not already running.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        ready = threading.Event()
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(ready),), name="eigen-idle", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self) -> None:
+        """
+        Stop listening. Established connections are closed.
+        """
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    async def _main(self, ready: threading.Event) -> None:
+        """
+        Run all listeners and the idle check until stopped.
+
+        :param ready: Set once the listeners are bound.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        try:
+            for state in list(self._states.values()):
+                await self._listen(state)
+        finally:
+            ready.set()
+        watcher = asyncio.create_task(self._watch())
+        await self._stopping.wait()
+        watcher.cancel()
+        for server in self._servers.values():
+            server.close()
+        self._servers.clear()
+
+    async def _listen(self, state: _IdleState) -> None:
+        """
+        Listen on the port of a service. A service whose port cannot be bound is left alone, as
+        its traffic does not pass through this process.
+
+        :param state: The idle state of the service.
+        """
+        idle = state.idle
+        try:
+            self._servers[state.service.slug] = await asyncio.start_server(
+                lambda reader, writer: self._handle(state, reader, writer),
+                idle.listen_host, idle.port,
+            )
+        except OSError as e:
+            logging.error(f"Cannot listen on port {idle.port} for '{state.service.slug}', leaving it running: {e}")
+
+    def track(self, service: Service) -> None:
+        """
+        Manage a service by its current idle policy, e.g. after its configuration was reloaded. A
+        service without an idle policy is no longer managed.
+
+        :param service: The service.
+        """
+        state = self._states.get(service.slug)
+        if state is not None and state.service is service and state.idle == service.config.idle:
+            return
+        self.untrack(service.slug)
+        if service.config.idle is None:
+            return
+        state = self._states[service.slug] = _IdleState(service)
+        if self._loop is not None and not self._stopping.is_set():
+            asyncio.run_coroutine_threadsafe(self._listen(state), self._loop).result()
+
+    def untrack(self, slug: str) -> None:
+        """
+        Stop managing a service, e.g. because its configuration was removed. Its listener is closed.
+
+        :param slug: The slug of the service.
+        """
+        if self._states.pop(slug, None) is None:
+            return
+        if self._loop is not None and not self._stopping.is_set():
+            self._loop.call_soon_threadsafe(self._close, slug)
+
+    def _close(self, slug: str) -> None:
+        """
+        Close the listener of a service, if it has one.
+
+        :param slug: The slug of the service.
+        """
+        server = self._servers.pop(slug, None)
+        if server is not None:
+            server.close()
+
+    async def _watch(self) -> None:
+        """
+        Periodically suspend services listened for that have been idle for long enough.
+        """
+        while True:
+            await asyncio.sleep(self.CHECK_INTERVAL)
+            for state in [state for slug, state in list(self._states.items()) if slug in self._servers]:
+                try:
+                    await self._check(state)
+                except ServiceError as e:
+                    logging.warning(f"Failed to check if '{state.service.slug}' is idle: {e}")
+
+    async def _check(self, state: _IdleState) -> None:
+        """
+        Suspend a service if it has had no connections and no traffic for the configured time.
+
+        :param state: The idle state of the service.
+        :raises ServiceError: if the status cannot be retrieved.
+        """
+        service = state.service
+        idle = state.idle
+        if state.connections or state.waking is not None or self._scheduler.is_pending(service.slug):
+            return
+        if time.monotonic() - state.last_activity < idle.after * 60:
+            return
+        if await asyncio.to_thread(lambda: service.status) != ServiceStatus.RUNNING:
+            return
+        logging.info(f"Service '{service.slug}' is idle, suspending it ({idle.action.value}).")
+        self._scheduler.submit(service, SUSPEND[idle.action])
+
+    async def _wake(self, state: _IdleState) -> None:
+        """
+        Wake a service, joining a wake-up already in progress.
+
+        :param state: The idle state of the service.
+        :raises Exception: the error the wake operation failed with.
+        """
+        if state.waking is None:
+            state.waking = asyncio.ensure_future(self._resume(state))
+            state.waking.add_done_callback(lambda _: setattr(state, "waking", None))
+        await asyncio.shield(state.waking)
+
+    async def _resume(self, state: _IdleState) -> None:
+        """
+        Resume a suspended service and wait until it is ready, recording how long it took.
+
+        :param state: The idle state of the service.
+        :raises ServiceError: if the service does not become ready in time.
+        """
+        service = state.service
+        started = time.monotonic()
+        deadline = started + state.idle.wake_timeout
+        # let a queued suspend finish first, so it does not suspend the service right after waking it
+        while self._scheduler.is_pending(service.slug):
+            await asyncio.sleep(self.POLL_INTERVAL)
+        wake = WAKE.get(await asyncio.to_thread(lambda: service.status))
+        if wake is None:
+            return
+        operation, action = wake
+        job = self._scheduler.submit(service, operation)
+        await asyncio.to_thread(job.result, state.idle.wake_timeout)
+        # the lock settles once the service passes its readiness check
+        while await asyncio.to_thread(service.is_busy):
+            if time.monotonic() >= deadline:
+                raise ServiceError(f"Service '{service.slug}' did not become ready in time.")
+            await asyncio.sleep(self.POLL_INTERVAL)
+        latency = time.monotonic() - started
+        state.latencies.append((action, latency))
+        logging.info(f"Woke service '{service.slug}' from {action.value} in {latency:.2f}s.")
+
+    async def _handle(self, state: _IdleState, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Forward a connection to the service, waking the service first if necessary.
+
+        :param state: The idle state of the service.
+        :param reader: The reader of the incoming connection.
+        :param writer: The writer of the incoming connection.
+        """
+        state.connections += 1
+        state.last_activity = time.monotonic()
+        try:
+            try:
+                await self._wake(state)
+                upstream_reader, upstream_writer = await asyncio.open_connection(TARGET_HOST, state.idle.target_port)
+            except Exception as e:
+                logging.warning(f"Cannot forward connection to '{state.service.slug}': {e}")
+                writer.close()
+                return
+            await asyncio.gather(self._pipe(state, reader, upstream_writer), self._pipe(state, upstream_reader, writer))
+        finally:
+            state.connections -= 1
+            state.last_activity = time.monotonic()
+
+    async def _pipe(self, state: _IdleState, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Copy data from one side of a forwarded connection to the other until it is closed.
+
+        :param state: The idle state of the service.
+        :param reader: The side to read from.
+        :param writer: The side to write to.
+        """
+        try:
+            while data := await reader.read(self.BUFFER_SIZE):
+                state.last_activity = time.monotonic()
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def wake_stats(self, slug: str) -> list[WakeStats]:
+        """
+        Get the latency of the recent wake-ups of a service, per way it had been suspended.
+
+        :param slug: The slug of the service.
+        :return: The statistics, one per suspend action that has been woken from.
+        """
+        state = self._states.get(slug)
+        if state is None:
+            return []
+        samples = list(state.latencies)
+        stats = []
+        for action in IdleAction:
+            latencies = np.array([latency for sample_action, latency in samples if sample_action == action])
+            if not len(latencies):
+                continue
+            stats.append(WakeStats(
+                action=action,
+                count=len(latencies),
+                last=latencies[-1],
+                mean=latencies.mean(),
+                p95=np.percentile(latencies, 95),
+                max=latencies.max(),
+            ))
+        return stats
@@ -0,0 +1,217 @@
+from .service import Service, ServiceError, ServiceStatus, StatusSnapshot, MetricsSample
+from .provider import Provider
+from ..models import EigenMetrics
+from typing import Callable, Optional
+import numpy as np
+import threading
+import logging
+
+FIELDS = ("cpu_percent", "memory_bytes", "memory_limit", "net_rx_rate", "net_tx_rate", "block_read_rate", "block_write_rate")
+
+class MetricsBuffer:
+    """
+    Fixed-size ring buffer of the metrics samples of one service, backed by a single NumPy array.
+
+    Once full, every new sample overwrites the oldest one, so memory use does not grow with the
+    time a service has been running.
+    """
+    def __init__(self, capacity: int):
+        """
+        Initialize an empty buffer.
+
+        :param capacity: The maximum number of samples kept.
+        """
+        self.capacity = capacity
+        # column 0 holds the timestamp, the others the fields in the order of FIELDS
+        self._data = np.zeros((capacity, len(FIELDS) + 1), dtype=np.float64)
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, sample: MetricsSample) -> None:
+        """
+        Add a sample, overwriting the oldest one if the buffer is full.
+
+        :param sample: The sample to add.
+        """
+        row = [sample.timestamp, *(getattr(sample, field) for field in FIELDS)]
+        with self._lock:
+            self._data[self._next] = row
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def _ordered(self, column: int) -> np.ndarray:
+        """
+        Get a copy of a column, oldest sample first.
+
+        :param column: The index of the column.
+        :return: The values of the column.
+        """
+        with self._lock:
+            if self._count < self.capacity:
+                return self._data[:self._count, column].copy()
+            return np.roll(self._data[:, column], -self._next)
+
+    def timestamps(self) -> np.ndarray:
+        """
+        Get the timestamps of the samples, oldest first.
+
+        :return: The timestamps as Unix time.
+        """
+        return self._ordered(0)
+
+    def series(self, field: str) -> np.ndarray:
+        """
+        Get the values of one field, oldest first.
+
+        :param field: The name of the field, e.g. `cpu_percent`.
+        :raises ValueError: if the field is unknown.
+        :return: The values of the field.
+        """
+        if field not in FIELDS:
+            raise ValueError(f"Unknown metrics field '{field}', must be one of {FIELDS}.")
+        return self._ordered(FIELDS.index(field) + 1)
+
+    def latest(self) -> Optional[MetricsSample]:
+        """
+        Get the most recent sample.
+
+        :return: The most recent sample, or None if the buffer is empty.
+        """
+        with self._lock:
+            if not self._count:
+                return None
+            row = self._data[(self._next - 1) % self.capacity]
+        return MetricsSample(timestamp=row[0], **{field: row[index + 1] for index, field in enumerate(FIELDS)})
+
+
+class MetricsCollector:
+    """
+    Collects resource usage metrics of all running services into per-service ring buffers.
+
+    Every running service gets one long-lived stream from its provider, consumed by a thread of
+    its own. The collector only checks periodically which services started or stopped running.
+    """
+    def __init__(self, services: dict[str, Service], provider_of: Callable[[Service], Provider],
+                 statuses: Callable[[], StatusSnapshot], policy: EigenMetrics):
+        """
+        Initialize the collector. Nothing is collected until it is started.
+
+        :param services: The services to observe, keyed by their slug. The dictionary may change while collecting.
+        :param provider_of: A callable returning the provider of a service.
+        :param statuses: A callable returning a status snapshot of all services.
+        :param policy: The metrics configuration.
+        """
+        self.services = services
+        self.policy = policy
+        self._provider_of = provider_of
+        self._statuses = statuses
+
+        self._lock = threading.Lock()
+        self._buffers: dict[str, MetricsBuffer] = {}
+        self._streams: dict[str, threading.Event] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start collecting in the background, if not already running.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="eigen-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop collecting and close all streams.
+        """
+        self._stopped.set()
+        with self._lock:
+            for stopped in self._streams.values():
+                stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.update()
+            except ServiceError as e:
+                logging.warning(f"Failed to update metrics streams: {e}")
+            self._stopped.wait(self.policy.interval)
+
+    def update(self) -> None:
+        """
+        Open streams for services that started running and close those of services that stopped.
+
+        :raises ServiceError: if the status cannot be retrieved.
+        """
+        snapshot = self._statuses()
+        running = {slug for slug, state in snapshot.states.items() if state.status == ServiceStatus.RUNNING}
+        with self._lock:
+            for slug in set(self._buffers) - set(self.services):
+                del self._buffers[slug]
+            for slug, stopped in list(self._streams.items()):
+                if slug not in running:
+                    stopped.set()
+            for slug in running - set(self._streams):
+                service = self.services.get(slug)
+                if service is None:
+                    continue
+                stopped = self._streams[slug] = threading.Event()
+                threading.Thread(target=self._follow, args=(service, stopped), name=f"eigen-metrics-{slug}", daemon=True).start()
+
+    def _follow(self, service: Service, stopped: threading.Event) -> None:
+        """
+        Consume the metrics stream of a service until it ends or is no longer wanted.
+
+        :param service: The service to observe.
+        :param stopped: Set when the stream should be closed.
+        """
+        stream = None
+        try:
+            stream = self._provider_of(service).stream_metrics(service, stopped)
+            if stream is None:
+                # the provider does not collect metrics, keep the entry so it is not asked again
+                stopped.wait()
+                return
+            for sample in stream:
+                if stopped.is_set():
+                    break
+                self.buffer(service.slug, create=True).append(sample)
+        except ServiceError as e:
+            logging.warning(f"Metrics stream of '{service.slug}' failed: {e}")
+        finally:
+            # let the provider release the stream, e.g. close its connection to the daemon
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            with self._lock:
+                if self._streams.get(service.slug) is stopped:
+                    del self._streams[service.slug]
+
+    def buffer(self, slug: str, create: bool = False) -> Optional[MetricsBuffer]:
+        """
+        Get the metrics buffer of a service.
+
+        :param slug: The slug of the service.
+        :param create: Whether to create the buffer if it does not exist yet.
+        :return: The buffer, or None if no metrics have been collected for the service.
+        """
+        with self._lock:
+            if create and slug not in self._buffers:
+                self._buffers[slug] = MetricsBuffer(self.policy.capacity)
+            return self._buffers.get(slug)
+
+    def latest(self, slug: str) -> Optional[MetricsSample]:
+        """
+        Get the most recent metrics sample of a service.
+
+        :param slug: The slug of the service.
+        :return: The most recent sample, or None if no metrics have been collected for the service.
+        """
+        buffer = self.buffer(slug)
+        return buffer.latest() if buffer is not None else None
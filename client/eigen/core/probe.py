@@ -0,0 +1,291 @@
+from .service import Service, ServiceError, ServiceStatus, StatusSnapshot, StatusChange
+from ..models import ServiceProbe, ProbeType, ServiceHealth
+from collections import deque
+from typing import Optional
+import numpy as np
+import threading
+import asyncio
+import logging
+import time
+
+class _ProbeState:
+    """
+    Probe results and schedule of one service with a health probe.
+    """
+    LATENCY_SAMPLES = 100
+
+    def __init__(self, service: Service):
+        self.service = service
+        # the probe the service is checked with, kept as it was when the service was tracked
+        self.probe = service.config.probe
+        self.interval = self.probe.min_interval
+        self.healthy: Optional[bool] = None
+        self.checked_at: Optional[float] = None
+        self.failures = 0
+        self.error: Optional[str] = None
+        self.latencies: deque[float] = deque(maxlen=self.LATENCY_SAMPLES)
+        # set to probe right away, e.g. after the status of the service changed
+        self.nudged: Optional[asyncio.Event] = None
+
+
+class HealthProber:
+    """
+    Probes services with a health probe over HTTP or TCP and measures how long they take to answer.
+
+    Services are only probed while running. The interval between two probes of a service adapts:
+    it starts at `min-interval` and doubles with every probe that agrees with the previous one, up
+    to `max-interval`. A change of the outcome or of the status of the service resets it, so that
+    services are probed often while they change and rarely while they are stable. A service becomes
+    unhealthy after `unhealthy-after` failed probes in a row and healthy again after one successful
+    probe. All probes share one event loop on a background thread.
+    """
+    USER_AGENT = "eigen-probe"
+
+    def __init__(self, services: dict[str, Service]):
+        """
+        Initialize the prober. Nothing is probed until it is started.
+
+        :param services: The services, keyed by their slug. Only services with a health probe are probed.
+        """
+        self._states = {slug: _ProbeState(service) for slug, service in services.items() if service.config.probe is not None}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def slugs(self) -> list[str]:
+        """
+        Get the slugs of the services probed.
+
+        :return: The slugs of all services with a health probe.
+        """
+        return list(self._states)
+
+    def start(self) -> None:
+        """
+        Start probing in the background, if not already running.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        ready = threading.Event()
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(ready),), name="eigen-probe", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self) -> None:
+        """
+        Stop probing.
+        """
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    def nudge(self, slug: str) -> None:
+        """
+        Probe a service right away and often again for a while, e.g. because its status changed.
+
+        :param slug: The slug of the service.
+        """
+        state = self._states.get(slug)
+        if state is None or self._loop is None or state.nudged is None:
+            return
+        self._loop.call_soon_threadsafe(state.nudged.set)
+
+    def on_status_change(self, change: StatusChange) -> None:
+        """
+        Nudge the probe of a service whose status changed, to be used as a status change callback.
+
+        :param change: The status change.
+        """
+        self.nudge(change.slug)
+
+    async def _main(self, ready: threading.Event) -> None:
+        """
+        Run the probes of all services until stopped.
+
+        :param ready: Set once the probes are scheduled.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for state in list(self._states.values()):
+            self._spawn(state)
+        ready.set()
+        await self._stopping.wait()
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+    def _spawn(self, state: _ProbeState) -> None:
+        """
+        Start probing a service, replacing the task probing it before. Runs on the event loop.
+
+        :param state: The probe state of the service.
+        """
+        slug = state.service.slug
+        self._cancel(slug)
+        if self._states.get(slug) is not state:
+            # untracked or replaced in the meantime
+            return
+        state.nudged = asyncio.Event()
+        self._tasks[slug] = asyncio.create_task(self._watch(state))
+
+    def _cancel(self, slug: str) -> None:
+        """
+        Stop probing a service. Runs on the event loop.
+
+        :param slug: The slug of the service.
+        """
+        task = self._tasks.pop(slug, None)
+        if task is not None:
+            task.cancel()
+
+    def track(self, service: Service) -> None:
+        """
+        Probe a service by its current health probe, e.g. after its configuration was reloaded. A
+        service without a health probe is no longer probed.
+
+        :param service: The service.
+        """
+        state = self._states.get(service.slug)
+        if state is not None and state.service is service and state.probe == service.config.probe:
+            return
+        self.untrack(service.slug)
+        if service.config.probe is None:
+            return
+        state = self._states[service.slug] = _ProbeState(service)
+        if self._loop is not None and not self._stopping.is_set():
+            self._loop.call_soon_threadsafe(self._spawn, state)
+
+    def untrack(self, slug: str) -> None:
+        """
+        Stop probing a service, e.g. because its configuration was removed.
+
+        :param slug: The slug of the service.
+        """
+        if self._states.pop(slug, None) is None:
+            return
+        if self._loop is not None and not self._stopping.is_set():
+            self._loop.call_soon_threadsafe(self._cancel, slug)
+
+    async def _watch(self, state: _ProbeState) -> None:
+        """
+        Probe a service at its adaptive interval.
+
+        :param state: The probe state of the service.
+        """
+        probe = state.probe
+        while True:
+            nudged = state.nudged.is_set()
+            state.nudged.clear()
+            try:
+                await self._check(state, nudged)
+            except Exception as e:
+                logging.warning(f"Failed to probe '{state.service.slug}': {e}")
+            try:
+                await asyncio.wait_for(state.nudged.wait(), state.interval)
+            except asyncio.TimeoutError:
+                pass
+            if state.nudged.is_set():
+                state.interval = probe.min_interval
+
+    async def _check(self, state: _ProbeState, nudged: bool) -> None:
+        """
+        Probe a service once if it is running, and schedule the next probe.
+
+        :param state: The probe state of the service.
+        :param nudged: Whether the probe was asked for out of schedule.
+        :raises ServiceError: if the status cannot be retrieved.
+        """
+        service = state.service
+        probe = state.probe
+        previous = state.healthy
+        if await asyncio.to_thread(lambda: service.status) != ServiceStatus.RUNNING:
+            state.healthy, state.failures, state.error = None, 0, None
+        else:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.probe(probe), probe.timeout)
+            except (ServiceError, OSError, asyncio.TimeoutError) as e:
+                state.failures += 1
+                state.error = str(e) or type(e).__name__
+                if state.failures >= probe.unhealthy_after:
+                    state.healthy = False
+            else:
+                state.latencies.append(time.perf_counter() - started)
+                state.healthy, state.failures, state.error = True, 0, None
+            state.checked_at = time.time()
+            if state.healthy != previous:
+                logging.info(f"Service '{service.slug}' is {'healthy' if state.healthy else 'unhealthy'}.")
+
+        # keep probing often while a failure is not yet confirmed
+        if nudged or state.healthy != previous or 0 < state.failures < probe.unhealthy_after:
+            state.interval = probe.min_interval
+        else:
+            state.interval = min(state.interval * 2, probe.max_interval)
+
+    async def probe(self, probe: ServiceProbe) -> None:
+        """
+        Run a probe once.
+
+        :param probe: The probe.
+        :raises ServiceError: if the service answers with an unexpected status.
+        :raises OSError: if the service cannot be connected to.
+        """
+        reader, writer = await asyncio.open_connection(probe.host, probe.port)
+        try:
+            if probe.type == ProbeType.TCP:
+                return
+            writer.write((
+                f"GET {probe.path} HTTP/1.1\r\n"
+                f"Host: {probe.host}:{probe.port}\r\n"
+                f"User-Agent: {self.USER_AGENT}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode())
+            await writer.drain()
+            line = await reader.readline()
+            parts = line.decode("latin-1").split()
+            if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+                raise ServiceError(f"Invalid HTTP response: {line[:64]!r}")
+            status = int(parts[1])
+            healthy = status in probe.expect if probe.expect else status < 400
+            if not healthy:
+                raise ServiceError(f"HTTP status {status}")
+        finally:
+            writer.close()
+
+    def health(self, slug: str) -> Optional[ServiceHealth]:
+        """
+        Get the outcome of the recent probes of a service.
+
+        :param slug: The slug of the service.
+        :return: The health of the service, or None if it has no health probe.
+        """
+        state = self._states.get(slug)
+        if state is None:
+            return None
+        latencies = np.array(state.latencies)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (None, None, None)
+        return ServiceHealth(
+            healthy=state.healthy,
+            checked_at=state.checked_at,
+            failures=state.failures,
+            error=state.error,
+            interval=state.interval,
+            samples=len(latencies),
+            p50=p50,
+            p95=p95,
+            p99=p99,
+        )
+
+    def annotate(self, snapshot: StatusSnapshot) -> StatusSnapshot:
+        """
+        Add the outcome of the probes to the states of a snapshot.
+
+        :param snapshot: The snapshot.
+        :return: The same snapshot, with `healthy` set for running services that have been probed.
+        """
+        for slug, state in snapshot.states.items():
+            probe_state = self._states.get(slug)
+            if probe_state is not None and state.status == ServiceStatus.RUNNING:
+                state.healthy = probe_state.healthy
+        return snapshot
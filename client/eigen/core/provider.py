@@ -1,5 +1,9 @@
 from abc import ABC, abstractmethod
-from . import Service, ServiceConfig, ServiceError, EigenConfig
+from . import Service, ServiceConfig, ServiceError, EigenConfig, StatusSnapshot, ServiceUsage, MetricsSample
+from ..models import EigenStorage
+from typing import Callable, Iterator, Optional
+import threading
+import time
 
 class ProviderError(Exception):
     pass
@@ -20,3 +24,63 @@ class Provider(ABC):
         :raises ProviderError: if the service cannot be obtained.
         """
         ...
+
+    def bulk_status(self, services: list[Service]) -> StatusSnapshot:
+        """
+        Resolve the state of several services of this provider at once.
+
+        Providers should override this to resolve all services with a fixed number of requests.
+        The default implementation queries every service on its own.
+
+        :param services: The services to resolve.
+        :raises ServiceError: if the status cannot be retrieved.
+        :return: A snapshot of the states of the services.
+        """
+        return StatusSnapshot(timestamp=time.time(), states={service.slug: service.state for service in services})
+
+    def service_usage(self, service: Service) -> Optional[ServiceUsage]:
+        """
+        Measure the disk usage of a service of this provider.
+
+        :param service: The service to measure.
+        :raises ServiceError: if the usage cannot be measured.
+        :return: The disk usage, or None if the provider does not track disk usage.
+        """
+        return None
+
+    def prune(self, policy: EigenStorage, services: list[Service]) -> int:
+        """
+        Free disk space no service of this provider depends on, as far as the policy allows.
+
+        :param policy: The storage policy deciding what may be pruned.
+        :param services: The services of this provider, whose data must be kept.
+        :raises ServiceError: if pruning fails.
+        :return: The number of bytes reclaimed.
+        """
+        return 0
+
+    def stream_metrics(self, service: Service, stopped: threading.Event) -> Optional[Iterator[MetricsSample]]:
+        """
+        Open a stream of resource usage samples of a running service of this provider.
+
+        The stream should end once the service stops running or `stopped` is set, and should
+        push samples as they become available rather than being polled.
+
+        :param service: The service to observe.
+        :param stopped: Set when the caller is no longer interested in samples.
+        :raises ServiceError: if the stream cannot be opened.
+        :return: An iterator over the samples, or None if the provider does not collect metrics.
+        """
+        return None
+
+    def on_change(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Call a function whenever the state of services of this provider may have changed.
+
+        Providers learning about changes as they happen, e.g. from an event stream, should
+        override this. The services of all other providers are polled for changes instead.
+
+        :param callback: The function to call. It must return quickly.
+        :return: A function to stop calling the callback.
+        """
+        return lambda: None
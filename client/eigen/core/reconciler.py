@@ -0,0 +1,177 @@
+from .service import Service, ServiceError, ServiceStatus, StatusSnapshot, ServiceState
+from .scheduler import OperationScheduler, Job, JobState
+from ..models import EigenReconcile
+from typing import Callable, Optional
+import threading
+import logging
+import time
+
+class Reconciler:
+    """
+    Brings services into the state their configuration asks for.
+
+    Every interval the desired state, given by the `enable` flag and the options of each service,
+    is compared with one status snapshot of all services. Enabled services are installed, started,
+    unpaused or, if in error, restarted; disabled services are stopped; services without an
+    `enable` flag are left alone. Installed services whose options differ from their configuration
+    are recreated. At most `max_actions` services are acted on per round, all in parallel through
+    the scheduler, and a service whose action failed is left alone for a growing backoff.
+    """
+    def __init__(self, services: dict[str, Service], statuses: Callable[[], StatusSnapshot], scheduler: OperationScheduler,
+                 policy: EigenReconcile, hold: Optional[Callable[[Service], bool]] = None):
+        """
+        Initialize the reconciler. Nothing is compared until it is started.
+
+        :param services: The services to reconcile, keyed by their slug. The dictionary may change while reconciling.
+        :param statuses: A callable returning a status snapshot of all services.
+        :param scheduler: The scheduler to run the actions on.
+        :param policy: The reconciliation policy.
+        :param hold: A callable returning True for services that must not be acted on for now,
+            e.g. because they were stopped for exceeding their quota.
+        """
+        self.services = services
+        self.policy = policy
+        self._statuses = statuses
+        self._scheduler = scheduler
+        self._hold = hold
+
+        self._lock = threading.Lock()
+        self._jobs: dict[str, list[Job]] = {}
+        self._failures: dict[str, int] = {}
+        self._retry_at: dict[str, float] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start reconciling in the background, if not already running.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="eigen-reconcile", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop reconciling.
+        """
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.policy.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logging.error(f"Reconciliation failed: {e}")
+
+    def tick(self) -> dict[str, list[str]]:
+        """
+        Compare the desired with the observed state once and submit the actions to close the gap.
+
+        :raises ServiceError: if the status snapshot cannot be taken.
+        :return: The operations submitted, keyed by the slug of the service.
+        """
+        self._collect()
+        snapshot = self._statuses()
+        now = time.time()
+        submitted: dict[str, list[str]] = {}
+        for slug in sorted(self.services):
+            if len(submitted) >= self.policy.max_actions:
+                break
+            service = self.services[slug]
+            state = snapshot.get(slug)
+            if state is None or not self._actionable(service, now):
+                continue
+            try:
+                operations = self.plan(service, state)
+            except ServiceError as e:
+                logging.warning(f"Cannot reconcile '{slug}': {e}")
+                continue
+            if not operations:
+                continue
+            logging.info(f"Reconciling '{slug}' ({state.status.value}): {', '.join(operations)}.")
+            jobs = [self._scheduler.submit(service, operation) for operation in operations]
+            with self._lock:
+                self._jobs[slug] = jobs
+            submitted[slug] = operations
+        return submitted
+
+    def _actionable(self, service: Service, now: float) -> bool:
+        """
+        Check if a service may be acted on: it is neither waiting for earlier actions, nor backing
+        off after failed ones, nor held.
+
+        :param service: The service.
+        :param now: The current time.
+        :return: True if the service may be acted on, False otherwise.
+        """
+        if self._scheduler.is_pending(service.slug) or service.slug in self._jobs:
+            return False
+        if now < self._retry_at.get(service.slug, 0):
+            return False
+        return self._hold is None or not self._hold(service)
+
+    def plan(self, service: Service, state: ServiceState) -> list[str]:
+        """
+        Compute the operations that bring a service into its desired state.
+
+        :param service: The service.
+        :param state: The observed state of the service.
+        :raises ServiceError: if the service cannot be inspected for drift.
+        :return: The operations to run in order, empty if the service is in its desired state or
+            cannot be acted on right now.
+        """
+        enable = service.config.enable
+        if enable is None or state.busy or state.progress is not None:
+            return []
+        status = state.status
+        if status in (ServiceStatus.UPDATING, ServiceStatus.RESTARTING, ServiceStatus.UNKNOWN):
+            return []
+        if not enable:
+            return ["stop"] if status in (ServiceStatus.RUNNING, ServiceStatus.PAUSED) else []
+
+        if not state.installed:
+            return ["install", "start"]
+        operations = []
+        if self.policy.recreate and service.has_drifted():
+            operations.append("recreate")
+        # services with an idle policy are paused or stopped on purpose and woken on demand
+        suspended = service.config.idle is not None and status in (ServiceStatus.PAUSED, ServiceStatus.STOPPED)
+        if status == ServiceStatus.ERROR:
+            operations.append("restart")
+        elif status in (ServiceStatus.STOPPED, ServiceStatus.NOT_FOUND) and not suspended:
+            operations.append("start")
+        elif status == ServiceStatus.PAUSED and not suspended and not operations:
+            operations.append("unpause")
+        return operations
+
+    def _collect(self) -> None:
+        """
+        Collect the outcome of finished actions, backing off from services whose actions failed.
+        """
+        now = time.time()
+        with self._lock:
+            for slug, jobs in list(self._jobs.items()):
+                if not all(job.done for job in jobs):
+                    continue
+                del self._jobs[slug]
+                failed = [job for job in jobs if job.state == JobState.FAILED]
+                if not failed:
+                    self._failures.pop(slug, None)
+                    self._retry_at.pop(slug, None)
+                    continue
+                failures = self._failures.get(slug, 0) + 1
+                self._failures[slug] = failures
+                backoff = min(self.policy.backoff * 2 ** (failures - 1), self.policy.max_backoff)
+                self._retry_at[slug] = now + backoff
+                logging.warning(f"Reconciling '{slug}' failed ({failed[0].error}), retrying in {backoff:.0f}s.")
+
+    def failures(self) -> dict[str, int]:
+        """
+        Get the number of failed reconciliations in a row per service.
+
+        :return: The number of failures, keyed by the slug of the service.
+        """
+        with self._lock:
+            return dict(self._failures)
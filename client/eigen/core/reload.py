@@ -0,0 +1,218 @@
+from pathlib import Path
+from typing import Callable, Optional
+import threading
+import logging
+import ctypes
+import select
+import struct
+import os
+
+# inotify events of files being written, moved or deleted, and of the directory itself going away
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+class Inotify:
+    """
+    Minimal binding of the Linux inotify API through the C library.
+    """
+    def __init__(self):
+        """
+        Create an inotify instance.
+
+        :raises OSError: if inotify is not available.
+        """
+        # the C library is already loaded into the process
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available.")
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        """
+        Watch a path.
+
+        :param path: The path to watch.
+        :param mask: The events to watch for.
+        :raises OSError: if the path cannot be watched.
+        :return: The watch descriptor.
+        """
+        descriptor = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if descriptor < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(path))
+        return descriptor
+
+    def read(self) -> list[tuple[int, str]]:
+        """
+        Read all pending events without blocking.
+
+        :return: The mask and the file name of every event.
+        """
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((mask, os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class ConfigWatcher:
+    """
+    Reports the service configuration files of a directory that were added, changed or removed.
+
+    The directory is watched with inotify where available, otherwise it is scanned every
+    `interval` seconds. Changes are collected for a short while before they are reported, so that
+    an editor saving a file in several steps causes a single report.
+    """
+    # seconds to wait after a change for further ones
+    DEBOUNCE = .2
+
+    def __init__(self, directory: Path, on_change: Callable[[set[str]], None], interval: float = 2):
+        """
+        Initialize the watcher. Nothing is watched until it is started.
+
+        :param directory: The directory of the service configuration files.
+        :param on_change: A function called with the slugs of the services whose files changed.
+        :param interval: The seconds between two scans if the directory cannot be watched with inotify.
+        """
+        self.directory = directory
+        self.interval = interval
+        self._on_change = on_change
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start watching in the background, if not already running. Changes made once this returns
+        are reported.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="eigen-config-watch", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self) -> None:
+        """
+        Stop watching.
+        """
+        self._stopped.set()
+
+    def _run(self, ready: threading.Event) -> None:
+        """
+        Watch the directory until stopped.
+
+        :param ready: Set once changes are being watched for.
+        """
+        inotify = None
+        try:
+            inotify = Inotify()
+            inotify.add_watch(self.directory, WATCH_MASK)
+        except OSError as e:
+            if inotify is not None:
+                inotify.close()
+            logging.info(f"Cannot watch {self.directory} for changes ({e}), scanning it every {self.interval}s instead.")
+            previous = self._scan()
+            ready.set()
+            self._poll(previous)
+            return
+        ready.set()
+        try:
+            self._follow(inotify)
+        finally:
+            inotify.close()
+
+    def _report(self, slugs: set[str]) -> None:
+        """
+        Report changed files, unless nothing changed.
+
+        :param slugs: The slugs of the services whose files changed.
+        """
+        if not slugs:
+            return
+        try:
+            self._on_change(slugs)
+        except Exception as e:
+            logging.error(f"Reloading service configurations failed: {e}")
+
+    def _follow(self, inotify: Inotify) -> None:
+        """
+        Report the changes inotify reports until stopped, falling back to scanning if the
+        directory goes away.
+
+        :param inotify: The inotify instance watching the directory.
+        """
+        while not self._stopped.is_set():
+            ready, _, _ = select.select([inotify.fd], [], [], 1)
+            if not ready:
+                continue
+            # let a burst of events settle
+            self._stopped.wait(self.DEBOUNCE)
+            slugs, rescan = set(), False
+            for mask, name in inotify.read():
+                if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    rescan = True
+                elif name.endswith(".toml") and not name.startswith("."):
+                    slugs.add(name[:-len(".toml")])
+            if rescan:
+                logging.warning(f"Lost track of {self.directory}, scanning it every {self.interval}s instead.")
+                # report every file once, as events may have been lost
+                previous = self._scan()
+                self._report(set(previous))
+                self._poll(previous)
+                return
+            self._report(slugs)
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        """
+        Scan the directory.
+
+        :return: The modification time and size of every service configuration file, keyed by the slug.
+        """
+        files = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return files
+        for entry in entries:
+            if not entry.name.endswith(".toml") or entry.name.startswith("."):
+                continue
+            try:
+                info = entry.stat()
+            except OSError:
+                continue
+            files[entry.name[:-len(".toml")]] = (info.st_mtime_ns, info.st_size)
+        return files
+
+    def _poll(self, previous: dict[str, tuple[int, int]]) -> None:
+        """
+        Scan the directory every interval and report the files that differ from the last scan.
+
+        :param previous: The result of the last scan.
+        """
+        while not self._stopped.wait(self.interval):
+            current = self._scan()
+            self._report({slug for slug in previous.keys() | current.keys() if previous.get(slug) != current.get(slug)})
+            previous = current
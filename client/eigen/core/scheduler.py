@@ -0,0 +1,261 @@
+from .service import Service, ServiceError, OperationJournal, PendingOperation
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from enum import Enum
+from typing import Optional
+from uuid import uuid4
+import threading
+import logging
+import time
+
+OPERATIONS = ("install", "uninstall", "start", "stop", "restart", "pause", "unpause", "recreate")
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class Job:
+    """
+    Handle for an operation submitted to the scheduler.
+    """
+    def __init__(self, service: Service, operation: str):
+        """
+        Initialize a queued job.
+
+        :param service: The service to operate on.
+        :param operation: The name of the operation, e.g. `start`.
+        """
+        self.id = uuid4().hex[:12]
+        self.service = service
+        self.operation = operation
+        self.state = JobState.QUEUED
+        # the operation run after merging with other jobs, None if nothing had to run
+        self.executed: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def slug(self) -> str:
+        return self.service.slug
+
+    @property
+    def done(self) -> bool:
+        """
+        Check if the job has finished, successfully or not.
+
+        :return: True if the job has finished, False otherwise.
+        """
+        return self._done.is_set()
+
+    @property
+    def duration(self) -> Optional[float]:
+        """
+        Get the time the operation has been running, or took to run.
+
+        :return: The duration in seconds, or None if the job has not started.
+        """
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the job has finished.
+
+        :param timeout: The maximum time to wait in seconds, or None to wait forever.
+        :return: True if the job has finished, False if the timeout expired.
+        """
+        return self._done.wait(timeout)
+
+    def result(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait until the job has finished and raise its error, if any.
+
+        :param timeout: The maximum time to wait in seconds, or None to wait forever.
+        :raises TimeoutError: if the job has not finished in time.
+        :raises ServiceError: if the job was cancelled.
+        :raises Exception: the error the operation failed with.
+        """
+        if not self.wait(timeout):
+            raise TimeoutError(f"Job {self.id} ({self.operation} '{self.slug}') has not finished yet.")
+        if self.state == JobState.CANCELLED:
+            raise ServiceError(f"Job {self.id} ({self.operation} '{self.slug}') was cancelled.")
+        if self.error is not None:
+            raise self.error
+
+    def _finish(self, state: JobState, error: Optional[BaseException] = None) -> None:
+        self.state = state
+        self.error = error
+        self.finished_at = time.time()
+        self._done.set()
+
+    def __repr__(self) -> str:
+        return f"<Job {self.id} {self.operation} '{self.slug}' {self.state.value}>"
+
+
+class OperationScheduler:
+    """
+    Runs service operations as jobs on a bounded pool of worker threads.
+
+    Operations on the same service run one after another in submission order, while operations
+    on different services run in parallel, at most `max_workers` at a time. Each job acquires the
+    lock of its service for the duration of the operation. Jobs queued behind each other on the
+    same service are merged where they are redundant, see `OperationJournal`.
+    """
+    HISTORY = 100
+
+    def __init__(self, max_workers: int = 4):
+        """
+        Initialize the scheduler.
+
+        :param max_workers: The maximum number of operations running at the same time.
+        """
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="eigen-operation")
+        self._lock = threading.Lock()
+        self._queues: dict[str, OperationJournal] = {}
+        self._active: set[str] = set()
+        self._history: deque[Job] = deque(maxlen=self.HISTORY)
+
+    def submit(self, service: Service, operation: str) -> Job:
+        """
+        Submit an operation on a service. If it merges with the last queued operation on the
+        service, the job shares the outcome of the merged operation.
+
+        :param service: The service to operate on.
+        :param operation: The name of the operation, one of OPERATIONS.
+        :raises ValueError: if the operation is unknown.
+        :return: A handle for the job.
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{operation}', must be one of {OPERATIONS}.")
+        job = Job(service, operation)
+        with self._lock:
+            self._queues.setdefault(service.slug, OperationJournal()).record(operation, job)
+            self._history.append(job)
+            if service.slug not in self._active:
+                self._active.add(service.slug)
+                self._executor.submit(self._run_next, service.slug)
+        return job
+
+    def submit_many(self, services: list[Service], operation: str) -> list[Job]:
+        """
+        Submit the same operation on several services, to run in parallel.
+
+        :param services: The services to operate on.
+        :param operation: The name of the operation.
+        :raises ValueError: if the operation is unknown.
+        :return: Handles for the jobs, in the order of the services.
+        """
+        return [self.submit(service, operation) for service in services]
+
+    def cancel(self, job: Job) -> bool:
+        """
+        Cancel a job that has not started yet.
+
+        :param job: The job to cancel.
+        :return: True if the job was cancelled, False if it has already started.
+        """
+        with self._lock:
+            journal = self._queues.get(job.slug)
+            if journal is None or not journal.withdraw(job):
+                return False
+        job._finish(JobState.CANCELLED)
+        return True
+
+    def is_pending(self, slug: str) -> bool:
+        """
+        Check if a service has queued or running jobs.
+
+        :param slug: The slug of the service.
+        :return: True if the service has queued or running jobs, False otherwise.
+        """
+        return slug in self._active
+
+    def jobs(self, slug: Optional[str] = None) -> list[Job]:
+        """
+        Get the most recently submitted jobs.
+
+        :param slug: Only return jobs of this service, if given.
+        :return: The jobs, oldest first.
+        """
+        with self._lock:
+            return [job for job in self._history if slug is None or job.slug == slug]
+
+    def _run_next(self, slug: str) -> None:
+        """
+        Run the next queued operation of a service, then queue the service again if more
+        operations are waiting, so that services take turns on the workers.
+
+        :param slug: The slug of the service.
+        """
+        with self._lock:
+            journal = self._queues.get(slug)
+            pending = journal.pop() if journal else None
+            if pending is None:
+                self._active.discard(slug)
+                self._queues.pop(slug, None)
+                return
+
+        jobs = pending.requesters
+        started_at = time.time()
+        for job in jobs:
+            job.state = JobState.RUNNING
+            job.started_at = started_at
+        try:
+            executed = self._execute(jobs[0].service, pending)
+            for job in jobs:
+                job.executed = executed
+                job._finish(JobState.SUCCEEDED)
+        except Exception as e:
+            logging.error(f"Failed to {pending.operation} service '{slug}': {e}")
+            for job in jobs:
+                job.executed = pending.operation
+                job._finish(JobState.FAILED, e)
+
+        with self._lock:
+            if self._queues.get(slug):
+                self._executor.submit(self._run_next, slug)
+            else:
+                self._active.discard(slug)
+                self._queues.pop(slug, None)
+
+    @staticmethod
+    def _execute(service: Service, pending: PendingOperation) -> Optional[str]:
+        """
+        Run a pending operation with the lock of its service held, unless the operations it was
+        merged from cancel out in the current status of the service.
+
+        :param service: The service to operate on.
+        :param pending: The operation.
+        :raises Exception: the error the operation failed with.
+        :return: The name of the operation run, or None if it was skipped.
+        """
+        with service.lock:
+            if pending.skip_if is not None:
+                try:
+                    skip = service.status == pending.skip_if
+                except ServiceError:
+                    skip = False
+                if skip:
+                    return None
+            getattr(service, pending.operation)()
+        return pending.operation
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Cancel all queued jobs and shut down the worker threads.
+
+        :param wait: Whether to wait for running jobs to finish.
+        """
+        with self._lock:
+            queued = [job for journal in self._queues.values() for job in journal.clear()]
+        for job in queued:
+            job._finish(JobState.CANCELLED)
+        self._executor.shutdown(wait=wait)
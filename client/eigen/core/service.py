@@ -1,9 +1,20 @@
 from abc import ABC, abstractmethod
 from .config import ServiceConfig, EigenConfig
-from ..models import ServiceStatus
+from ..models import ServiceStatus, ServiceProgress, ServiceState, StatusSnapshot, StatusChange, ServiceUsage, MetricsSample, LogLine
+import asyncio
+import threading
+import logging
+import fcntl
+import json
 import time
+import os
+from collections import deque
 from pathlib import Path
 from pydantic import BaseModel, ValidationError
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from .watch import StatusWatcher, Subscription
 
 class ServiceError(Exception):
     pass
@@ -17,8 +28,17 @@ class ServiceBusyError(ServiceError):
 
 class ServiceLock:
     """
-    A lock class to ensure that only one operation can be performed on a service at a time.
+    A lock to ensure that only one operation can be performed on a service at a time, across
+    threads and processes.
+
+    The lock is an exclusive `flock` on the lock file, so waiting for it blocks in the kernel
+    instead of polling, and the kernel releases it when its holder dies. The lock file also
+    records the holder and until when the service settles after the last operation, so that
+    every process sees the service as busy until then.
     """
+    # seconds between two checks of the readiness condition
+    READY_CHECK_INTERVAL = .5
+
     def __init__(self, slug: str, lock_dir: Path):
         """
         Initialize the lock with a service slug.
@@ -28,47 +48,257 @@ class ServiceLock:
         self.slug = slug
         self.filepath = lock_dir / f"{slug}.lock"
 
-        self._last_release = 0
-        self._next_delay = 0
+        self._fd: Optional[int] = None
+        # set once the service settled after the last operation, None if it is not settling
+        self._settled: Optional[threading.Event] = None
+        self._ready_deadline = 0
+        # serializes the end of settling with acquiring and releasing the lock
+        self._guard = threading.Lock()
 
-    def is_locked(self) -> bool:
+    def _open(self) -> int:
         """
-        Check if the lock file exists.
+        Open the lock file, creating it if necessary.
 
-        :return: True if the lock file exists, False otherwise.
+        :return: A new file descriptor of the lock file.
         """
-        return self.filepath.exists() or (time.time() - self._last_release < self._next_delay)
+        return os.open(self.filepath, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
 
-    def acquire(self):
+    def _read_metadata(self, fd: Optional[int] = None) -> dict:
         """
-        Acquire the lock for the service.
+        Read the metadata recorded in the lock file.
 
-        :raises ServiceBusyError: If the lock file already exists.
+        :param fd: A file descriptor of the lock file, or None to open it.
+        :return: The metadata, empty if the file is missing, empty or being rewritten.
         """
-        self._next_delay = 0
-        while self.is_locked():
-            time.sleep(.1)
-        self.filepath.touch()
+        try:
+            if fd is not None:
+                return json.loads(os.pread(fd, 4096, 0) or b"{}")
+            return json.loads(self.filepath.read_bytes() or b"{}")
+        except (OSError, ValueError):
+            return {}
 
-    def add_delay(self, delay):
+    @staticmethod
+    def _write_metadata(fd: int, metadata: dict) -> None:
+        """
+        Replace the metadata recorded in the lock file. Must be called with the lock held.
+
+        :param fd: The file descriptor holding the lock.
+        :param metadata: The metadata.
         """
-        Add a delay before releasing the lock.
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, json.dumps(metadata).encode(), 0)
 
-        :param delay: The delay in seconds to add.
+    def is_locked(self) -> bool:
         """
-        self._next_delay += delay
+        Check if the lock is held by any thread or process, or the service has not become ready
+        since the last release.
+
+        :return: True if the service is locked, False otherwise.
+        """
+        return self._fd is not None or self._is_held() or self._is_settling()
+
+    def _is_held(self) -> bool:
+        """
+        Check if the lock is held, by probing it with a shared lock, which does not conflict with
+        other probes.
+
+        :return: True if the lock is held, False otherwise.
+        """
+        try:
+            fd = self._open()
+        except OSError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(fd)
+        return False
+
+    def _is_settling(self) -> bool:
+        """
+        Check if the service is still settling after the last operation, i.e. neither its readiness
+        condition is met nor the readiness timeout has expired.
+
+        Only the process that performed the operation checks the readiness condition, on a thread
+        of its own, and clears the deadline in the lock file once it is met. Other processes rely
+        on the deadline. Neither blocks on the condition here.
+
+        :return: True if the service is still settling, False otherwise.
+        """
+        settled = self._settled
+        if settled is None:
+            return time.time() < self._read_metadata().get("settle_until", 0)
+        return not settled.is_set() and time.time() < self._ready_deadline
+
+    def _await_ready(self, ready: Callable[[], bool], settled: threading.Event) -> None:
+        """
+        Check the readiness condition every `READY_CHECK_INTERVAL` until it is met, the readiness
+        timeout expires or another operation supersedes the one that is settling.
+
+        :param ready: The readiness condition.
+        :param settled: The event of the operation that is settling.
+        """
+        while not settled.is_set() and time.time() < self._ready_deadline:
+            try:
+                if ready():
+                    break
+            except Exception as e:
+                logging.debug(f"Readiness check of '{self.slug}' failed: {e}")
+            settled.wait(self.READY_CHECK_INTERVAL)
+        with self._guard:
+            if self._settled is not settled:
+                return
+            settled.set()
+            self._settled = None
+            fd = self._fd
+            if fd is None:
+                self._clear_settling()
+                return
+            metadata = self._read_metadata(fd)
+            if metadata.pop("settle_until", None) is not None:
+                self._write_metadata(fd, metadata)
+
+    def _clear_settling(self) -> None:
+        """
+        Clear the settling deadline in the lock file, unless the lock is held by someone else,
+        who rewrites the metadata anyway.
+        """
+        try:
+            fd = self._open()
+        except OSError:
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            metadata = self._read_metadata(fd)
+            if metadata.pop("settle_until", None) is not None:
+                self._write_metadata(fd, metadata)
+        except BlockingIOError:
+            pass
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _flock(fd: int, timeout: Optional[float]) -> bool:
+        """
+        Take an exclusive lock on a file descriptor.
+
+        `flock` itself has no timeout, so with a timeout a helper thread blocks on the lock
+        instead. If the timeout expires first, the helper closes the file descriptor, releasing
+        the lock, as soon as it gets it.
+
+        :param fd: The file descriptor of the lock file.
+        :param timeout: The maximum time in seconds to wait, or None to wait indefinitely.
+        :return: True if the lock was taken. If False, the file descriptor belongs to the helper.
+        """
+        if timeout is None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return True
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            if timeout <= 0:
+                return False
+
+        acquired = threading.Event()
+        handoff = threading.Lock()
+        abandoned = False
+
+        def wait():
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            with handoff:
+                if abandoned:
+                    os.close(fd)
+                else:
+                    acquired.set()
+
+        threading.Thread(target=wait, name="service-lock", daemon=True).start()
+        if acquired.wait(timeout):
+            return True
+        with handoff:
+            if acquired.is_set():
+                return True
+            abandoned = True
+        return False
+
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        Acquire the lock for the service, blocking until it is free.
+
+        Acquiring the lock ends the settling of a previous operation, as the new operation
+        supersedes it.
+
+        :param timeout: The maximum time in seconds to wait, or None to wait indefinitely.
+        :raises ServiceBusyError: If the lock cannot be acquired in time.
+        """
+        with self._guard:
+            settled, self._settled = self._settled, None
+        if settled is not None:
+            settled.set()
+        fd = self._open()
+        try:
+            acquired = self._flock(fd, timeout)
+        except BaseException:
+            os.close(fd)
+            raise
+        if not acquired:
+            if timeout <= 0:
+                os.close(fd)
+            raise ServiceBusyError(f"Service '{self.slug}' is busy and could not be locked within {timeout} seconds.")
+        self._write_metadata(fd, {"pid": os.getpid(), "acquired_at": time.time()})
+        with self._guard:
+            self._fd = fd
+
+    async def acquire_async(self, timeout: Optional[float] = None):
+        """
+        Acquire the lock for the service without blocking the event loop.
+
+        :param timeout: The maximum time in seconds to wait, or None to wait indefinitely.
+        :raises ServiceBusyError: If the lock cannot be acquired in time.
+        """
+        future = asyncio.get_running_loop().run_in_executor(None, self.acquire, timeout)
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # the waiting thread cannot be interrupted, give the lock back once it has it
+            future.add_done_callback(lambda done: done.cancelled() or done.exception() is not None or self.release())
+            raise
+
+    def hold_until(self, ready: Callable[[], bool], timeout: float):
+        """
+        Keep reporting the service as locked after release until it is ready. The condition is
+        checked in the background, so that checking the lock never waits for it.
+
+        :param ready: A condition that returns True once the service is ready.
+        :param timeout: The maximum time in seconds to wait for the condition.
+        """
+        settled = threading.Event()
+        with self._guard:
+            previous, self._settled = self._settled, settled
+            self._ready_deadline = time.time() + timeout
+            fd = self._fd
+            if fd is not None:
+                self._write_metadata(fd, {**self._read_metadata(fd), "settle_until": self._ready_deadline})
+        if previous is not None:
+            previous.set()
+        threading.Thread(target=self._await_ready, args=(ready, settled), name=f"service-ready-{self.slug}", daemon=True).start()
 
     def release(self):
         """
         Release the lock for the service.
 
-        :raises ServiceError: If the lock file does not exist.
+        :raises ServiceError: If the lock is not held.
         """
-        if self.filepath.exists():
-            self.filepath.unlink()
-            self._last_release = time.time()
-        else:
-            raise ServiceError(f"Lock file for service '{self.slug}' does not exist.")
+        with self._guard:
+            fd, self._fd = self._fd, None
+            if fd is None:
+                raise ServiceError(f"Lock for service '{self.slug}' is not held.")
+            try:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
 
     def __enter__(self):
         """
@@ -93,12 +323,34 @@ class ServiceLock:
         self.release()
         return False  # Do not suppress exceptions
 
+    async def __aenter__(self):
+        """
+        Enter the asynchronous context manager, acquiring the lock.
+
+        :return: The ServiceLock instance.
+        """
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """
+        Exit the asynchronous context manager, releasing the lock.
+
+        :return: False to propagate exceptions.
+        :raises ServiceError: If there is an error releasing the lock.
+        """
+        self.release()
+        return False  # Do not suppress exceptions
+
 
 
 class Service(ABC):
     """
     Abstract base class for a service.
     """
+    # the status watcher publishing the changes of this service, set once the service is watched
+    watcher: Optional["StatusWatcher"] = None
+
     @staticmethod
     def ensure_lock(func):
         """
@@ -127,6 +379,7 @@ class Service(ABC):
         self.lock = ServiceLock(slug, eigen_config.services.lock_dir)
         self._config = config
         self._config.provider.options = provider_model(**config.provider.options)
+        self._provider_model = provider_model
 
     def is_busy(self) -> bool:
         """
@@ -194,6 +447,17 @@ class Service(ABC):
         """
         return self._config
 
+    def reconfigure(self, config: ServiceConfig) -> None:
+        """
+        Replace the configuration of the service, e.g. after its file changed. The service is not
+        stopped and keeps its lock, the new configuration applies from the next operation on.
+
+        :param config: The new configuration, of the same provider.
+        :raises ValidationError: If the provider options do not match the provider model.
+        """
+        config.provider.options = self._provider_model(**config.provider.options)
+        self._config = config
+
     @ensure_lock
     def start(self) -> None:
         """
@@ -248,6 +512,70 @@ class Service(ABC):
         """
         ...
 
+    @ensure_lock
+    def pause(self) -> None:
+        """
+        Pause the service, suspending its processes while keeping their memory.
+
+        :raises ServiceError: if the service cannot be paused.
+        """
+        self._pause()
+
+    def _pause(self) -> None:
+        """
+        Pause the service without acquiring the lock.
+
+        Providers supporting pausing should override this.
+        :raises ServiceError: if the service cannot be paused.
+        """
+        raise ServiceError(f"Service '{self.slug}' cannot be paused.")
+
+    @ensure_lock
+    def unpause(self) -> None:
+        """
+        Resume the processes of a paused service.
+
+        :raises ServiceError: if the service cannot be unpaused.
+        """
+        self._unpause()
+
+    def _unpause(self) -> None:
+        """
+        Unpause the service without acquiring the lock.
+
+        Providers supporting pausing should override this.
+        :raises ServiceError: if the service cannot be unpaused.
+        """
+        raise ServiceError(f"Service '{self.slug}' cannot be unpaused.")
+
+    @ensure_lock
+    def recreate(self) -> None:
+        """
+        Recreate the service from its configuration, keeping it running if it was running.
+
+        :raises ServiceError: if the service cannot be recreated.
+        """
+        self._recreate()
+
+    def _recreate(self) -> None:
+        """
+        Recreate the service without acquiring the lock.
+
+        Providers that can detect drift should override this.
+        :raises ServiceError: if the service cannot be recreated.
+        """
+        raise ServiceError(f"Service '{self.slug}' cannot be recreated.")
+
+    def has_drifted(self) -> bool:
+        """
+        Check if the installed service differs from its configuration, e.g. because its options
+        were changed after it was created.
+
+        :raises ServiceError: if the installed service cannot be inspected.
+        :return: True if the service has to be recreated to match its configuration, False otherwise.
+        """
+        return False
+
     @property
     def status(self) -> ServiceStatus:
         """
@@ -258,6 +586,51 @@ class Service(ABC):
         """
         return self._status()
 
+    @property
+    def state(self) -> ServiceState:
+        """
+        Get the status, installation and busy state of the service at once.
+
+        :return: The state of the service.
+        :raises ServiceError: if the status cannot be retrieved.
+        """
+        return ServiceState(status=self.status, installed=self.is_installed(), busy=self.is_busy(), progress=self.progress())
+
+    def subscribe(self, callback: Optional[Callable[[StatusChange], None]] = None) -> "Subscription":
+        """
+        Subscribe to the status changes of the service.
+
+        :param callback: A function called with every change on a thread of its own. If omitted,
+            the changes are consumed by iterating the subscription, synchronously or asynchronously.
+        :raises ServiceError: if the service is not watched for changes.
+        :return: The subscription, to be closed once no longer needed.
+        """
+        if self.watcher is None:
+            raise ServiceError(f"Service '{self.slug}' is not watched for status changes.")
+        return self.watcher.subscribe(callback, [self.slug])
+
+    def progress(self) -> Optional[ServiceProgress]:
+        """
+        Get the progress of a running update of the service.
+
+        :return: The progress, or None if no update is running.
+        """
+        return None
+
+    def logs(self, tail: Optional[int] = None, follow: bool = False, since: Optional[float] = None,
+             until: Optional[float] = None) -> Iterator[LogLine]:
+        """
+        Stream the output of the service line by line, without loading it into memory at once.
+
+        :param tail: Only return this many of the most recent lines, or all lines if None.
+        :param follow: Whether to keep streaming new lines as they are written.
+        :param since: Only return lines written after this Unix time, if given.
+        :param until: Only return lines written before this Unix time, if given.
+        :return: An iterator over the lines, oldest first.
+        :raises ServiceError: if the output cannot be retrieved.
+        """
+        raise ServiceError(f"Service '{self.slug}' does not provide logs.")
+
     @abstractmethod
     def _status(self) -> ServiceStatus:
         """
@@ -266,3 +639,135 @@ class Service(ABC):
         This method should be implemented by subclasses to perform the actual status retrieval.
         """
         ...
+
+
+# result of an operation queued right after a different one on the same service, and the status in
+# which the result can be skipped because the two cancel out; repeated operations always merge
+OPERATION_MERGES: dict[tuple[str, str], tuple[str, Optional[ServiceStatus]]] = {
+    ("start", "restart"): ("restart", None),
+    ("restart", "start"): ("restart", None),
+    ("stop", "start"): ("restart", None),
+    ("stop", "restart"): ("restart", None),
+    ("restart", "stop"): ("stop", None),
+    ("start", "stop"): ("stop", ServiceStatus.STOPPED),
+    ("pause", "unpause"): ("unpause", ServiceStatus.RUNNING),
+    ("unpause", "pause"): ("pause", ServiceStatus.PAUSED),
+}
+
+class PendingOperation:
+    """
+    An operation waiting to run on a service, merged from one or more requested operations.
+    """
+    def __init__(self, operation: str, requester: Any):
+        """
+        Initialize the pending operation with its first request.
+
+        :param operation: The name of the requested operation, e.g. `start`.
+        :param requester: A handle of whoever requested the operation, e.g. a job.
+        """
+        self.requests: list[tuple[str, Any]] = [(operation, requester)]
+        self.operation = operation
+        self.skip_if: Optional[ServiceStatus] = None
+
+    @property
+    def requesters(self) -> list[Any]:
+        """
+        Get everyone waiting for the outcome of the operation.
+
+        :return: The handles of the requesters, in request order.
+        """
+        return [requester for _, requester in self.requests]
+
+    def merge(self, operation: str, requester: Any) -> bool:
+        """
+        Merge a request into the operation, if the two can be run as one.
+
+        :param operation: The name of the requested operation.
+        :param requester: A handle of whoever requested the operation.
+        :return: True if the request was merged, False otherwise.
+        """
+        if operation == self.operation:
+            merged = (operation, self.skip_if)
+        else:
+            merged = OPERATION_MERGES.get((self.operation, operation))
+        if merged is None:
+            return False
+        self.requests.append((operation, requester))
+        self.operation, self.skip_if = merged
+        return True
+
+    def __repr__(self) -> str:
+        return f"<PendingOperation {self.operation} ({', '.join(operation for operation, _ in self.requests)})>"
+
+class OperationJournal:
+    """
+    The operations waiting to run on a service, in order.
+
+    A newly requested operation is merged into the last pending one where the two are redundant
+    or one supersedes the other: repeated restarts become one restart, a start followed by a stop
+    does nothing if the service is already stopped by the time it runs. Everyone who requested
+    a merged operation receives its outcome. The journal is not thread-safe.
+    """
+    def __init__(self):
+        self._pending: deque[PendingOperation] = deque()
+
+    def record(self, operation: str, requester: Any) -> PendingOperation:
+        """
+        Record a requested operation, merging it into the last pending operation if possible.
+
+        :param operation: The name of the requested operation, e.g. `restart`.
+        :param requester: A handle of whoever requested the operation, e.g. a job.
+        :return: The pending operation the request is part of.
+        """
+        if self._pending and self._pending[-1].merge(operation, requester):
+            return self._pending[-1]
+        pending = PendingOperation(operation, requester)
+        self._pending.append(pending)
+        return pending
+
+    def pop(self) -> Optional[PendingOperation]:
+        """
+        Take the next operation to run out of the journal.
+
+        :return: The operation, or None if no operation is pending.
+        """
+        return self._pending.popleft() if self._pending else None
+
+    def withdraw(self, requester: Any) -> bool:
+        """
+        Withdraw a request that has not started running.
+
+        :param requester: The handle of the requester.
+        :return: True if the request was withdrawn, False if it is not pending.
+        """
+        for index, pending in enumerate(self._pending):
+            if not any(other is requester for other in pending.requesters):
+                continue
+            # merge the remaining requests anew, as they may no longer merge into one operation
+            rebuilt: list[PendingOperation] = []
+            for operation, other in pending.requests:
+                if other is requester:
+                    continue
+                if not (rebuilt and rebuilt[-1].merge(operation, other)):
+                    rebuilt.append(PendingOperation(operation, other))
+            del self._pending[index]
+            for position, replacement in enumerate(rebuilt):
+                self._pending.insert(index + position, replacement)
+            return True
+        return False
+
+    def clear(self) -> list[Any]:
+        """
+        Withdraw all pending requests.
+
+        :return: The handles of the requesters.
+        """
+        requesters = [requester for pending in self._pending for requester in pending.requesters]
+        self._pending.clear()
+        return requesters
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __iter__(self) -> Iterator[PendingOperation]:
+        return iter(self._pending)
@@ -0,0 +1,223 @@
+from .service import Service, ServiceError, ServiceUsage
+from .provider import Provider
+from ..models import EigenStorage, parse_size
+from typing import Callable, Optional
+import threading
+import logging
+import time
+
+class StorageManager:
+    """
+    Tracks the disk usage of services, enforces quotas and prunes unused data.
+
+    Usage is measured incrementally: every interval only the next service (round-robin) is
+    measured, and the totals are computed from the most recent measurement of every service. The
+    whole disk is never scanned at once, and reads never trigger a measurement.
+
+    A service exceeds its quota if its own usage does. If all services together exceed the global
+    quota, the largest services also count as exceeding their quota, until the others fit into
+    it. Exceeding the global quota also prunes once, and while it stays exceeded, pruning is
+    repeated at the prune interval only. Pruning only reclaims data no service depends on.
+    """
+    # seconds between two prunes while the global quota is exceeded, if no prune interval is set
+    OVER_QUOTA_PRUNE_INTERVAL = 3600
+    def __init__(self, services: dict[str, Service], provider_of: Callable[[Service], Provider], policy: EigenStorage,
+                 on_over_quota: Optional[Callable[[Service, ServiceUsage], None]] = None):
+        """
+        Initialize the storage manager. Nothing is measured until it is started.
+
+        :param services: The services to track, keyed by their slug. The dictionary may change while tracking.
+        :param provider_of: A callable returning the provider of a service.
+        :param policy: The storage policy.
+        :param on_over_quota: Called with a service and its usage whenever it exceeds its quota.
+        """
+        self.services = services
+        self.policy = policy
+        self._provider_of = provider_of
+        self._on_over_quota = on_over_quota
+
+        self._lock = threading.Lock()
+        self._usage: dict[str, ServiceUsage] = {}
+        self._cursor = 0
+        self._last_prune = time.time()
+        self._over_global_quota = False
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start measuring in the background, if not already running.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="eigen-storage", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop measuring.
+        """
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.policy.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logging.error(f"Storage management failed: {e}")
+
+    def tick(self) -> None:
+        """
+        Measure the next service, then enforce quotas and prune if necessary.
+        """
+        service = self._next_service()
+        if service is not None:
+            self.measure(service)
+        self.enforce()
+
+    def _next_service(self) -> Optional[Service]:
+        """
+        Get the next service to measure, round-robin.
+
+        :return: The next service, or None if there are no services.
+        """
+        slugs = sorted(self.services)
+        with self._lock:
+            # forget usage of services that have been removed
+            for slug in set(self._usage) - set(slugs):
+                del self._usage[slug]
+            if not slugs:
+                return None
+            self._cursor = (self._cursor + 1) % len(slugs)
+            return self.services.get(slugs[self._cursor])
+
+    def measure(self, service: Service) -> Optional[ServiceUsage]:
+        """
+        Measure the disk usage of a service now.
+
+        :param service: The service to measure.
+        :return: The disk usage, or None if its provider does not track disk usage.
+        """
+        try:
+            usage = self._provider_of(service).service_usage(service)
+        except ServiceError as e:
+            logging.warning(f"Failed to measure disk usage of '{service.slug}': {e}")
+            return None
+        if usage is not None:
+            with self._lock:
+                self._usage[service.slug] = usage
+        return usage
+
+    def usage(self, slug: Optional[str] = None) -> dict[str, ServiceUsage]:
+        """
+        Get the most recently measured disk usage.
+
+        :param slug: Only return the usage of this service, if given.
+        :return: The disk usage of the services measured so far, keyed by their slug.
+        """
+        with self._lock:
+            if slug is not None:
+                return {slug: self._usage[slug]} if slug in self._usage else {}
+            return dict(self._usage)
+
+    def total(self) -> int:
+        """
+        Get the total disk usage of all services measured so far.
+
+        :return: The total usage in bytes.
+        """
+        return sum(usage.total for usage in self.usage().values())
+
+    def quota(self, service: Service) -> Optional[int]:
+        """
+        Get the disk quota of a service.
+
+        :param service: The service.
+        :return: The quota in bytes, or None if the service has no quota.
+        """
+        quota = service.config.quota or self.policy.service_quota
+        return parse_size(quota) if quota else None
+
+    def global_quota(self) -> Optional[int]:
+        """
+        Get the disk quota of all services together.
+
+        :return: The quota in bytes, or None if there is no global quota.
+        """
+        return parse_size(self.policy.global_quota) if self.policy.global_quota else None
+
+    def over_quota(self) -> dict[str, ServiceUsage]:
+        """
+        Get all services exceeding their own quota or, largest first, not fitting into the global quota.
+
+        :return: The disk usage of the services exceeding their quota, keyed by their slug.
+        """
+        usages = self.usage()
+        over = {}
+        for slug, usage in usages.items():
+            service = self.services.get(slug)
+            quota = self.quota(service) if service is not None else None
+            if quota is not None and usage.total > quota:
+                over[slug] = usage
+        global_quota = self.global_quota()
+        if global_quota is not None:
+            remaining = sum(usage.total for slug, usage in usages.items() if slug not in over)
+            for slug, usage in sorted(usages.items(), key=lambda item: (-item[1].total, item[0])):
+                if remaining <= global_quota:
+                    break
+                if slug not in over:
+                    over[slug] = usage
+                    remaining -= usage.total
+        return over
+
+    def enforce(self) -> None:
+        """
+        Report services exceeding their quota and prune when the global quota becomes exceeded or
+        the prune interval has passed.
+        """
+        for slug, usage in self.over_quota().items():
+            service = self.services.get(slug)
+            if service is None:
+                continue
+            quota = self.quota(service)
+            if quota is not None and usage.total > quota:
+                logging.warning(f"Service '{slug}' exceeds its disk quota with {usage.total} bytes.")
+            else:
+                logging.warning(f"Service '{slug}' does not fit into the global disk quota with {usage.total} bytes.")
+            if self._on_over_quota is not None:
+                self._on_over_quota(service, usage)
+
+        global_quota = self.global_quota()
+        total = self.total()
+        over = global_quota is not None and total > global_quota
+        if over and not self._over_global_quota:
+            self._over_global_quota = True
+            logging.warning(f"Services exceed the global disk quota with {total} bytes, pruning.")
+            self.prune()
+            return
+        self._over_global_quota = over
+        interval = self.policy.prune_interval or (self.OVER_QUOTA_PRUNE_INTERVAL if over else None)
+        if interval is not None and time.time() - self._last_prune >= interval:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Prune unused data of all providers according to the policy.
+
+        :return: The number of bytes reclaimed.
+        """
+        by_provider: dict[int, tuple[Provider, list[Service]]] = {}
+        for service in list(self.services.values()):
+            provider = self._provider_of(service)
+            by_provider.setdefault(id(provider), (provider, []))[1].append(service)
+
+        reclaimed = 0
+        for provider, services in by_provider.values():
+            try:
+                reclaimed += provider.prune(self.policy, services)
+            except ServiceError as e:
+                logging.warning(f"Failed to prune: {e}")
+        self._last_prune = time.time()
+        logging.info(f"Pruning reclaimed {reclaimed} bytes.")
+        return reclaimed
@@ -0,0 +1,286 @@
+from .service import Service, ServiceStatus, StatusSnapshot, StatusChange
+from .provider import Provider
+from typing import Callable, Iterable, Iterator, Optional
+import threading
+import asyncio
+import logging
+
+class Subscription:
+    """
+    Status changes of services waiting to be consumed by one subscriber.
+
+    At most one change per service is kept: a change of a service that still has one pending is
+    merged into it, keeping the status before the first and after the last change, and dropped if
+    the service is back where it started. A slow subscriber thus never holds more than one change
+    per service, always sees the latest status and never holds up the watcher or other subscribers.
+
+    Changes are consumed by iterating the subscription, synchronously or with `async for`, or by
+    `get`. Iteration ends once the subscription is closed.
+    """
+    def __init__(self, slugs: Optional[Iterable[str]], on_close: Callable[["Subscription"], None]):
+        """
+        Initialize an empty subscription.
+
+        :param slugs: The slugs of the services to receive changes of, or None for all services.
+        :param on_close: A function called once the subscription is closed.
+        """
+        self.slugs = frozenset(slugs) if slugs is not None else None
+        # number of changes merged into pending ones rather than delivered on their own
+        self.coalesced = 0
+        self._pending: dict[str, StatusChange] = {}
+        self._condition = threading.Condition()
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._closed = False
+        self._on_close = on_close
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def offer(self, change: StatusChange) -> None:
+        """
+        Queue a change for the subscriber, merging it with a pending change of the same service.
+
+        :param change: The change.
+        """
+        if self.slugs is not None and change.slug not in self.slugs:
+            return
+        with self._condition:
+            if self._closed:
+                return
+            pending = self._pending.pop(change.slug, None)
+            if pending is not None:
+                self.coalesced += 1
+                if pending.old_status == change.new_status:
+                    return
+                change = StatusChange(slug=change.slug, old_status=pending.old_status, new_status=change.new_status, timestamp=change.timestamp)
+            self._pending[change.slug] = change
+            self._wake()
+
+    def _wake(self) -> None:
+        """
+        Wake all synchronous and asynchronous consumers waiting for a change. Requires the condition.
+        """
+        self._condition.notify_all()
+        for loop, event in self._waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # the loop of the consumer has been closed
+                pass
+
+    def _pop(self) -> StatusChange:
+        """
+        Take the change that has been pending the longest. Requires the condition and a pending change.
+        """
+        slug = next(iter(self._pending))
+        return self._pending.pop(slug)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[StatusChange]:
+        """
+        Wait for the next change.
+
+        :param timeout: The maximum number of seconds to wait, or None to wait indefinitely.
+        :return: The change, or None if the timeout elapsed or the subscription was closed.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._pending or self._closed, timeout) or not self._pending:
+                return None
+            return self._pop()
+
+    def close(self) -> None:
+        """
+        Close the subscription. Pending changes are still consumed, then iteration ends.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._wake()
+        self._on_close(self)
+
+    def __iter__(self) -> Iterator[StatusChange]:
+        while (change := self.get()) is not None:
+            yield change
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> StatusChange:
+        loop = asyncio.get_running_loop()
+        while True:
+            event = asyncio.Event()
+            with self._condition:
+                if self._pending:
+                    return self._pop()
+                if self._closed:
+                    raise StopAsyncIteration
+                waiter = (loop, event)
+                self._waiters.append(waiter)
+            try:
+                await event.wait()
+            finally:
+                with self._condition:
+                    self._waiters.remove(waiter)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+class StatusWatcher:
+    """
+    Publishes the status changes of services to subscribers.
+
+    Changes are found by comparing consecutive status snapshots of all services. A snapshot is
+    taken as soon as a provider reports that the state of its services may have changed, e.g. on
+    a Docker event, and at the latest every `interval` seconds for providers that cannot report
+    changes. The watcher only runs while there are subscribers.
+    """
+    # seconds to wait after a reported change for further ones, so that a burst is resolved at once
+    DEBOUNCE = .05
+
+    def __init__(self, services: dict[str, Service], statuses: Callable[[], StatusSnapshot], providers: Iterable[Provider], interval: float = 5):
+        """
+        Initialize the watcher and attach it to the services. Nothing is watched until the first subscription.
+
+        :param services: The services to watch, keyed by their slug. The dictionary may change while watching.
+        :param statuses: A callable returning a status snapshot of all services.
+        :param providers: The providers of the services, to be notified of changes by.
+        :param interval: The maximum number of seconds between two snapshots.
+        """
+        self.services = services
+        self.interval = interval
+        self._statuses = statuses
+        self._providers = list(providers)
+        self._lock = threading.Lock()
+        self._subscriptions: list[Subscription] = []
+        self._last: dict[str, ServiceStatus] = {}
+        self._changed = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._unlisten: list[Callable[[], None]] = []
+        for service in services.values():
+            self.attach(service)
+
+    def attach(self, service: Service) -> None:
+        """
+        Let a service offer subscriptions to its own changes through this watcher.
+
+        :param service: The service.
+        """
+        service.watcher = self
+
+    def subscribe(self, callback: Optional[Callable[[StatusChange], None]] = None, slugs: Optional[Iterable[str]] = None) -> Subscription:
+        """
+        Subscribe to status changes, starting the watcher if necessary.
+
+        :param callback: A function called with every change on a thread of its own. If omitted,
+            the changes are consumed by iterating the subscription, synchronously or asynchronously.
+        :param slugs: The slugs of the services to receive changes of, or None for all services.
+        :return: The subscription, to be closed once no longer needed.
+        """
+        subscription = Subscription(slugs, self._unsubscribe)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        self.start()
+        if callback is not None:
+            threading.Thread(target=self._deliver, args=(subscription, callback), name="eigen-watch-callback", daemon=True).start()
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Forget a closed subscription, stopping the watcher after the last one.
+
+        :param subscription: The subscription.
+        """
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            idle = not self._subscriptions
+        if idle:
+            self.stop()
+
+    @staticmethod
+    def _deliver(subscription: Subscription, callback: Callable[[StatusChange], None]) -> None:
+        """
+        Call a callback with the changes of a subscription until it is closed.
+
+        :param subscription: The subscription.
+        :param callback: The callback.
+        """
+        for change in subscription:
+            try:
+                callback(change)
+            except Exception as e:
+                logging.error(f"Status change callback failed for '{change.slug}': {e}")
+
+    def notify(self) -> None:
+        """
+        Report that the state of some services may have changed, so that it is resolved right away.
+        """
+        self._changed.set()
+
+    def start(self) -> None:
+        """
+        Start watching in the background, if not already running.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and not self._stopped.is_set():
+                return
+            # a thread still winding down keeps the event it was stopped with
+            self._stopped = threading.Event()
+            self._last.clear()
+            self._unlisten = [provider.on_change(self.notify) for provider in self._providers]
+            self._thread = threading.Thread(target=self._run, args=(self._stopped,), name="eigen-watch", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop watching. Subscriptions stay open and receive changes again once restarted.
+        """
+        self._stopped.set()
+        self._changed.set()
+        with self._lock:
+            unlisten, self._unlisten = self._unlisten, []
+        for remove in unlisten:
+            remove()
+
+    def _run(self, stopped: threading.Event) -> None:
+        while not stopped.is_set():
+            self._changed.clear()
+            try:
+                self.tick()
+            except Exception as e:
+                logging.error(f"Watching status changes failed: {e}")
+            if self._changed.wait(self.interval):
+                stopped.wait(self.DEBOUNCE)
+
+    def tick(self) -> list[StatusChange]:
+        """
+        Take a snapshot and publish the changes since the previous one. The first snapshot is
+        only remembered, as there is nothing to compare it with.
+
+        :raises ServiceError: if the status snapshot cannot be taken.
+        :return: The changes published.
+        """
+        snapshot = self._statuses()
+        changes = []
+        with self._lock:
+            for slug, state in snapshot.states.items():
+                old_status = self._last.get(slug)
+                self._last[slug] = state.status
+                if old_status is not None and old_status != state.status:
+                    changes.append(StatusChange(slug=slug, old_status=old_status, new_status=state.status, timestamp=snapshot.timestamp))
+            for slug in [slug for slug in self._last if slug not in self.services]:
+                del self._last[slug]
+            subscriptions = list(self._subscriptions)
+        for change in changes:
+            for subscription in subscriptions:
+                subscription.offer(change)
+        return changes
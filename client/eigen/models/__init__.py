@@ -1,4 +1,7 @@
 from .validators import *
-from .service_model import ServiceConfig, ServiceStatus
-from .eigen_model import EigenConfig
+from .service_model import ServiceConfig, ServiceStatus, ServiceIdle, IdleAction, ServiceProbe, ProbeType
+from .eigen_model import EigenConfig, EigenStorage, EigenMetrics, EigenReconcile, EigenAssets
+from .status_model import ServiceProgress, ServiceState, StatusSnapshot, ServiceUsage, MetricsSample, WakeStats, ServiceHealth, StatusChange, ConfigChange, ConfigChangeKind
+from .log_model import LogLine
+from .catalog_model import CatalogPage
 from .providers import *
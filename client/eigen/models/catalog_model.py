@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class CatalogPage(BaseModel):
+    """
+    One page of the services matching a catalog search, best matches first.
+    """
+    slugs: list[str] = Field(default_factory=list, description="Slugs of the services on the page")
+    total: int = Field(..., description="Number of services matching the search across all pages")
+    facets: dict[str, int] = Field(default_factory=dict, description="Number of matching services per category, regardless of the category searched in")
+    cursor: Optional[str] = Field(None, description="Cursor of the next page, None on the last page")
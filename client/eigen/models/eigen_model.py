@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, BeforeValidator
-from . import version_validator, domain_validator, path_converter
+from . import version_validator, domain_validator, path_converter, size_validator
 from typing import Annotated, Optional
 from pathlib import Path
 
@@ -18,6 +18,52 @@ class EigenServices(BaseModel):
     """
     lock_dir: Annotated[Path, BeforeValidator(path_converter)] = Field(..., description="Path to the directory for service locks", alias="lock-dir")
     location: Annotated[Path, BeforeValidator(path_converter)] = Field(..., description="Path to the directory containing service configurations")
+    workers: int = Field(4, gt=0, description="Maximum number of service operations running in parallel")
+    run_dir: Optional[Annotated[Path, BeforeValidator(path_converter)]] = Field(None, description="Path to the directory for PID files, output and install markers of native processes, the lock directory if omitted", alias="run-dir")
+    watch: bool = Field(True, description="Whether to reload service configurations when their files change while serving, e.g. from the web interface")
+    watch_interval: float = Field(2, gt=0, description="Seconds between two scans of the service directory where it cannot be watched for changes", alias="watch-interval")
+    catalog_cache: Optional[Annotated[Path, BeforeValidator(path_converter)]] = Field(None, description="Path to the compiled snapshot of the service configurations, `catalog.cache` in the lock directory if omitted", alias="catalog-cache")
+
+class EigenStorage(BaseModel):
+    """
+    Configuration for disk usage tracking, quotas and pruning.
+    """
+    interval: float = Field(60, gt=0, description="Seconds between two usage measurements, each measuring one service")
+    service_quota: Optional[Annotated[str, BeforeValidator(size_validator)]] = Field(None, description="Default disk quota per service", alias="service-quota")
+    global_quota: Optional[Annotated[str, BeforeValidator(size_validator)]] = Field(None, description="Disk quota for all services together, exceeded by the largest services first", alias="global-quota")
+    prune_interval: Optional[float] = Field(None, gt=0, description="Seconds between two prunes regardless of quotas", alias="prune-interval")
+    prune_images: bool = Field(True, description="Whether to prune dangling images", alias="prune-images")
+    prune_containers: bool = Field(False, description="Whether to prune stopped containers that do not belong to a service", alias="prune-containers")
+    prune_build_cache: bool = Field(True, description="Whether to prune the build cache", alias="prune-build-cache")
+    stop_over_quota: bool = Field(False, description="Whether to stop services exceeding their own or the global quota", alias="stop-over-quota")
+
+class EigenMetrics(BaseModel):
+    """
+    Configuration for resource usage metrics.
+    """
+    enable: bool = Field(True, description="Whether to collect resource usage metrics of running services while serving, e.g. from the web interface")
+    capacity: int = Field(300, gt=1, description="Number of samples kept per service")
+    interval: float = Field(5, gt=0, description="Seconds between two checks for services that started or stopped running")
+
+class EigenReconcile(BaseModel):
+    """
+    Configuration for reconciling services with the state their configuration asks for.
+    """
+    interval: float = Field(30, gt=0, description="Seconds between two comparisons of the desired and the observed state")
+    max_actions: int = Field(4, gt=0, description="Maximum number of services acted on per comparison", alias="max-actions")
+    backoff: float = Field(60, gt=0, description="Seconds to leave a service alone after an action on it failed, doubled with every further failure")
+    max_backoff: float = Field(3600, gt=0, description="Maximum seconds to leave a service alone after failed actions", alias="max-backoff")
+    recreate: bool = Field(True, description="Whether to recreate containers whose options differ from the configuration")
+
+class EigenAssets(BaseModel):
+    """
+    Configuration for the content-addressed store of service icons.
+    """
+    directory: Optional[Annotated[Path, BeforeValidator(path_converter)]] = Field(None, description="Path to the asset directory, `assets` next to the service directory if omitted")
+    thumbnail_size: int = Field(128, gt=0, description="Edge length in pixels icons are scaled down to for display", alias="thumbnail-size")
+    host: str = Field("127.0.0.1", description="Address to serve assets on, e.g. for a reverse proxy to forward to")
+    port: int = Field(8502, description="Port to serve assets on")
+    base_url: Optional[str] = Field(None, description="URL under which browsers reach the asset server, e.g. through a reverse proxy; if omitted, assets are not served on their own but sent by the web interface", alias="base-url")
 
 class EigenConfig(BaseModel):
     """
@@ -25,3 +71,7 @@ class EigenConfig(BaseModel):
     """
     general: EigenGeneral = Field(..., description="General configuration for the Eigen service")
     services: EigenServices = Field(..., description="Configuration for services")
+    storage: Optional[EigenStorage] = Field(None, description="Configuration for disk usage tracking, quotas and pruning")
+    metrics: EigenMetrics = Field(default_factory=EigenMetrics, description="Configuration for resource usage metrics")
+    reconcile: Optional[EigenReconcile] = Field(None, description="Configuration for reconciling services with their configuration")
+    assets: EigenAssets = Field(default_factory=EigenAssets, description="Configuration for the store of service icons")
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class LogLine(BaseModel):
+    """
+    A single line of the output of a service.
+    """
+    timestamp: Optional[float] = Field(None, description="Unix time at which the line was written, if known")
+    text: str = Field(..., description="The line, without the trailing newline")
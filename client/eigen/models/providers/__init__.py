@@ -1 +1,3 @@
-from .docker_model import DockerServiceConfig
+from .docker_model import DockerServiceConfig, DockerResourceLimits, HOST_CONFIG_LIMITS
+from .docker_stack_model import DockerStackConfig, StackContainerConfig, StackDependency, StackHealthcheck, DependencyCondition
+from .process_model import ProcessServiceConfig, ProcessLimits, RestartPolicy
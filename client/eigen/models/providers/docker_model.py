@@ -1,10 +1,70 @@
-from typing import Any
-from pydantic import BaseModel, Field
+from typing import Any, Annotated, Optional
+from pydantic import BaseModel, Field, BeforeValidator, model_validator
+from ..validators import size_validator, cpuset_validator, parse_size
 
-class DockerServiceConfig(BaseModel):
+# maps the keyword arguments returned by `DockerResourceLimits.resource_limits()` to the fields
+# of the host configuration they end up in
+HOST_CONFIG_LIMITS = {
+    "mem_limit": "Memory",
+    "mem_reservation": "MemoryReservation",
+    "memswap_limit": "MemorySwap",
+    "cpu_quota": "CpuQuota",
+    "cpu_period": "CpuPeriod",
+    "cpu_shares": "CpuShares",
+    "cpuset_cpus": "CpusetCpus",
+    "pids_limit": "PidsLimit",
+    "blkio_weight": "BlkioWeight",
+}
+
+class DockerResourceLimits(BaseModel):
+    """
+    Resource limits of a Docker container.
+    """
+    memory: Optional[Annotated[str, BeforeValidator(size_validator)]] = Field(None, description="Memory limit for the Docker container")
+    memory_reservation: Optional[Annotated[str, BeforeValidator(size_validator)]] = Field(None, description="Soft memory limit the container is shrunk to when memory runs low")
+    memory_swap: Optional[Annotated[str, BeforeValidator(size_validator)]] = Field(None, description="Limit for memory plus swap, at least the memory limit")
+    cpu_quota: Optional[int] = Field(None, ge=1000, description="CPU time in microseconds the container may use per CPU period")
+    cpu_period: Optional[int] = Field(None, ge=1000, le=1000000, description="Length of a CPU period in microseconds")
+    cpu_shares: Optional[int] = Field(None, ge=2, description="Relative CPU weight of the container (default 1024)")
+    cpuset: Optional[Annotated[str, BeforeValidator(cpuset_validator)]] = Field(None, description="CPUs the container may run on, e.g. '0-2,4'")
+    pids_limit: Optional[int] = Field(None, gt=0, description="Maximum number of processes in the container")
+    blkio_weight: Optional[int] = Field(None, ge=10, le=1000, description="Relative block IO weight of the container")
+
+    @model_validator(mode="after")
+    def validate_memory_limits(self) -> "DockerResourceLimits":
+        if self.memory is None:
+            return self
+        memory = parse_size(self.memory)
+        if self.memory_reservation is not None and parse_size(self.memory_reservation) > memory:
+            raise ValueError("memory_reservation must not exceed memory")
+        if self.memory_swap is not None and parse_size(self.memory_swap) < memory:
+            raise ValueError("memory_swap must be at least memory")
+        return self
+
+    def resource_limits(self) -> dict[str, Any]:
+        """
+        Get the resource limits of the container as keyword arguments for creating it with docker-py.
+
+        :return: The configured limits, with sizes in bytes.
+        """
+        limits = {
+            "mem_limit": parse_size(self.memory) if self.memory else None,
+            "mem_reservation": parse_size(self.memory_reservation) if self.memory_reservation else None,
+            "memswap_limit": parse_size(self.memory_swap) if self.memory_swap else None,
+            "cpu_quota": self.cpu_quota,
+            "cpu_period": self.cpu_period,
+            "cpu_shares": self.cpu_shares,
+            "cpuset_cpus": self.cpuset,
+            "pids_limit": self.pids_limit,
+            "blkio_weight": self.blkio_weight,
+        }
+        return {key: value for key, value in limits.items() if value is not None}
+
+class DockerServiceConfig(DockerResourceLimits):
     image: str = Field(..., description="Docker image to use for the service")
     container_name: str = Field(..., description="Name of the Docker container")
-    memory: str = Field(..., description="Memory limit for the Docker container")
+    memory: Annotated[str, BeforeValidator(size_validator)] = Field(..., description="Memory limit for the Docker container")
     ports: dict[str, int] = Field(..., description="List of ports to expose from the container")
     volumes: list[str] = Field(..., description="List of volumes to mount in the container")
     environment: dict[str, Any] = Field(..., description="Environment variables to set in the container")
+    ready_timeout: float = Field(60, gt=0, description="Maximum time in seconds to wait for the container to become ready after an operation")
@@ -0,0 +1,112 @@
+from typing import Any, Annotated, Optional, Union
+from pydantic import BaseModel, Field, BeforeValidator, model_validator
+from enum import Enum
+from .docker_model import DockerResourceLimits
+
+class DependencyCondition(str, Enum):
+    STARTED = "service_started"
+    HEALTHY = "service_healthy"
+    COMPLETED = "service_completed_successfully"
+
+def depends_on_converter(value: Any) -> Any:
+    """
+    Accept the short form of `depends_on`, a list of container names, as well as the long form.
+
+    :param value: The list of names, or a mapping of names to conditions.
+    :return: A mapping of names to dependencies.
+    """
+    if isinstance(value, list):
+        return {name: {} for name in value}
+    return value
+
+class StackDependency(BaseModel):
+    """
+    Dependency of a container on another container of the same stack.
+    """
+    condition: DependencyCondition = Field(DependencyCondition.STARTED, description="Condition the dependency has to meet before the container is started")
+
+class StackHealthcheck(BaseModel):
+    """
+    Healthcheck of a container, overriding the one of its image.
+    """
+    test: Union[list[str], str] = Field(..., description="Command to check the health, e.g. ['CMD', 'pg_isready']")
+    interval: float = Field(10, gt=0, description="Seconds between two checks")
+    timeout: float = Field(5, gt=0, description="Seconds after which a check is considered failed")
+    retries: int = Field(3, gt=0, description="Number of failed checks after which the container is unhealthy")
+    start_period: float = Field(0, ge=0, description="Seconds after the start during which failed checks are not counted")
+
+    def to_docker(self) -> dict[str, Any]:
+        """
+        Get the healthcheck in the format of the Docker API, with durations in nanoseconds.
+
+        :return: The healthcheck.
+        """
+        test = self.test if isinstance(self.test, list) else ["CMD-SHELL", self.test]
+        return {
+            "test": test,
+            "interval": int(self.interval * 1e9),
+            "timeout": int(self.timeout * 1e9),
+            "retries": self.retries,
+            "start_period": int(self.start_period * 1e9),
+        }
+
+class StackContainerConfig(DockerResourceLimits):
+    """
+    Configuration of one container of a stack.
+    """
+    image: str = Field(..., description="Docker image of the container")
+    command: Optional[Union[list[str], str]] = Field(None, description="Command overriding the one of the image")
+    ports: dict[str, int] = Field(default_factory=dict, description="Ports of the container to publish on the host")
+    volumes: list[str] = Field(default_factory=list, description="Volumes to mount in the container")
+    environment: dict[str, Any] = Field(default_factory=dict, description="Environment variables to set in the container")
+    depends_on: Annotated[dict[str, StackDependency], BeforeValidator(depends_on_converter)] = Field(default_factory=dict, description="Containers of the stack to start first")
+    healthcheck: Optional[StackHealthcheck] = Field(None, description="Healthcheck overriding the one of the image")
+
+class DockerStackConfig(BaseModel):
+    """
+    Configuration of a service made of several Docker containers sharing a private network.
+    """
+    containers: dict[str, StackContainerConfig] = Field(..., min_length=1, description="Containers of the stack, keyed by the name they are reachable by on the network")
+    network: Optional[str] = Field(None, description="Name of the private network, derived from the service if omitted")
+    ready_timeout: float = Field(120, gt=0, description="Maximum time in seconds to wait for all containers to become ready after an operation")
+
+    @model_validator(mode="after")
+    def validate_dependencies(self) -> "DockerStackConfig":
+        for name, container in self.containers.items():
+            unknown = set(container.depends_on) - set(self.containers)
+            if unknown:
+                raise ValueError(f"Container '{name}' depends on unknown containers {sorted(unknown)}")
+        self.waves()
+        return self
+
+    def waves(self) -> list[list[str]]:
+        """
+        Group the containers into waves, each depending only on containers of earlier waves.
+
+        :raises ValueError: if the dependencies form a cycle.
+        :return: The names of the containers per wave, in start order.
+        """
+        remaining = {name: set(container.depends_on) for name, container in self.containers.items()}
+        waves = []
+        while remaining:
+            wave = sorted(name for name, dependencies in remaining.items() if not dependencies)
+            if not wave:
+                raise ValueError(f"Dependencies between containers {sorted(remaining)} form a cycle")
+            waves.append(wave)
+            for name in wave:
+                del remaining[name]
+            for dependencies in remaining.values():
+                dependencies.difference_update(wave)
+        return waves
+
+    def one_shot(self) -> set[str]:
+        """
+        Get the containers others wait to complete, which are expected to exit rather than keep running.
+
+        :return: The names of the containers.
+        """
+        return {
+            name for container in self.containers.values()
+            for name, dependency in container.depends_on.items()
+            if dependency.condition == DependencyCondition.COMPLETED
+        }
@@ -0,0 +1,71 @@
+from typing import Any, Annotated, Optional, Union
+from pydantic import BaseModel, Field, BeforeValidator, field_validator
+from pathlib import Path
+from enum import Enum
+from ..validators import size_validator, path_converter, parse_size
+import shlex
+
+class RestartPolicy(str, Enum):
+    NO = "no"
+    ON_FAILURE = "on-failure"
+    ALWAYS = "always"
+
+def command_converter(command: Union[list[str], str]) -> list[str]:
+    """
+    Split a command given as a string the way a shell would.
+
+    :param command: The command as a string or a list of arguments.
+    :return: The command as a list of arguments.
+    """
+    return shlex.split(command) if isinstance(command, str) else command
+
+class ProcessLimits(BaseModel):
+    """
+    Resource limits of a process, applied as rlimits before it executes.
+    """
+    memory: Optional[Annotated[str, BeforeValidator(size_validator)]] = Field(None, description="Maximum size of the address space of the process")
+    cpu_time: Optional[int] = Field(None, gt=0, description="Maximum CPU time in seconds, after which the process is killed")
+    open_files: Optional[int] = Field(None, gt=0, description="Maximum number of open file descriptors")
+    processes: Optional[int] = Field(None, gt=0, description="Maximum number of processes of the user running the service")
+    file_size: Optional[Annotated[str, BeforeValidator(size_validator)]] = Field(None, description="Maximum size of a file the process writes")
+    nice: Optional[int] = Field(None, ge=-20, le=19, description="Scheduling priority of the process")
+
+    def rlimits(self) -> dict[str, int]:
+        """
+        Get the configured limits as rlimit values.
+
+        :return: The limits keyed by the name of the rlimit in the `resource` module, e.g. `RLIMIT_AS`.
+        """
+        limits = {
+            "RLIMIT_AS": parse_size(self.memory) if self.memory else None,
+            "RLIMIT_CPU": self.cpu_time,
+            "RLIMIT_NOFILE": self.open_files,
+            "RLIMIT_NPROC": self.processes,
+            "RLIMIT_FSIZE": parse_size(self.file_size) if self.file_size else None,
+        }
+        return {name: value for name, value in limits.items() if value is not None}
+
+class ProcessServiceConfig(BaseModel):
+    """
+    Configuration of a service running as a native process.
+    """
+    command: Annotated[list[str], BeforeValidator(command_converter)] = Field(..., min_length=1, description="Command to run the service")
+    cwd: Optional[Annotated[Path, BeforeValidator(path_converter)]] = Field(None, description="Working directory of the process")
+    environment: dict[str, Any] = Field(default_factory=dict, description="Environment variables to set in addition to the ones of Eigen")
+    install_command: Optional[Annotated[list[str], BeforeValidator(command_converter)]] = Field(None, description="Command to run once to install the service")
+    uninstall_command: Optional[Annotated[list[str], BeforeValidator(command_converter)]] = Field(None, description="Command to run once to uninstall the service")
+    limits: ProcessLimits = Field(default_factory=ProcessLimits, description="Resource limits of the process")
+    ports: list[int] = Field(default_factory=list, description="TCP ports the process listens on once it is ready")
+    restart: RestartPolicy = Field(RestartPolicy.ON_FAILURE, description="When to restart the process after it exited")
+    max_restarts: int = Field(5, ge=0, description="Maximum number of restarts in a row before giving up")
+    restart_delay: float = Field(1, ge=0, description="Seconds to wait before the first restart, doubled with every further restart")
+    stop_timeout: float = Field(10, gt=0, description="Seconds to wait after SIGTERM before killing the process")
+    ready_timeout: float = Field(60, gt=0, description="Maximum time in seconds to wait for the process to become ready after an operation")
+    log_size: Annotated[str, BeforeValidator(size_validator)] = Field("10m", description="Size of the log file after which it is rotated on the next start")
+
+    @field_validator("ports")
+    def validate_ports(cls, ports: list[int]) -> list[int]:
+        for port in ports:
+            if not 1 <= port <= 65535:
+                raise ValueError(f"Port must be between 1 and 65535, got {port}")
+        return ports
@@ -1,6 +1,7 @@
 from typing import Optional, Annotated
 from pydantic import BaseModel, Field, field_validator, BeforeValidator
 from enum import Enum
+from .validators import size_validator
 
 def protocol_validator(*protocols):
     def validator(cls, value):
@@ -18,7 +19,7 @@ class ServiceInfo(BaseModel):
     description: str = Field(..., description="Description of the service")
     website: str = Field(..., description="Public website for the service")
     categories: list[str] = Field(..., description="Categories the service belongs to")
-    icon: str = Field(..., description="URL to the service's image")
+    icon: str = Field(..., description="Reference to the icon of the service in the asset store, e.g. `asset:<sha256>.png`, or a URL to it")
 
 class ServicePortforwarding(BaseModel):
     """
@@ -41,6 +42,39 @@ class ServiceProvider(BaseModel):
     slug: str = Field(..., description="Unique identifier for the service provider")
     options: dict = Field(..., description="Optional provider-specific configuration data")
 
+class IdleAction(str, Enum):
+    PAUSE = "pause"
+    STOP = "stop"
+
+class ServiceIdle(BaseModel):
+    """
+    Idle policy of the service: suspend it while nobody uses it and wake it on the next connection.
+    """
+    after: float = Field(15, gt=0, description="Minutes without traffic after which the service is suspended")
+    action: IdleAction = Field(IdleAction.PAUSE, description="Whether to pause or to stop the service when it is idle")
+    port: int = Field(..., description="Port to accept connections on in place of the service")
+    target_port: int = Field(..., description="Host port the service itself listens on", alias="target-port")
+    listen_host: str = Field("0.0.0.0", description="Address to accept connections on", alias="listen-host")
+    wake_timeout: float = Field(60, gt=0, description="Seconds to wait for the service to become ready when waking it", alias="wake-timeout")
+
+class ProbeType(str, Enum):
+    HTTP = "http"
+    TCP = "tcp"
+
+class ServiceProbe(BaseModel):
+    """
+    Health probe of the service: a request it has to answer while running to count as healthy.
+    """
+    type: ProbeType = Field(ProbeType.HTTP, description="Whether to send an HTTP request or only open a TCP connection")
+    port: int = Field(..., description="Host port to probe")
+    host: str = Field("127.0.0.1", description="Address to probe")
+    path: str = Field("/", description="Path to request, for HTTP probes")
+    expect: list[int] = Field(default_factory=list, description="HTTP status codes counting as healthy, any below 400 if empty")
+    timeout: float = Field(5, gt=0, description="Seconds to wait for an answer")
+    min_interval: float = Field(2, gt=0, description="Seconds between probes right after a change", alias="min-interval")
+    max_interval: float = Field(60, gt=0, description="Seconds between probes once the service is stable", alias="max-interval")
+    unhealthy_after: int = Field(2, ge=1, description="Failed probes in a row after which the service is unhealthy", alias="unhealthy-after")
+
 class ServiceConfig(BaseModel):
     """
     Configuration for a service.
@@ -48,6 +82,9 @@ class ServiceConfig(BaseModel):
     enable: Optional[bool] = Field(..., description="Whether the service is enabled")
     provider: ServiceProvider = Field(..., description="Provider information for the service")
     info: ServiceInfo = Field(..., description="Information about the service")
+    quota: Optional[Annotated[str, BeforeValidator(size_validator)]] = Field(None, description="Disk quota of the service, overriding the default quota")
+    idle: Optional[ServiceIdle] = Field(None, description="Idle policy of the service")
+    probe: Optional[ServiceProbe] = Field(None, description="Health probe of the service")
 
 class ServiceStatus(str, Enum):
     RUNNING = "running"
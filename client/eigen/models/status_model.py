@@ -0,0 +1,148 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from .service_model import ServiceStatus, IdleAction
+from enum import Enum
+
+class ServiceProgress(BaseModel):
+    """
+    Progress of a long-running operation on a service, such as downloading an update.
+    """
+    bytes_done: int = Field(0, description="Number of bytes transferred so far")
+    bytes_total: int = Field(0, description="Number of bytes to transfer in total, as far as known")
+    layers_done: int = Field(0, description="Number of completed layers")
+    layers_total: int = Field(0, description="Number of layers in total, as far as known")
+
+    @property
+    def fraction(self) -> float:
+        """
+        Get the completed fraction of the operation.
+
+        :return: A value between 0 and 1.
+        """
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total, 1.0)
+        if self.layers_total:
+            return self.layers_done / self.layers_total
+        return 0.0
+
+class ServiceState(BaseModel):
+    """
+    Observed state of a single service at a point in time.
+    """
+    status: ServiceStatus = Field(..., description="Status of the service")
+    installed: bool = Field(..., description="Whether the service is installed")
+    busy: bool = Field(..., description="Whether the service is currently locked by an operation")
+    progress: Optional[ServiceProgress] = Field(None, description="Progress of a running update, if any")
+    healthy: Optional[bool] = Field(None, description="Whether the service passes its health probe, None if it has none or was not probed yet")
+
+class StatusSnapshot(BaseModel):
+    """
+    Observed state of a set of services, resolved at once.
+    """
+    timestamp: float = Field(..., description="Unix time at which the snapshot was taken")
+    states: dict[str, ServiceState] = Field(default_factory=dict, description="States of the services keyed by their slug")
+
+    def __getitem__(self, slug: str) -> ServiceState:
+        return self.states[slug]
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self.states
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def get(self, slug: str) -> Optional[ServiceState]:
+        """
+        Get the state of a service, if it is part of the snapshot.
+
+        :param slug: The slug of the service.
+        :return: The state of the service, or None if it is not part of the snapshot.
+        """
+        return self.states.get(slug)
+
+    def merge(self, other: "StatusSnapshot") -> "StatusSnapshot":
+        """
+        Merge another snapshot into a new snapshot. The older timestamp of both is kept.
+
+        :param other: The snapshot to merge.
+        :return: A new snapshot containing the states of both snapshots.
+        """
+        return StatusSnapshot(timestamp=min(self.timestamp, other.timestamp), states={**self.states, **other.states})
+
+class ServiceUsage(BaseModel):
+    """
+    Disk usage of a single service.
+    """
+    image_bytes: int = Field(0, description="Size of the image layers of the service")
+    container_bytes: int = Field(0, description="Size of the writable layer of the service's container")
+    volume_bytes: int = Field(0, description="Size of the volumes of the service")
+    measured_at: float = Field(..., description="Unix time at which the usage was measured")
+
+    @property
+    def total(self) -> int:
+        """
+        Get the total disk usage of the service.
+
+        :return: The total usage in bytes.
+        """
+        return self.image_bytes + self.container_bytes + self.volume_bytes
+
+class MetricsSample(BaseModel):
+    """
+    Resource usage of a single service at a point in time.
+    """
+    timestamp: float = Field(..., description="Unix time at which the sample was taken")
+    cpu_percent: float = Field(0, description="CPU usage in percent of one core")
+    memory_bytes: float = Field(0, description="Memory used, excluding the page cache")
+    memory_limit: float = Field(0, description="Memory limit, or the memory of the host if unlimited")
+    net_rx_rate: float = Field(0, description="Bytes received per second over all networks")
+    net_tx_rate: float = Field(0, description="Bytes sent per second over all networks")
+    block_read_rate: float = Field(0, description="Bytes read per second from block devices")
+    block_write_rate: float = Field(0, description="Bytes written per second to block devices")
+
+class WakeStats(BaseModel):
+    """
+    Latency of waking a service after it was suspended for being idle.
+    """
+    action: IdleAction = Field(..., description="How the service had been suspended")
+    count: int = Field(..., description="Number of measured wake-ups")
+    last: float = Field(..., description="Seconds the most recent wake-up took")
+    mean: float = Field(..., description="Mean seconds a wake-up took")
+    p95: float = Field(..., description="95th percentile of the seconds a wake-up took")
+    max: float = Field(..., description="Longest wake-up in seconds")
+
+class ServiceHealth(BaseModel):
+    """
+    Outcome of the recent health probes of a single service.
+    """
+    healthy: Optional[bool] = Field(None, description="Whether the service passes its probe, None if not probed while running yet")
+    checked_at: Optional[float] = Field(None, description="Unix time of the last probe")
+    failures: int = Field(0, description="Number of failed probes in a row")
+    error: Optional[str] = Field(None, description="Why the last probe failed, if it did")
+    interval: float = Field(..., description="Seconds until the next probe")
+    samples: int = Field(0, description="Number of latencies the percentiles are computed from")
+    p50: Optional[float] = Field(None, description="Median seconds a successful probe took")
+    p95: Optional[float] = Field(None, description="95th percentile of the seconds a successful probe took")
+    p99: Optional[float] = Field(None, description="99th percentile of the seconds a successful probe took")
+
+class StatusChange(BaseModel):
+    """
+    Change of the status of a single service, as published to subscribers.
+    """
+    slug: str = Field(..., description="Slug of the service")
+    old_status: ServiceStatus = Field(..., description="Status of the service before the change")
+    new_status: ServiceStatus = Field(..., description="Status of the service after the change")
+    timestamp: float = Field(..., description="Unix time at which the change was observed")
+
+class ConfigChangeKind(str, Enum):
+    ADDED = "added"
+    UPDATED = "updated"
+    REMOVED = "removed"
+
+class ConfigChange(BaseModel):
+    """
+    Change of the configuration of a single service, after its configuration file changed.
+    """
+    slug: str = Field(..., description="Slug of the service")
+    kind: ConfigChangeKind = Field(..., description="Whether the service was added, updated or removed")
+    timestamp: float = Field(..., description="Unix time at which the change was applied")
@@ -71,3 +71,44 @@ def path_converter(path: str) -> Path:
     except Exception as e:
         raise ValidationError(f"Invalid path: {path}. Error: {e}")
     return filepath
+
+SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+def size_validator(size: str) -> str:
+    """
+    Validate a size string as understood by Docker, e.g. `512m` or `2g`.
+
+    :param size: The size string to validate.
+    :raises ValueError: If the size is not a number optionally followed by b, k, m or g.
+    :return: The validated size string in lowercase.
+    """
+    size = str(size).strip().lower()
+    if not re.match(r"^\d+[bkmg]?$", size):
+        raise ValueError(f"Invalid size: {size}. Expected a number optionally followed by b, k, m or g.")
+    return size
+
+def parse_size(size: str) -> int:
+    """
+    Convert a validated size string to bytes.
+
+    :param size: The size string, e.g. `512m`.
+    :return: The size in bytes.
+    """
+    unit = size[-1] if size[-1] in SIZE_UNITS else ""
+    return int(size[:len(size) - len(unit)]) * SIZE_UNITS[unit]
+
+def cpuset_validator(cpuset: str) -> str:
+    """
+    Validate a set of CPUs, e.g. `0-2,4`.
+
+    :param cpuset: The set of CPUs to validate.
+    :raises ValueError: If the set is not a comma separated list of CPUs or CPU ranges.
+    :return: The validated set of CPUs.
+    """
+    if not re.match(r"^\d+(-\d+)?(,\d+(-\d+)?)*$", cpuset):
+        raise ValueError(f"Invalid cpuset: {cpuset}. Expected e.g. '0-2,4'.")
+    for part in cpuset.split(","):
+        start, _, end = part.partition("-")
+        if end and int(end) < int(start):
+            raise ValueError(f"Invalid CPU range in cpuset: {part}")
+    return cpuset
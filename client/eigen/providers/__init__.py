@@ -1,6 +1,14 @@
 from .docker import Docker
+from .docker_async import AsyncDocker
+from .docker_stack import DockerStack
+from .process import Process
+
+docker = Docker()
 
 PROVIDERS = {
-    "docker": Docker(),
+    "docker": docker,
+    "docker-async": AsyncDocker(),
+    "docker-stack": DockerStack(docker),
+    "process": Process(),
     # Add other providers here as needed
 }
@@ -1,98 +1,249 @@
-from eigen.core import Provider, Service, ServiceConfig, ServiceError, ServiceStatus, EigenConfig
-from eigen.models import ServiceConfig, DockerServiceConfig
+from eigen.core import Provider, Service, ServiceConfig, ServiceError, ServiceStatus, ServiceProgress, ServiceState, StatusSnapshot, ServiceUsage, MetricsSample, LogLine, EigenConfig
+from eigen.models import ServiceConfig, DockerServiceConfig, EigenStorage, HOST_CONFIG_LIMITS
 from docker.errors import ImageNotFound, APIError
-from typing import Callable
+from requests.exceptions import RequestException
+from .docker_client import SharedDockerClient
+from .docker_events import DockerStateCache, container_status, normalize_image
+from .docker_pull import PullManager
+from .docker_stats import stats_sample
+from .docker_logs import LogDecoder
+from typing import Callable, Iterator, Optional
+from pathlib import Path
+import threading
+import itertools
+import logging
+import socket
 import time
+import os
 import docker
 
+def directory_size(path: Path) -> int:
+    """
+    Compute the disk space used by a file or directory tree, without following symlinks.
+
+    :param path: The path to measure.
+    :return: The used disk space in bytes, 0 if the path does not exist or is not accessible.
+    """
+    try:
+        stat = path.lstat()
+    except OSError:
+        return 0
+    total = stat.st_blocks * 512
+    if not path.is_dir() or path.is_symlink():
+        return total
+    stack = [path]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                total += entry.stat(follow_symlinks=False).st_blocks * 512
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+            except OSError:
+                continue
+    return total
+
+def container_drift(container: dict, options: DockerServiceConfig) -> list[str]:
+    """
+    Compare a container with the options it should have been created with.
+
+    :param container: The container, as returned by `inspect_container`.
+    :param options: The options of the service.
+    :return: The names of the options the container differs in.
+    """
+    config = container.get("Config") or {}
+    host_config = container.get("HostConfig") or {}
+    drift = []
+    if normalize_image(config.get("Image", "")) != normalize_image(options.image):
+        drift.append("image")
+    environment = set(config.get("Env") or [])
+    if any(f"{name}={value}" not in environment for name, value in options.environment.items()):
+        drift.append("environment")
+    bindings = {
+        port: (bound[0].get("HostPort") if bound else None)
+        for port, bound in (host_config.get("PortBindings") or {}).items()
+    }
+    expected = {port if "/" in port else f"{port}/tcp": str(host_port) for port, host_port in options.ports.items()}
+    if bindings != expected:
+        drift.append("ports")
+    if set(host_config.get("Binds") or []) != set(options.volumes):
+        drift.append("volumes")
+    limits = options.resource_limits()
+    for argument, field in HOST_CONFIG_LIMITS.items():
+        if argument == "memswap_limit" and argument not in limits:
+            # the daemon derives the swap limit from the memory limit
+            continue
+        actual = host_config.get(field)
+        # unset limits are reported as null, 0, -1 or an empty string
+        if not actual or (isinstance(actual, int) and actual < 0):
+            actual = None
+        if actual != limits.get(argument):
+            drift.append(argument)
+    return drift
+
 class DockerService(Service):
     """
     Service managed through Docker.
     """
-    LOCK_DELAY = 10
-    def __init__(self, slug: str, config: ServiceConfig, eigen_config: EigenConfig):
+    PROBE_HOST = "127.0.0.1"
+    PROBE_TIMEOUT = .2
+    def __init__(self, slug: str, config: ServiceConfig, eigen_config: EigenConfig, client: SharedDockerClient, state: DockerStateCache, pulls: PullManager):
         """
         Initialize the Docker service.
 
         :param config: Configuration for the Docker service.
+        :param client: The Docker client shared by all services of the provider.
+        :param state: The container and image state cache of the provider.
+        :param pulls: The image pull manager of the provider.
         """
         super().__init__(slug, config, eigen_config, DockerServiceConfig)
+        self._client = client
+        self._state = state
+        self._pulls = pulls
+        self._container_id: Optional[str] = None
+        # the container and options last found to match, to avoid inspecting it again
+        self._verified: Optional[tuple[str, str]] = None
 
-        self._last_status_update = 0
-        self._cached_status = ServiceStatus.UNKNOWN
+    @property
+    def _container(self) -> str:
+        """
+        Get the reference lifecycle calls are addressed to.
+
+        :return: The ID of the container if it has been recorded, its name otherwise.
+        """
+        return self._container_id or self.slug
 
     def _image_exists(self) -> bool:
         """
         Check if the Docker image exists.
         :return: True if the image exists, False otherwise.
         """
-        client = docker.from_env()
         try:
-            client.images.get(self._config.provider.options.image)
+            self._client.run(lambda client: client.images.get(self._config.provider.options.image), retry=True)
             return True
         except ImageNotFound:
             return False
-        finally:
-            client.close()
 
     def _pull_image(self) -> None:
         """
         Pull the Docker image if it does not exist.
         :raises ServiceError: if the image cannot be pulled.
         """
-        client = docker.from_env()
-        try:
-            client.images.pull(self._config.provider.options.image)
-        except APIError as e:
-            raise ServiceError(f"Failed to pull Docker image: {e}")
-        finally:
-            client.close()
+        self._pulls.pull(self._config.provider.options.image)
 
     def _container_exists(self) -> bool:
         """
-        Check if the Docker container exists.
+        Check if the Docker container exists and record its ID.
         :return: True if the container exists, False otherwise.
         """
-        client = docker.from_env()
         try:
-            client.containers.get(self.slug)
-            return True
+            container = self._client.run(lambda client: client.api.inspect_container(self.slug), retry=True)
         except docker.errors.NotFound:
+            self._container_id = None
             return False
-        finally:
-            client.close()
+        self._container_id = container["Id"]
+        return True
 
     def _create_container(self) -> None:
         """
-        Create a Docker container if it does not exist.
+        Create the Docker container and record its ID.
         :raises ServiceError: if the container cannot be created.
         """
-        client = docker.from_env()
+        options = self._config.provider.options
         try:
-            client.containers.create(
-                self._config.provider.options.image,
+            container = self._client.run(lambda client: client.containers.create(
+                options.image,
                 name=self.slug,
                 detach=True,
-                ports=self._config.provider.options.ports,
-                environment=self._config.provider.options.environment,
-                volumes=self._config.provider.options.volumes
-            )
+                ports=options.ports,
+                environment=options.environment,
+                volumes=options.volumes,
+                **options.resource_limits()
+            ))
         except APIError as e:
             raise ServiceError(f"Failed to create Docker container: {e}")
-        finally:
-            client.close()
+        self._container_id = container.id
+
+    def _has_healthcheck(self) -> bool:
+        """
+        Check if the Docker container defines a healthcheck.
+
+        :return: True if the container reports its health, False otherwise.
+        """
+        try:
+            container = self._client.run(lambda client: client.api.inspect_container(self._container), retry=True)
+        except docker.errors.NotFound:
+            return False
+        return container.get("State", {}).get("Health") is not None
+
+    def _ports_open(self) -> bool:
+        """
+        Check if all mapped TCP ports of the container accept connections.
+
+        The docker-proxy accepts connections on mapped ports even before the container listens,
+        but closes them right away in that case, so a connection only counts if it stays open.
+
+        :return: True if every mapped TCP port accepts connections, False otherwise.
+        """
+        for container_port, host_port in self._config.provider.options.ports.items():
+            if not container_port.endswith("/tcp") and "/" in container_port:
+                continue
+            try:
+                with socket.create_connection((self.PROBE_HOST, host_port), timeout=self.PROBE_TIMEOUT) as connection:
+                    if connection.recv(1) == b"":
+                        return False
+            except socket.timeout:
+                # connection stayed open without the server speaking first
+                continue
+            except OSError:
+                return False
+        return True
+
+    def _hold_until_ready(self, target: ServiceStatus) -> None:
+        """
+        Keep the service reported as busy until it has reached the target status and, when it is
+        supposed to be running, passes its healthcheck or accepts connections on its mapped ports.
+
+        :param target: The status the service is expected to reach.
+        """
+        healthcheck = target == ServiceStatus.RUNNING and self._has_healthcheck()
+
+        def ready() -> bool:
+            try:
+                if self._status() != target:
+                    return False
+                if target != ServiceStatus.RUNNING:
+                    return True
+                if healthcheck:
+                    return self._state.container_health(self.slug) == "healthy"
+            except ServiceError:
+                return False
+            return self._ports_open()
+
+        self.lock.hold_until(ready, self._config.provider.options.ready_timeout)
 
     @staticmethod
     def _ensure_container_exists(func) -> Callable:
         """
-        Decorator to ensure the Docker container exists before executing a function.
+        Decorator to ensure the Docker container exists when executing a function.
+
+        The function is executed right away. Only if the daemon reports the container as missing,
+        because it was removed or replaced since its ID was recorded, the image and container are
+        looked up, pulled or created as necessary and the function is executed again.
         :param func: The function to execute.
         """
         def wrapper(self, *args, **kwargs):
             """
-            Ensure the Docker container exists before executing the function.
+            Execute the function, ensuring the Docker container exists if it is missing.
             :raises ServiceError: if the container does not exist and cannot be created.
             """
+            try:
+                return func(self, *args, **kwargs)
+            except docker.errors.NotFound:
+                self._container_id = None
             if not self._image_exists():
                 self._pull_image()
             if not self._container_exists():
@@ -107,11 +258,8 @@ class DockerService(Service):
 
         :raises ServiceError: if the service cannot be started.
         """
-        client = docker.from_env()
-        client.containers.get(self.slug).start()
-        # small delay to ensure the container is fully started
-        self.lock.add_delay(self.LOCK_DELAY)
-        client.close()
+        self._client.run(lambda client: client.api.start(self._container))
+        self._hold_until_ready(ServiceStatus.RUNNING)
 
     @_ensure_container_exists
     def _stop(self) -> None:
@@ -120,11 +268,8 @@ class DockerService(Service):
 
         :raises ServiceError: if the service cannot be stopped.
         """
-        client = docker.from_env()
-        client.containers.get(self.slug).stop()
-        # small delay to ensure the container has time to stop gracefully
-        self.lock.add_delay(self.LOCK_DELAY)
-        client.close()
+        self._client.run(lambda client: client.api.stop(self._container))
+        self._hold_until_ready(ServiceStatus.STOPPED)
 
     @_ensure_container_exists
     def _restart(self) -> None:
@@ -133,11 +278,78 @@ class DockerService(Service):
 
         :raises ServiceError: if the service cannot be restarted.
         """
-        client = docker.from_env()
-        client.containers.get(self.slug).restart()
-        # small delay to ensure the container is fully restarted
-        self.lock.add_delay(self.LOCK_DELAY)
-        client.close()
+        self._client.run(lambda client: client.api.restart(self._container))
+        self._hold_until_ready(ServiceStatus.RUNNING)
+
+    @_ensure_container_exists
+    def _pause(self) -> None:
+        """
+        Pause the Docker service by freezing the processes of its container.
+
+        :raises ServiceError: if the service cannot be paused.
+        """
+        self._client.run(lambda client: client.api.pause(self._container))
+        self._hold_until_ready(ServiceStatus.PAUSED)
+
+    @_ensure_container_exists
+    def _unpause(self) -> None:
+        """
+        Unpause the Docker service.
+
+        :raises ServiceError: if the service cannot be unpaused.
+        """
+        self._client.run(lambda client: client.api.unpause(self._container))
+        self._hold_until_ready(ServiceStatus.RUNNING)
+
+    def has_drifted(self) -> bool:
+        """
+        Check if the Docker container differs from the configured options. A container found to
+        match is not inspected again until it or the options change.
+
+        :raises ServiceError: if the container cannot be inspected.
+        :return: True if the container has to be recreated, False otherwise.
+        """
+        options = self._config.provider.options
+        fingerprint = options.model_dump_json()
+        if self._container_id is not None and self._verified == (self._container_id, fingerprint):
+            return False
+        try:
+            container = self._client.run(lambda client: client.api.inspect_container(self.slug), retry=True)
+        except docker.errors.NotFound:
+            # a missing container is created from the options when it is needed
+            return False
+        except APIError as e:
+            raise ServiceError(f"Failed to inspect Docker container: {e}")
+        self._container_id = container["Id"]
+        drift = container_drift(container, options)
+        if drift:
+            logging.info(f"Container of '{self.slug}' differs from its configuration in {', '.join(drift)}.")
+            return True
+        self._verified = (self._container_id, fingerprint)
+        return False
+
+    def _recreate(self) -> None:
+        """
+        Recreate the Docker container from the configured options, pulling the image if it
+        changed. The container is started again if it was running.
+
+        :raises ServiceError: if the container cannot be recreated.
+        """
+        running = self._state.container_state(self.slug) in ("running", "restarting", "paused")
+        if not self._image_exists():
+            self._pull_image()
+        try:
+            if self._container_exists():
+                self._client.run(lambda client: client.api.remove_container(self._container, force=True))
+                self._container_id = None
+        except APIError as e:
+            raise ServiceError(f"Failed to remove Docker container: {e}")
+        self._create_container()
+        if running:
+            self._client.run(lambda client: client.api.start(self._container))
+            self._hold_until_ready(ServiceStatus.RUNNING)
+        else:
+            self._hold_until_ready(ServiceStatus.STOPPED)
 
     def is_installed(self) -> bool:
         """
@@ -145,19 +357,21 @@ class DockerService(Service):
 
         :return: True if the Docker service is installed, False otherwise.
         """
-        return self._image_exists()
+        return self._state.image_exists(self._config.provider.options.image)
 
     def _install(self) -> None:
         """
-        Install the Docker service by pulling the image.
+        Install the Docker service by pulling the image and creating the container ahead of the
+        first start.
 
-        :raises ServiceError: if the image cannot be pulled.
+        :raises ServiceError: if the image cannot be pulled or the container cannot be created.
         """
-        if not self._image_exists():
-            self._pull_image()
-            self.lock.add_delay(5)
-        else:
+        if self._image_exists():
             raise ServiceError("Docker service is already installed.")
+        self._pull_image()
+        if not self._container_exists():
+            self._create_container()
+        self._hold_until_ready(ServiceStatus.STOPPED)
 
     def _uninstall(self) -> None:
         """
@@ -165,64 +379,112 @@ class DockerService(Service):
 
         :raises ServiceError: if the container or image cannot be removed.
         """
-        client = docker.from_env()
         try:
-            self.lock.add_delay(self.LOCK_DELAY)
             if self._container_exists():
-                container = client.containers.get(self.slug)
-                container.remove(force=True)
+                self._client.run(lambda client: client.api.remove_container(self._container, force=True))
+                self._container_id = None
             if self._image_exists():
-                client.images.remove(self._config.provider.options.image, force=True)
+                self._client.run(lambda client: client.images.remove(self._config.provider.options.image, force=True))
         except APIError as e:
             raise ServiceError(f"Failed to uninstall Docker service: {e}")
-        finally:
-            client.close()
+        self._hold_until_ready(ServiceStatus.NOT_FOUND)
 
     def _status(self) -> ServiceStatus:
         """
-        Get the status of the Docker service.
+        Get the status of the Docker service from the provider's state cache.
 
         :return: The status of the Docker service.
         :raises ServiceError: if the status cannot be retrieved.
         """
+        if self._pulls.is_pulling(self._config.provider.options.image):
+            return ServiceStatus.UPDATING
+        state = self._state.container_state(self.slug)
+        return self._resolve_status(state, state is not None or self.is_installed())
 
-        current_time = time.time()
-        if current_time - self._last_status_update < 5:
-            return self._cached_status
+    def progress(self) -> Optional[ServiceProgress]:
+        """
+        Get the progress of a running pull of the Docker image.
 
-        self._last_status_update = current_time
-        if not self._container_exists():
-            status = ServiceStatus.STOPPED if self._image_exists() else ServiceStatus.NOT_FOUND
-            self._cached_status = status
-            return status
+        :return: The progress, or None if the image is not being pulled.
+        """
+        return self._pulls.progress(self._config.provider.options.image)
+
+    def logs(self, tail: Optional[int] = None, follow: bool = False, since: Optional[float] = None,
+             until: Optional[float] = None) -> Iterator[LogLine]:
+        """
+        Stream the output of the Docker container line by line as the daemon sends it.
+
+        :param tail: Only return this many of the most recent lines, or all lines if None.
+        :param follow: Whether to keep streaming new lines as they are written.
+        :param since: Only return lines written after this Unix time, if given.
+        :param until: Only return lines written before this Unix time, if given.
+        :return: An iterator over the lines, oldest first.
+        :raises ServiceError: if the container does not exist or its output cannot be retrieved.
+        """
+        try:
+            stream = self._client.run(lambda client: client.api.logs(
+                self._container,
+                stream=True,
+                follow=follow,
+                timestamps=True,
+                tail="all" if tail is None else tail,
+                since=since,
+                until=until,
+            ), retry=True)
+        except docker.errors.NotFound:
+            raise ServiceError(f"Service '{self.slug}' has no container to get logs from.")
+        except APIError as e:
+            raise ServiceError(f"Failed to get logs of Docker service: {e}")
+        return self._decode_logs(stream)
 
-        client = docker.from_env()
+    @staticmethod
+    def _decode_logs(stream: Iterator[bytes]) -> Iterator[LogLine]:
+        """
+        Split the demultiplexed output of a container into lines.
+
+        :param stream: The output chunks, as returned by docker-py.
+        :return: An iterator over the lines.
+        :raises ServiceError: if the stream breaks off.
+        """
+        decoder = LogDecoder()
         try:
-            container = client.containers.get(self.slug)
-            match(container.status):
-                case "running":
-                    status = ServiceStatus.RUNNING
-                case "exited" | "created":
-                    status = ServiceStatus.STOPPED
-                case "restarting":
-                    status = ServiceStatus.RESTARTING
-                case "paused":
-                    status = ServiceStatus.PAUSED
-                case "dead":
-                    status = ServiceStatus.ERROR
-                case _:
-                    status = ServiceStatus.UNKNOWN
-            self._cached_status = status
-            return status
-        except Exception as e:
-            raise ServiceError(f"Failed to get Docker service status: {e}")
+            for chunk in stream:
+                yield from decoder.feed(chunk)
+        except RequestException as e:
+            raise ServiceError(f"Docker log stream broke off: {e}")
         finally:
-            client.close()
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        yield from decoder.flush()
+
+    @staticmethod
+    def _resolve_status(state: Optional[str], installed: bool) -> ServiceStatus:
+        """
+        Resolve the status of a Docker service from the state of its container and image.
+
+        :param state: The Docker state of the container, or None if it does not exist.
+        :param installed: Whether the image of the service is present.
+        :return: The status of the Docker service.
+        """
+        if state is None:
+            return ServiceStatus.STOPPED if installed else ServiceStatus.NOT_FOUND
+        return container_status(state)
 
 class Docker(Provider):
     """
     Provider for services managed through docker.
     """
+    MAX_CONCURRENT_PULLS = 2
+
+    def __init__(self):
+        """
+        Initialize the Docker provider with a client shared by all of its services.
+        """
+        self.client = SharedDockerClient()
+        self.state = DockerStateCache(self.client)
+        self.pulls = PullManager(self.client, self.MAX_CONCURRENT_PULLS)
+        self._image_sizes: dict[str, int] = {}
 
     def create_service(self, slug: str, service_config: ServiceConfig, eigen_config: EigenConfig):
         """
@@ -234,4 +496,146 @@ class Docker(Provider):
         :raises ServiceError: if the service cannot be obtained.
         """
         # Implementation for obtaining a Docker service
-        return DockerService(slug, service_config, eigen_config)
+        return DockerService(slug, service_config, eigen_config, self.client, self.state, self.pulls)
+
+    def bulk_status(self, services: list[DockerService]) -> StatusSnapshot:
+        """
+        Resolve the state of several Docker services at once.
+
+        While the state cache follows the event stream this costs no request at all, otherwise a
+        single container listing and a single image listing are made for all services together.
+
+        :param services: The services to resolve.
+        :raises ServiceError: if the status cannot be retrieved.
+        :return: A snapshot of the states of the services.
+        """
+        timestamp = time.time()
+        containers, images = self.state.tables()
+        states = {}
+        for service in services:
+            image = service.config.provider.options.image
+            installed = normalize_image(image) in images
+            progress = self.pulls.progress(image)
+            states[service.slug] = ServiceState(
+                status=ServiceStatus.UPDATING if progress is not None else service._resolve_status(containers.get(service.slug), installed),
+                installed=installed,
+                busy=service.is_busy(),
+                progress=progress,
+            )
+        return StatusSnapshot(timestamp=timestamp, states=states)
+
+    def _volume_path(self, volume: str) -> Optional[Path]:
+        """
+        Get the host path of a volume specification.
+
+        :param volume: The volume specification, e.g. `/opt/data:/data` or `data:/data:ro`.
+        :return: The host path of the volume, or None if it cannot be determined.
+        """
+        source = volume.split(":", 1)[0]
+        if source.startswith("/"):
+            return Path(source)
+        try:
+            mountpoint = self.client.run(lambda client: client.api.inspect_volume(source), retry=True)["Mountpoint"]
+        except (docker.errors.NotFound, APIError):
+            return None
+        return Path(mountpoint)
+
+    def on_change(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Call a function whenever the daemon reports a change of a container or image. The event
+        stream of the daemon is followed from then on.
+
+        :param callback: The function to call, on the thread following the event stream. It must
+            return quickly.
+        :return: A function to stop calling the callback.
+        """
+        return self.state.add_listener(callback)
+
+    def service_usage(self, service: DockerService) -> ServiceUsage:
+        """
+        Measure the disk usage of a Docker service: its image, the writable layer of its container
+        and its volumes. Image sizes are cached, since images never change.
+
+        :param service: The service to measure.
+        :raises ServiceError: if the usage cannot be measured.
+        :return: The disk usage of the service.
+        """
+        options = service.config.provider.options
+        image_bytes = 0
+        try:
+            image = self.client.run(lambda client: client.api.inspect_image(options.image), retry=True)
+            image_bytes = self._image_sizes.setdefault(image["Id"], image.get("Size", 0))
+        except ImageNotFound:
+            pass
+        containers = self.client.run(
+            lambda client: client.api.containers(all=True, size=True, filters={"name": f"^/{service.slug}$"}),
+            retry=True,
+        )
+        container_bytes = sum(container.get("SizeRw") or 0 for container in containers)
+        volume_bytes = sum(directory_size(path) for path in map(self._volume_path, options.volumes) if path is not None)
+        return ServiceUsage(image_bytes=image_bytes, container_bytes=container_bytes, volume_bytes=volume_bytes, measured_at=time.time())
+
+    def prune(self, policy: EigenStorage, services: list[DockerService]) -> int:
+        """
+        Prune dangling images, stopped containers not belonging to any service (by name or by the
+        `eigen.service` label) and the build cache, as far as the policy allows.
+
+        :param policy: The storage policy deciding what may be pruned.
+        :param services: The Docker services, whose containers and images must be kept.
+        :raises ServiceError: if pruning fails.
+        :return: The number of bytes reclaimed.
+        """
+        reclaimed = 0
+        try:
+            if policy.prune_containers:
+                keep = {f"/{service.slug}" for service in services}
+                stopped = self.client.run(lambda client: client.api.containers(all=True, filters={"status": ["exited", "created", "dead"]}), retry=True)
+                for container in stopped:
+                    if not keep.intersection(container.get("Names") or []) and "eigen.service" not in (container.get("Labels") or {}):
+                        self.client.run(lambda client: client.api.remove_container(container["Id"]))
+            if policy.prune_images:
+                result = self.client.run(lambda client: client.api.prune_images(filters={"dangling": True}))
+                reclaimed += result.get("SpaceReclaimed") or 0
+            if policy.prune_build_cache:
+                result = self.client.run(lambda client: client.api.prune_builds())
+                reclaimed += result.get("SpaceReclaimed") or 0
+        except APIError as e:
+            raise ServiceError(f"Failed to prune Docker data: {e}")
+        return reclaimed
+
+    def stream_metrics(self, service: DockerService, stopped: threading.Event) -> Iterator[MetricsSample]:
+        """
+        Follow the Docker stats stream of a service's container. The daemon pushes a sample about
+        once a second and ends the stream when the container stops.
+
+        :param service: The service to observe.
+        :param stopped: Set when the caller is no longer interested in samples.
+        :raises ServiceError: if the stream cannot be opened.
+        :return: An iterator over the samples.
+        """
+        def open_stats(client: docker.DockerClient) -> tuple[Iterator[dict], Optional[dict]]:
+            # the request is only sent, and fails, once the first sample is asked for
+            stream = client.api.stats(service._container, stream=True, decode=True)
+            try:
+                return stream, next(stream, None)
+            except BaseException:
+                stream.close()
+                raise
+
+        try:
+            stream, first = self.client.run(open_stats, retry=True)
+        except (docker.errors.NotFound, APIError) as e:
+            raise ServiceError(f"Failed to open Docker stats stream: {e}")
+        previous = None
+        try:
+            for stats in itertools.chain([first] if first is not None else [], stream):
+                if stopped.is_set():
+                    break
+                timestamp = time.time()
+                yield stats_sample(stats, timestamp, previous)
+                previous = (stats, timestamp)
+        except RequestException as e:
+            raise ServiceError(f"Docker stats stream of '{service.slug}' broke off: {e}")
+        finally:
+            # closing the generator closes the response, and with it the connection
+            stream.close()
@@ -0,0 +1,532 @@
+from eigen.core import AsyncProvider, AsyncService, ServiceConfig, ServiceError, ServiceStatus, LogLine, EigenConfig
+from eigen.models import DockerServiceConfig, HOST_CONFIG_LIMITS
+from .docker_events import container_status, split_image
+from .docker_logs import LogDecoder
+from urllib.parse import urlencode, quote
+from typing import Any, AsyncIterator, Optional
+from pathlib import Path
+import concurrent.futures
+import asyncio
+import json
+import os
+
+DEFAULT_SOCKET = Path("/var/run/docker.sock")
+# requests that can be repeated safely if the connection breaks
+IDEMPOTENT_METHODS = {"GET", "HEAD"}
+
+class AsyncDockerError(ServiceError):
+    """
+    Exception raised when the Docker daemon answers a request with an error.
+    """
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker API error {status}: {message}")
+        self.status = status
+
+
+class AsyncDockerAPI:
+    """
+    Minimal asynchronous client for the Docker Engine API, talking HTTP/1.1 to the daemon socket.
+
+    Connections are kept alive and reused per event loop.
+    """
+    def __init__(self, socket_path: Optional[Path] = None, max_idle: int = 10):
+        """
+        Initialize the client. No connection is made until the first request.
+
+        :param socket_path: Path to the daemon socket. Defaults to the socket in `DOCKER_HOST`
+            or `/var/run/docker.sock`.
+        :param max_idle: The maximum number of idle connections kept per event loop.
+        """
+        self.socket_path = socket_path or self._socket_from_env()
+        self.max_idle = max_idle
+        self._idle: dict[asyncio.AbstractEventLoop, list[tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+
+    @staticmethod
+    def _socket_from_env() -> Path:
+        """
+        Get the daemon socket from the `DOCKER_HOST` environment variable.
+
+        :raises ServiceError: if `DOCKER_HOST` does not point to a Unix socket.
+        :return: The path to the daemon socket.
+        """
+        host = os.environ.get("DOCKER_HOST")
+        if not host:
+            return DEFAULT_SOCKET
+        if not host.startswith("unix://"):
+            raise ServiceError(f"Only Unix sockets are supported by the asynchronous Docker provider, got '{host}'.")
+        return Path(host.removeprefix("unix://"))
+
+    def _idle_connections(self) -> list[tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+        """
+        Get the idle connections of the running loop, dropping those of loops that have been closed
+        since, as they can no longer be used.
+
+        :return: The idle connections of the running loop.
+        """
+        for loop in [loop for loop in self._idle if loop.is_closed()]:
+            del self._idle[loop]
+        return self._idle.setdefault(asyncio.get_running_loop(), [])
+
+    async def _connect(self, reuse: bool = True) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """
+        Get an idle connection of the running loop or open a new one.
+
+        :param reuse: Whether an idle connection may be used.
+        :raises ServiceError: if the daemon cannot be reached.
+        :return: The reader and writer of the connection.
+        """
+        idle = self._idle_connections()
+        while reuse and idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+        try:
+            return await asyncio.open_unix_connection(str(self.socket_path))
+        except OSError as e:
+            raise ServiceError(f"Failed to connect to Docker daemon at {self.socket_path}: {e}")
+
+    def _release(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, reusable: bool) -> None:
+        """
+        Return a connection to the idle pool, or close it.
+
+        :param reusable: Whether the response was read completely and the connection may be kept alive.
+        """
+        idle = self._idle_connections()
+        if reusable and len(idle) < self.max_idle and not writer.is_closing():
+            idle.append((reader, writer))
+        else:
+            writer.close()
+
+    async def _send(self, writer: asyncio.StreamWriter, method: str, path: str, params: Optional[dict], body: Any) -> None:
+        """
+        Send a request.
+        """
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        payload = b"" if body is None else json.dumps(body).encode()
+        head = f"{method} {path} HTTP/1.1\r\nHost: docker\r\nContent-Length: {len(payload)}\r\n"
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+        writer.write(head.encode() + b"\r\n" + payload)
+        await writer.drain()
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader) -> tuple[int, dict[str, str]]:
+        """
+        Read the status line and headers of a response.
+
+        :return: The status code and the headers with lowercase names.
+        """
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by Docker daemon")
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    @staticmethod
+    async def _iter_body(reader: asyncio.StreamReader, status: int, headers: dict[str, str]) -> AsyncIterator[bytes]:
+        """
+        Iterate over the body of a response as it arrives.
+        """
+        if status in (204, 304) or headers.get("content-length") == "0":
+            return
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    return
+                chunk = await reader.readexactly(size)
+                await reader.readexactly(2)
+                yield chunk
+        elif "content-length" in headers:
+            yield await reader.readexactly(int(headers["content-length"]))
+        else:
+            while chunk := await reader.read(65536):
+                yield chunk
+
+    async def stream(self, method: str, path: str, params: Optional[dict] = None, body: Any = None) -> AsyncIterator[bytes]:
+        """
+        Send a request and iterate over the body of the response as it arrives.
+
+        Only GET and HEAD requests are sent over kept-alive connections and retried once if the
+        connection turns out to be closed, as the daemon may have carried out any other request
+        before the connection broke. Other requests are sent over a new connection.
+
+        :param method: The HTTP method.
+        :param path: The API path, e.g. `/containers/json`.
+        :param params: Optional query parameters.
+        :param body: Optional JSON body.
+        :raises AsyncDockerError: if the daemon answers with an error.
+        :raises ServiceError: if the daemon cannot be reached.
+        :return: An asynchronous iterator over the body.
+        """
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        reader, writer = await self._connect(reuse=idempotent)
+        reusable = False
+        try:
+            try:
+                await self._send(writer, method, path, params, body)
+                status, headers = await self._read_head(reader)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                writer.close()
+                if not idempotent:
+                    raise ServiceError(f"Lost connection to Docker daemon: {e}")
+                # a kept-alive connection may have been closed by the daemon in the meantime
+                reader, writer = await self._connect()
+                await self._send(writer, method, path, params, body)
+                status, headers = await self._read_head(reader)
+            if status >= 400:
+                content = b"".join([chunk async for chunk in self._iter_body(reader, status, headers)])
+                reusable = headers.get("connection", "").lower() != "close"
+                try:
+                    message = json.loads(content).get("message", content.decode())
+                except ValueError:
+                    message = content.decode(errors="replace")
+                raise AsyncDockerError(status, message)
+            async for chunk in self._iter_body(reader, status, headers):
+                yield chunk
+            reusable = headers.get("connection", "").lower() != "close" and (
+                "content-length" in headers or "transfer-encoding" in headers or status in (204, 304)
+            )
+        finally:
+            self._release(reader, writer, reusable)
+
+    async def request(self, method: str, path: str, params: Optional[dict] = None, body: Any = None) -> Any:
+        """
+        Send a request and decode the JSON body of the response.
+
+        :param method: The HTTP method.
+        :param path: The API path, e.g. `/containers/json`.
+        :param params: Optional query parameters.
+        :param body: Optional JSON body.
+        :raises AsyncDockerError: if the daemon answers with an error.
+        :raises ServiceError: if the daemon cannot be reached.
+        :return: The decoded body, or None if it is empty.
+        """
+        content = b"".join([chunk async for chunk in self.stream(method, path, params, body)])
+        return json.loads(content) if content else None
+
+    async def json_stream(self, method: str, path: str, params: Optional[dict] = None, body: Any = None) -> AsyncIterator[dict]:
+        """
+        Send a request and iterate over the newline separated JSON objects of the response.
+
+        :raises AsyncDockerError: if the daemon answers with an error.
+        :raises ServiceError: if the daemon cannot be reached.
+        :return: An asynchronous iterator over the decoded objects.
+        """
+        buffer = b""
+        async for chunk in self.stream(method, path, params, body):
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+        if buffer.strip():
+            yield json.loads(buffer)
+
+
+class AsyncDockerService(AsyncService):
+    """
+    Service managed through Docker, driven by an asyncio event loop.
+    """
+    PROBE_HOST = "127.0.0.1"
+    PROBE_TIMEOUT = .2
+
+    def __init__(self, slug: str, config: ServiceConfig, eigen_config: EigenConfig, api: AsyncDockerAPI):
+        """
+        Initialize the Docker service.
+
+        :param config: Configuration for the Docker service.
+        :param api: The asynchronous Docker API client shared by all services of the provider.
+        """
+        super().__init__(slug, config, eigen_config, DockerServiceConfig)
+        self._api = api
+        self._container_id: Optional[str] = None
+
+    @property
+    def _container(self) -> str:
+        """
+        Get the reference lifecycle calls are addressed to.
+
+        :return: The ID of the container if it has been recorded, its name otherwise.
+        """
+        return quote(self._container_id or self.slug)
+
+    async def _inspect_container(self) -> Optional[dict]:
+        """
+        Inspect the Docker container and record its ID.
+
+        :return: The container details, or None if it does not exist.
+        """
+        try:
+            container = await self._api.request("GET", f"/containers/{quote(self.slug)}/json")
+        except AsyncDockerError as e:
+            if e.status == 404:
+                self._container_id = None
+                return None
+            raise
+        self._container_id = container["Id"]
+        return container
+
+    async def is_installed(self) -> bool:
+        """
+        Check if the Docker image exists.
+
+        :return: True if the image exists, False otherwise.
+        """
+        try:
+            await self._api.request("GET", f"/images/{quote(self._config.provider.options.image, safe='/:@')}/json")
+            return True
+        except AsyncDockerError as e:
+            if e.status == 404:
+                return False
+            raise
+
+    async def _pull_image(self) -> None:
+        """
+        Pull the Docker image.
+
+        :raises ServiceError: if the image cannot be pulled.
+        """
+        repository, tag = split_image(self._config.provider.options.image)
+        async for message in self._api.json_stream("POST", "/images/create", {"fromImage": repository, "tag": tag}):
+            if "error" in message:
+                raise ServiceError(f"Failed to pull Docker image: {message['error']}")
+
+    async def _create_container(self) -> None:
+        """
+        Create the Docker container and record its ID.
+
+        :raises ServiceError: if the container cannot be created.
+        """
+        options = self._config.provider.options
+        body = {
+            "Image": options.image,
+            "Env": [f"{key}={value}" for key, value in options.environment.items()],
+            "ExposedPorts": {port: {} for port in options.ports},
+            "HostConfig": {
+                "PortBindings": {port: [{"HostPort": str(host_port)}] for port, host_port in options.ports.items()},
+                "Binds": options.volumes,
+                **{HOST_CONFIG_LIMITS[key]: value for key, value in options.resource_limits().items()},
+            },
+        }
+        container = await self._api.request("POST", "/containers/create", {"name": self.slug}, body)
+        self._container_id = container["Id"]
+
+    async def _ensure_container_exists(self) -> None:
+        """
+        Ensure the Docker image and container exist.
+
+        :raises ServiceError: if the image cannot be pulled or the container cannot be created.
+        """
+        if await self._inspect_container() is not None:
+            return
+        if not await self.is_installed():
+            await self._pull_image()
+        await self._create_container()
+
+    async def _ports_open(self) -> bool:
+        """
+        Check if all mapped TCP ports of the container accept connections that stay open.
+
+        :return: True if every mapped TCP port accepts connections, False otherwise.
+        """
+        for container_port, host_port in self._config.provider.options.ports.items():
+            if not container_port.endswith("/tcp") and "/" in container_port:
+                continue
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(self.PROBE_HOST, host_port), self.PROBE_TIMEOUT)
+            except (OSError, asyncio.TimeoutError):
+                return False
+            try:
+                if await asyncio.wait_for(reader.read(1), self.PROBE_TIMEOUT) == b"":
+                    return False
+            except asyncio.TimeoutError:
+                pass
+            except OSError:
+                return False
+            finally:
+                writer.close()
+        return True
+
+    async def _ready(self, target: ServiceStatus) -> bool:
+        """
+        Check if the service has reached the target status and, when it is supposed to be running,
+        passes its healthcheck or accepts connections on its mapped ports.
+
+        :param target: The status the service is expected to reach.
+        :return: True if the service is ready, False otherwise.
+        """
+        try:
+            container = await self._inspect_container()
+            if await self._resolve_status(container) != target:
+                return False
+        except ServiceError:
+            return False
+        if target != ServiceStatus.RUNNING:
+            return True
+        health = container["State"].get("Health")
+        if health is not None:
+            return health.get("Status") == "healthy"
+        return await self._ports_open()
+
+    def _hold_until_ready(self, target: ServiceStatus) -> None:
+        """
+        Keep the service reported as busy until it is ready, like the synchronous providers do.
+        The lock checks readiness on a thread of its own, so the check is run on the event loop of
+        the operation, or on a loop of its own once that one has been closed.
+
+        :param target: The status the service is expected to reach.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = self._config.provider.options.ready_timeout
+
+        def ready() -> bool:
+            if loop.is_closed():
+                return asyncio.run(self._ready(target))
+            try:
+                return asyncio.run_coroutine_threadsafe(self._ready(target), loop).result(timeout)
+            except (RuntimeError, concurrent.futures.TimeoutError):
+                # the loop was closed or stopped meanwhile, check again on the next round
+                return False
+
+        self.lock.hold_until(ready, timeout)
+
+    async def _container_action(self, action: str, target: ServiceStatus) -> None:
+        """
+        Perform a lifecycle action on the container and keep the service busy until it is ready.
+        The container is only looked up, and created if necessary, when the daemon reports it as
+        missing.
+
+        :param action: The action, e.g. `start`.
+        :param target: The status the service is expected to reach.
+        :raises ServiceError: if the action fails.
+        """
+        try:
+            await self._api.request("POST", f"/containers/{self._container}/{action}")
+        except AsyncDockerError as e:
+            if e.status != 404:
+                raise
+            await self._ensure_container_exists()
+            await self._api.request("POST", f"/containers/{self._container}/{action}")
+        self._hold_until_ready(target)
+
+    async def _start(self) -> None:
+        await self._container_action("start", ServiceStatus.RUNNING)
+
+    async def _stop(self) -> None:
+        await self._container_action("stop", ServiceStatus.STOPPED)
+
+    async def _restart(self) -> None:
+        await self._container_action("restart", ServiceStatus.RUNNING)
+
+    async def _pause(self) -> None:
+        await self._container_action("pause", ServiceStatus.PAUSED)
+
+    async def _unpause(self) -> None:
+        await self._container_action("unpause", ServiceStatus.RUNNING)
+
+    async def _install(self) -> None:
+        """
+        Install the Docker service by pulling the image and creating the container ahead of the
+        first start.
+
+        :raises ServiceError: if the image cannot be pulled or the container cannot be created.
+        """
+        if await self.is_installed():
+            raise ServiceError("Docker service is already installed.")
+        await self._pull_image()
+        await self._ensure_container_exists()
+
+    async def _uninstall(self) -> None:
+        """
+        Uninstall the Docker service by removing the container and image.
+
+        :raises ServiceError: if the container or image cannot be removed.
+        """
+        if await self._inspect_container() is not None:
+            await self._api.request("DELETE", f"/containers/{self._container}", {"force": "true"})
+            self._container_id = None
+        if await self.is_installed():
+            await self._api.request("DELETE", f"/images/{quote(self._config.provider.options.image, safe='/:@')}", {"force": "true"})
+        self._hold_until_ready(ServiceStatus.NOT_FOUND)
+
+    async def logs(self, tail: Optional[int] = None, follow: bool = False, since: Optional[float] = None,
+                   until: Optional[float] = None) -> AsyncIterator[LogLine]:
+        """
+        Stream the output of the Docker container line by line as the daemon sends it.
+
+        :param tail: Only return this many of the most recent lines, or all lines if None.
+        :param follow: Whether to keep streaming new lines as they are written.
+        :param since: Only return lines written after this Unix time, if given.
+        :param until: Only return lines written before this Unix time, if given.
+        :return: An asynchronous iterator over the lines, oldest first.
+        :raises ServiceError: if the container does not exist or its output cannot be retrieved.
+        """
+        params = {"stdout": "1", "stderr": "1", "timestamps": "1", "follow": "1" if follow else "0",
+                  "tail": "all" if tail is None else str(tail)}
+        if since is not None:
+            params["since"] = str(since)
+        if until is not None:
+            params["until"] = str(until)
+        decoder = LogDecoder(multiplexed=True)
+        try:
+            async for chunk in self._api.stream("GET", f"/containers/{self._container}/logs", params):
+                for line in decoder.feed(chunk):
+                    yield line
+        except AsyncDockerError as e:
+            if e.status == 404:
+                raise ServiceError(f"Service '{self.slug}' has no container to get logs from.")
+            raise
+        for line in decoder.flush():
+            yield line
+
+    async def _resolve_status(self, container: Optional[dict]) -> ServiceStatus:
+        """
+        Resolve the status of the service from the details of its container.
+
+        :param container: The container details, or None if it does not exist.
+        :return: The status of the Docker service.
+        """
+        if container is None:
+            return ServiceStatus.STOPPED if await self.is_installed() else ServiceStatus.NOT_FOUND
+        return container_status(container["State"]["Status"])
+
+    async def _status(self) -> ServiceStatus:
+        """
+        Get the status of the Docker service.
+
+        :return: The status of the Docker service.
+        :raises ServiceError: if the status cannot be retrieved.
+        """
+        return await self._resolve_status(await self._inspect_container())
+
+
+class AsyncDocker(AsyncProvider):
+    """
+    Provider for services managed through docker without blocking on the daemon.
+    """
+    def __init__(self):
+        """
+        Initialize the provider with an API client shared by all of its services.
+        """
+        self.api: Optional[AsyncDockerAPI] = None
+
+    def create_async_service(self, slug: str, service_config: ServiceConfig, eigen_config: EigenConfig) -> AsyncDockerService:
+        """
+        Obtain an asynchronous Docker service by its name.
+
+        :param slug: The slug of the service.
+        :param service_config: Configuration for the Docker service.
+        :param eigen_config: The Eigen configuration.
+        :return: An instance of the asynchronous Docker service.
+        :raises ServiceError: if the daemon socket cannot be determined.
+        """
+        if self.api is None:
+            self.api = AsyncDockerAPI()
+        return AsyncDockerService(slug, service_config, eigen_config, self.api)
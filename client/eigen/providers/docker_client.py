@@ -0,0 +1,125 @@
+from eigen.core import ServiceError
+from docker.errors import DockerException
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from typing import Callable, Optional, TypeVar
+import threading
+import logging
+import docker
+
+T = TypeVar("T")
+
+class SharedDockerClient:
+    """
+    A long-lived, thread-safe Docker client shared by all services of a provider.
+
+    The underlying client keeps its HTTP connections alive and reuses them from a pool. If the
+    daemon goes away (e.g. it is restarted), the client is dropped and recreated on the next call.
+    Every (re)connect starts a new connection generation, and the number of calls served by each
+    generation is counted.
+    """
+    def __init__(self, max_pool_size: int = 10, timeout: int = 60):
+        """
+        Initialize the shared client. No connection is made until the client is first used.
+
+        :param max_pool_size: The maximum number of connections kept alive in the pool.
+        :param timeout: Timeout in seconds for API calls.
+        """
+        self.max_pool_size = max_pool_size
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._client: Optional[docker.DockerClient] = None
+        self._generation = 0
+        self._calls: dict[int, int] = {}
+
+    def _connect(self) -> docker.DockerClient:
+        """
+        Create a new Docker client. Must be called with the lock held.
+
+        :raises ServiceError: if the Docker daemon cannot be reached.
+        :return: The new Docker client.
+        """
+        try:
+            client = docker.from_env(max_pool_size=self.max_pool_size, timeout=self.timeout)
+        except DockerException as e:
+            raise ServiceError(f"Failed to connect to Docker daemon: {e}")
+        self._generation += 1
+        self._calls[self._generation] = 0
+        logging.info(f"Connected to Docker daemon (connection {self._generation})")
+        return client
+
+    def _acquire(self) -> tuple[docker.DockerClient, int]:
+        """
+        Get the current client, connecting if necessary, and count the call against it.
+
+        :return: The client and its connection generation.
+        """
+        with self._lock:
+            if self._client is None:
+                self._client = self._connect()
+            self._calls[self._generation] += 1
+            return self._client, self._generation
+
+    def _invalidate(self, generation: int) -> None:
+        """
+        Drop the client of the given generation so that the next call reconnects.
+
+        :param generation: The generation of the client that failed.
+        """
+        with self._lock:
+            if self._client is None or generation != self._generation:
+                # another thread already reconnected
+                return
+            logging.warning(f"Lost connection to Docker daemon (connection {generation}), reconnecting")
+            try:
+                self._client.close()
+            except Exception:
+                pass
+            self._client = None
+
+    def run(self, operation: Callable[[docker.DockerClient], T], retry: bool = False) -> T:
+        """
+        Run an operation with the shared client.
+
+        If the connection to the daemon was lost, the client is recreated. Only operations that
+        are safe to repeat, such as reads, should be retried, as the daemon may have carried out
+        the request before the connection broke.
+
+        :param operation: A callable receiving the Docker client.
+        :param retry: Whether to retry the operation once with a new connection.
+        :raises ServiceError: if the Docker daemon cannot be reached.
+        :return: The result of the operation.
+        """
+        client, generation = self._acquire()
+        try:
+            return operation(client)
+        except RequestsConnectionError as e:
+            self._invalidate(generation)
+            if not retry:
+                raise ServiceError(f"Lost connection to Docker daemon: {e}")
+
+        client, generation = self._acquire()
+        try:
+            return operation(client)
+        except RequestsConnectionError as e:
+            self._invalidate(generation)
+            raise ServiceError(f"Lost connection to Docker daemon: {e}")
+
+    @property
+    def stats(self) -> dict[int, int]:
+        """
+        Get the number of calls served by each connection generation.
+
+        :return: A dictionary mapping connection generations to their call counts.
+        """
+        with self._lock:
+            return dict(self._calls)
+
+    def close(self) -> None:
+        """
+        Close the shared client and its pooled connections.
+        """
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
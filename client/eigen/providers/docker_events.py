@@ -0,0 +1,349 @@
+from eigen.core import ServiceError, ServiceStatus
+from .docker_client import SharedDockerClient
+from typing import Callable, Optional
+import threading
+import logging
+import time
+import re
+
+CONTAINER_ACTIONS = {
+    "create": "created",
+    "start": "running",
+    "restart": "running",
+    "unpause": "running",
+    "pause": "paused",
+    "die": "exited",
+    "stop": "exited",
+}
+
+IMAGE_ACTIONS = {"pull", "tag", "untag", "delete", "import", "load"}
+
+HEALTH_PATTERN = re.compile(r"\((?:health: )?(healthy|unhealthy|starting)\)")
+
+def container_status(state: str) -> ServiceStatus:
+    """
+    Map a Docker container state to a service status.
+
+    :param state: The state of the container as reported by Docker.
+    :return: The corresponding service status.
+    """
+    match(state):
+        case "running":
+            return ServiceStatus.RUNNING
+        case "exited" | "created":
+            return ServiceStatus.STOPPED
+        case "restarting":
+            return ServiceStatus.RESTARTING
+        case "paused":
+            return ServiceStatus.PAUSED
+        case "dead":
+            return ServiceStatus.ERROR
+        case _:
+            return ServiceStatus.UNKNOWN
+
+def normalize_image(reference: str) -> str:
+    """
+    Normalize an image reference the way Docker reports it in `RepoTags`.
+
+    :param reference: The image reference, e.g. `nextcloud` or `docker.io/library/nextcloud:latest`.
+    :return: The normalized reference, e.g. `nextcloud:latest`.
+    """
+    for prefix in ("docker.io/library/", "docker.io/"):
+        if reference.startswith(prefix):
+            reference = reference[len(prefix):]
+            break
+    if "@" not in reference and ":" not in reference.rsplit("/", 1)[-1]:
+        reference = f"{reference}:latest"
+    return reference
+
+def split_image(reference: str) -> tuple[str, str]:
+    """
+    Split an image reference into repository and tag.
+
+    :param reference: The image reference, e.g. `registry:5000/nextcloud:latest`.
+    :return: The repository and the tag (or digest), e.g. `("registry:5000/nextcloud", "latest")`.
+    """
+    if "@" in reference:
+        repository, digest = reference.split("@", 1)
+        return repository, digest
+    repository, _, tag = reference.rpartition(":")
+    if not repository or "/" in tag:
+        return reference, "latest"
+    return repository, tag
+
+
+class DockerStateCache:
+    """
+    In-memory table of container and image state, kept up to date by the Docker events stream.
+
+    A single background thread subscribes to container and image events and applies them to the
+    table, so that status reads are plain dictionary lookups. Whenever the stream (re)connects,
+    the whole table is resynchronized from the daemon. Listeners are called after every change
+    of the table.
+    """
+    SYNC_TIMEOUT = 5
+    RECONNECT_DELAY = 1
+    MAX_RECONNECT_DELAY = 30
+
+    def __init__(self, client: SharedDockerClient):
+        """
+        Initialize the state cache. The event stream is not subscribed to until the cache is first read.
+
+        :param client: The shared Docker client.
+        """
+        self._client = client
+        self._lock = threading.Lock()
+        self._containers: dict[str, str] = {}
+        self._health: dict[str, str] = {}
+        self._images: set[str] = set()
+        self._synced = threading.Event()
+        # why the table could not be synchronized, until the event stream is followed again
+        self._failure: Optional[str] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stream = None
+        self._listeners: list[Callable[[], None]] = []
+
+    def add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """
+        Call a function whenever the table changes, and follow the event stream so that it does.
+
+        The listener runs on the thread following the event stream and must return quickly.
+
+        :param listener: The function to call.
+        :return: A function removing the listener again.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+        self.start()
+
+        def remove() -> None:
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+        return remove
+
+    def _notify(self) -> None:
+        """
+        Call all listeners after a change of the table.
+        """
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener()
+            except Exception as e:
+                logging.error(f"Docker state listener failed: {e}")
+
+    def start(self) -> None:
+        """
+        Start following the Docker events stream, if not already running.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._failure = None
+            self._thread = threading.Thread(target=self._follow, name="docker-events", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop following the Docker events stream.
+        """
+        self._stopped.set()
+        self._synced.clear()
+        stream = self._stream
+        if stream is not None:
+            stream.close()
+
+    def _follow(self) -> None:
+        """
+        Follow the Docker events stream, reconnecting with backoff whenever it breaks.
+        """
+        delay = self.RECONNECT_DELAY
+        while not self._stopped.is_set():
+            try:
+                # subscribe before resyncing so that no event between the two gets lost
+                self._stream = self._client.run(
+                    lambda client: client.events(decode=True, filters={"type": ["container", "image"]}),
+                    retry=True,
+                )
+                self.resync()
+                delay = self.RECONNECT_DELAY
+                for event in self._stream:
+                    self._apply(event)
+            except Exception as e:
+                if self._stopped.is_set():
+                    break
+                self._failure = str(e)
+                logging.warning(f"Docker event stream interrupted: {e}")
+            finally:
+                self._synced.clear()
+                self._stream = None
+            self._stopped.wait(delay)
+            delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+
+    def _fetch_containers(self) -> tuple[dict[str, str], dict[str, str]]:
+        """
+        Fetch the state and health of all containers with one container listing.
+
+        :raises ServiceError: if the Docker daemon cannot be reached.
+        :return: The states and the health of all containers keyed by their name.
+        """
+        containers = self._client.run(lambda client: client.api.containers(all=True), retry=True)
+        states, health = {}, {}
+        for container in containers:
+            # the health is only reported as part of the human readable status, e.g. "Up 2 minutes (healthy)"
+            match = HEALTH_PATTERN.search(container.get("Status") or "")
+            for name in container.get("Names") or []:
+                states[name.lstrip("/")] = container["State"]
+                if match:
+                    health[name.lstrip("/")] = match.group(1)
+        return states, health
+
+    def fetch(self) -> tuple[dict[str, str], set[str]]:
+        """
+        Fetch the state of all containers and images with one container and one image listing.
+
+        :raises ServiceError: if the Docker daemon cannot be reached.
+        :return: The states of all containers keyed by their name, and the set of present images.
+        """
+        container_states, _ = self._fetch_containers()
+        images = self._client.run(lambda client: client.api.images(), retry=True)
+        return container_states, self._image_references(images)
+
+    def resync(self) -> None:
+        """
+        Rebuild the whole table from the daemon.
+
+        :raises ServiceError: if the Docker daemon cannot be reached.
+        """
+        containers, health = self._fetch_containers()
+        images = self._image_references(self._client.run(lambda client: client.api.images(), retry=True))
+        with self._lock:
+            self._containers = containers
+            self._health = health
+            self._images = images
+        self._failure = None
+        self._synced.set()
+        self._notify()
+
+    def tables(self) -> tuple[dict[str, str], set[str]]:
+        """
+        Get a copy of the whole table. If the table is not synchronized with the event stream,
+        it is fetched from the daemon directly instead of waiting for the stream.
+
+        :raises ServiceError: if the Docker daemon cannot be reached.
+        :return: The states of all containers keyed by their name, and the set of present images.
+        """
+        if self._synced.is_set():
+            with self._lock:
+                return dict(self._containers), set(self._images)
+        self.start()
+        return self.fetch()
+
+    @staticmethod
+    def _image_references(images: list[dict]) -> set[str]:
+        """
+        Collect all references under which the given images are known.
+
+        :param images: The image summaries as returned by the Docker API.
+        :return: A set of normalized image references.
+        """
+        references = set()
+        for image in images:
+            for reference in (image.get("RepoTags") or []) + (image.get("RepoDigests") or []):
+                references.add(normalize_image(reference))
+        return references
+
+    def _apply(self, event: dict) -> None:
+        """
+        Apply a single Docker event to the table.
+
+        :param event: The decoded event.
+        """
+        action = event.get("Action") or event.get("status") or ""
+        attributes = (event.get("Actor") or {}).get("Attributes") or {}
+        match(event.get("Type")):
+            case "container":
+                name = attributes.get("name")
+                if name is None:
+                    return
+                with self._lock:
+                    if action.startswith("health_status"):
+                        self._health[name] = action.split(":", 1)[-1].strip()
+                    elif action == "destroy":
+                        self._containers.pop(name, None)
+                        self._health.pop(name, None)
+                    elif action == "rename":
+                        self._containers[name] = self._containers.pop(attributes.get("oldName", "").lstrip("/"), "created")
+                    elif action in CONTAINER_ACTIONS:
+                        self._containers[name] = CONTAINER_ACTIONS[action]
+                        if action in ("start", "die"):
+                            # a (re)started container has to pass its healthcheck again
+                            self._health.pop(name, None)
+                    else:
+                        # e.g. exec events of healthchecks, which do not change the table
+                        return
+                self._notify()
+            case "image":
+                if action in IMAGE_ACTIONS:
+                    images = self._client.run(lambda client: client.api.images(), retry=True)
+                    with self._lock:
+                        self._images = self._image_references(images)
+                    self._notify()
+
+    def _ensure_synced(self) -> None:
+        """
+        Make sure the table reflects the daemon, starting the event stream if necessary.
+
+        Only the first attempt waits for the stream to synchronize the table. Once it failed, every
+        call fails right away until the stream is followed again.
+
+        :raises ServiceError: if the table could not be synchronized.
+        """
+        if self._synced.is_set():
+            return
+        self.start()
+        deadline = time.monotonic() + self.SYNC_TIMEOUT
+        while self._failure is None and not self._synced.wait(.05):
+            if time.monotonic() >= deadline:
+                self._failure = "timed out waiting for the event stream"
+        failure = self._failure
+        if failure is not None and not self._synced.is_set():
+            raise ServiceError(f"Docker state is unavailable, the daemon cannot be reached: {failure}")
+
+    def container_state(self, name: str) -> Optional[str]:
+        """
+        Get the state of a container.
+
+        :param name: The name of the container.
+        :raises ServiceError: if the table could not be synchronized.
+        :return: The Docker state of the container, or None if it does not exist.
+        """
+        self._ensure_synced()
+        return self._containers.get(name)
+
+    def container_health(self, name: str) -> Optional[str]:
+        """
+        Get the health of a container as reported by its healthcheck.
+
+        :param name: The name of the container.
+        :raises ServiceError: if the table could not be synchronized.
+        :return: The health of the container (`starting`, `healthy` or `unhealthy`), or None if
+            it has no healthcheck or has not reported its health yet.
+        """
+        self._ensure_synced()
+        return self._health.get(name)
+
+    def image_exists(self, reference: str) -> bool:
+        """
+        Check whether an image is present.
+
+        :param reference: The image reference.
+        :raises ServiceError: if the table could not be synchronized.
+        :return: True if the image is present, False otherwise.
+        """
+        self._ensure_synced()
+        return normalize_image(reference) in self._images
@@ -0,0 +1,85 @@
+from eigen.core import LogLine
+from datetime import datetime
+from typing import Iterator, Optional
+
+# longer lines are split, so a single line never grows the buffer beyond this size
+MAX_LINE = 64 * 1024
+FRAME_HEADER = 8
+
+def parse_timestamp(value: str) -> Optional[float]:
+    """
+    Parse an RFC 3339 timestamp with up to nanosecond precision, as prepended by Docker.
+
+    :param value: The timestamp, e.g. `2025-06-01T12:00:00.123456789Z`.
+    :return: The timestamp as Unix time, or None if it cannot be parsed.
+    """
+    seconds, _, fraction = value.rstrip("Z").partition(".")
+    try:
+        timestamp = datetime.fromisoformat(f"{seconds}+00:00").timestamp()
+    except ValueError:
+        return None
+    return timestamp + float(f"0.{fraction}") if fraction.isdigit() else timestamp
+
+class LogDecoder:
+    """
+    Incrementally splits the output of a container into lines.
+
+    Chunks of any size can be fed as they arrive; only the current incomplete line is kept.
+    """
+    def __init__(self, multiplexed: bool = False, timestamps: bool = True):
+        """
+        Initialize the decoder.
+
+        :param multiplexed: Whether the chunks still contain the 8 byte frame headers of the Docker stream.
+        :param timestamps: Whether every line starts with a timestamp.
+        """
+        self.multiplexed = multiplexed
+        self.timestamps = timestamps
+        self._frames = b""
+        self._line = b""
+
+    def feed(self, chunk: bytes) -> Iterator[LogLine]:
+        """
+        Feed a chunk of output.
+
+        :param chunk: The chunk.
+        :return: An iterator over the lines completed by the chunk.
+        """
+        if not self.multiplexed:
+            yield from self._split(chunk)
+            return
+        self._frames += chunk
+        while len(self._frames) >= FRAME_HEADER:
+            size = int.from_bytes(self._frames[4:FRAME_HEADER], "big")
+            if len(self._frames) < FRAME_HEADER + size:
+                break
+            payload = self._frames[FRAME_HEADER:FRAME_HEADER + size]
+            self._frames = self._frames[FRAME_HEADER + size:]
+            yield from self._split(payload)
+
+    def flush(self) -> Iterator[LogLine]:
+        """
+        Flush the last line once the output has ended, even if it lacks a trailing newline.
+
+        :return: An iterator over the remaining line, if any.
+        """
+        if self._line:
+            yield self._decode(self._line)
+            self._line = b""
+
+    def _split(self, data: bytes) -> Iterator[LogLine]:
+        *lines, self._line = (self._line + data).split(b"\n")
+        for line in lines:
+            yield self._decode(line)
+        while len(self._line) > MAX_LINE:
+            yield self._decode(self._line[:MAX_LINE])
+            self._line = self._line[MAX_LINE:]
+
+    def _decode(self, line: bytes) -> LogLine:
+        text = line.decode(errors="replace").rstrip("\r")
+        if self.timestamps:
+            prefix, _, rest = text.partition(" ")
+            timestamp = parse_timestamp(prefix)
+            if timestamp is not None:
+                return LogLine(timestamp=timestamp, text=rest)
+        return LogLine(text=text)
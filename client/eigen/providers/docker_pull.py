@@ -0,0 +1,198 @@
+from eigen.core import ServiceError, ServiceProgress
+from .docker_client import SharedDockerClient
+from .docker_events import normalize_image, split_image
+from docker.errors import APIError
+from requests.exceptions import RequestException
+from concurrent.futures import Future
+from typing import Iterator, Optional
+import threading
+import logging
+import time
+
+DONE_STATES = {"Download complete", "Pull complete", "Already exists"}
+
+class _Layer:
+    """
+    Download progress of a single image layer, shared by all images containing it.
+    """
+    def __init__(self):
+        self.current = 0
+        self.total = 0
+        self.done = False
+
+
+class _Pull:
+    """
+    A queued or running pull of one image.
+    """
+    def __init__(self, reference: str):
+        self.reference = reference
+        self.future: Future = Future()
+        self.layers: set[str] = set()
+
+
+class PullManager:
+    """
+    Pulls Docker images in parallel, up to a limit, while tracking per-layer progress.
+
+    Requests for an image that is already queued or being pulled join the existing pull. Layers
+    are tracked in one table shared by all pulls, so a layer contained in several queued images is
+    only accounted (and, by the daemon, only downloaded) once. A pull failing for a passing reason
+    is retried; since the daemon keeps every layer it has already completed, a retry only
+    transfers the missing layers.
+    """
+    RETRY_DELAY = 2
+
+    def __init__(self, client: SharedDockerClient, max_concurrent: int = 2, max_retries: int = 3):
+        """
+        Initialize the pull manager.
+
+        :param client: The shared Docker client.
+        :param max_concurrent: The maximum number of images pulled at the same time.
+        :param max_retries: The maximum number of retries after a pull failed.
+        """
+        self._client = client
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._pulls: dict[str, _Pull] = {}
+        self._layers: dict[str, _Layer] = {}
+
+    def submit(self, reference: str) -> Future:
+        """
+        Queue an image to be pulled, or join the pull of it that is already queued or running.
+
+        :param reference: The image reference.
+        :return: A future that resolves once the image has been pulled.
+        """
+        reference = normalize_image(reference)
+        with self._lock:
+            pull = self._pulls.get(reference)
+            if pull is not None:
+                return pull.future
+            pull = self._pulls[reference] = _Pull(reference)
+        threading.Thread(target=self._run, args=(pull,), name=f"docker-pull-{reference}", daemon=True).start()
+        return pull.future
+
+    def pull(self, reference: str) -> None:
+        """
+        Pull an image and wait until it is done.
+
+        :param reference: The image reference.
+        :raises ServiceError: if the image cannot be pulled.
+        """
+        self.submit(reference).result()
+
+    def pull_many(self, references: list[str]) -> None:
+        """
+        Pull several images in parallel and wait until all of them are done.
+
+        :param references: The image references.
+        :raises ServiceError: if any of the images cannot be pulled.
+        """
+        for future in [self.submit(reference) for reference in references]:
+            future.result()
+
+    def is_pulling(self, reference: str) -> bool:
+        """
+        Check if an image is queued or being pulled.
+
+        :param reference: The image reference.
+        :return: True if the image is queued or being pulled, False otherwise.
+        """
+        return normalize_image(reference) in self._pulls
+
+    def progress(self, reference: str) -> Optional[ServiceProgress]:
+        """
+        Get the progress of a queued or running pull.
+
+        :param reference: The image reference.
+        :return: The progress of the pull, or None if the image is not being pulled.
+        """
+        with self._lock:
+            pull = self._pulls.get(normalize_image(reference))
+            if pull is None:
+                return None
+            layers = [self._layers[layer] for layer in pull.layers]
+        return ServiceProgress(
+            bytes_done=sum(layer.total if layer.done else layer.current for layer in layers),
+            bytes_total=sum(layer.total for layer in layers),
+            layers_done=sum(layer.done for layer in layers),
+            layers_total=len(layers),
+        )
+
+    def _run(self, pull: _Pull) -> None:
+        """
+        Run a pull once a slot is free, retrying it when it fails in a way that may pass: a lost
+        connection, an error of the daemon or one reported while streaming. A pull the daemon
+        rejects, e.g. of an unknown image or without access to it, is not retried.
+
+        :param pull: The pull to run.
+        """
+        with self._slots:
+            error = None
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self._pull(pull)
+                    error = None
+                    break
+                except (APIError, ServiceError, RequestException) as e:
+                    error = e
+                    logging.warning(f"Pulling {pull.reference} failed (attempt {attempt + 1}): {e}")
+                    if isinstance(e, APIError) and not e.is_server_error():
+                        break
+                    if attempt < self.max_retries:
+                        time.sleep(self.RETRY_DELAY * (attempt + 1))
+        with self._lock:
+            del self._pulls[pull.reference]
+            # forget layers no other pull is waiting for
+            in_use = set().union(*(other.layers for other in self._pulls.values()))
+            for layer in pull.layers - in_use:
+                self._layers.pop(layer, None)
+        if error is None:
+            pull.future.set_result(None)
+        else:
+            pull.future.set_exception(ServiceError(f"Failed to pull Docker image: {error}"))
+
+    def _pull(self, pull: _Pull) -> None:
+        """
+        Pull an image once, streaming the progress of its layers into the layer table.
+
+        :param pull: The pull to run.
+        :raises APIError: if the daemon rejects the pull.
+        :raises ServiceError: if the pull fails while streaming.
+        """
+        repository, tag = split_image(pull.reference)
+        stream = self._client.run(lambda client: client.api.pull(repository, tag=tag, stream=True, decode=True))
+        try:
+            self._follow(pull, stream)
+        finally:
+            # closing the stream releases its connection to the daemon
+            stream.close()
+
+    def _follow(self, pull: _Pull, stream: Iterator[dict]) -> None:
+        """
+        Stream the progress of the layers of an image into the layer table.
+
+        :param pull: The pull being run.
+        :param stream: The decoded messages of the pull.
+        :raises ServiceError: if the pull fails while streaming.
+        """
+        for message in stream:
+            if "error" in message:
+                raise ServiceError(message["error"])
+            layer_id = message.get("id")
+            status = message.get("status", "")
+            if layer_id is None or status.startswith("Pulling from"):
+                continue
+            with self._lock:
+                pull.layers.add(layer_id)
+                layer = self._layers.setdefault(layer_id, _Layer())
+                if status in DONE_STATES:
+                    layer.done = True
+                elif status == "Downloading":
+                    detail = message.get("progressDetail") or {}
+                    layer.current = detail.get("current", layer.current)
+                    layer.total = detail.get("total", layer.total)
@@ -0,0 +1,513 @@
+from eigen.core import Provider, Service, ServiceError, ServiceStatus, ServiceProgress, ServiceState, StatusSnapshot, EigenConfig
+from eigen.models import ServiceConfig, DockerStackConfig, DependencyCondition
+from docker.errors import APIError, NotFound
+from .docker import Docker
+from .docker_client import SharedDockerClient
+from .docker_events import DockerStateCache, container_status, normalize_image
+from .docker_pull import PullManager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+import threading
+import logging
+import time
+
+# marks containers belonging to a stack, so that pruning keeps them
+SERVICE_LABEL = "eigen.service"
+
+class DockerStackService(Service):
+    """
+    Service made of several Docker containers on a private network, started in dependency order.
+    """
+    POLL_INTERVAL = .2
+
+    def __init__(self, slug: str, config: ServiceConfig, eigen_config: EigenConfig, client: SharedDockerClient, state: DockerStateCache, pulls: PullManager):
+        """
+        Initialize the stack service.
+
+        :param config: Configuration for the stack service.
+        :param client: The Docker client shared by all Docker services.
+        :param state: The container and image state cache shared by all Docker services.
+        :param pulls: The image pull manager shared by all Docker services.
+        """
+        super().__init__(slug, config, eigen_config, DockerStackConfig)
+        self._client = client
+        self._state = state
+        self._pulls = pulls
+
+    @property
+    def _options(self) -> DockerStackConfig:
+        return self._config.provider.options
+
+    @property
+    def _network(self) -> str:
+        """
+        Get the name of the private network of the stack.
+
+        :return: The configured name, or one derived from the slug.
+        """
+        return self._options.network or f"eigen-{self.slug}"
+
+    def _container_name(self, name: str) -> str:
+        """
+        Get the Docker name of a container of the stack.
+
+        :param name: The name of the container within the stack.
+        :return: The name of the Docker container.
+        """
+        return f"{self.slug}-{name}"
+
+    def _images(self) -> list[str]:
+        """
+        Get the distinct images of the stack.
+
+        :return: The image references.
+        """
+        return sorted({container.image for container in self._options.containers.values()})
+
+    @staticmethod
+    def _parallel(function: Callable[[str], None], names: list[str]) -> None:
+        """
+        Call a function for several containers in parallel and wait for all of them.
+
+        :param function: The function, called with the name of a container.
+        :param names: The names of the containers.
+        :raises Exception: the first error any of the calls failed with.
+        """
+        if len(names) <= 1:
+            for name in names:
+                function(name)
+            return
+        with ThreadPoolExecutor(len(names), thread_name_prefix="docker-stack") as executor:
+            futures = [executor.submit(function, name) for name in names]
+        for future in futures:
+            future.result()
+
+    def _ensure_network(self) -> None:
+        """
+        Create the private network of the stack if it does not exist.
+
+        :raises ServiceError: if the network cannot be created.
+        """
+        networks = self._client.run(lambda client: client.api.networks(names=[self._network]), retry=True)
+        if any(network["Name"] == self._network for network in networks):
+            return
+        try:
+            self._client.run(lambda client: client.api.create_network(self._network, driver="bridge"))
+        except APIError as e:
+            if e.status_code != 409:
+                raise ServiceError(f"Failed to create Docker network: {e}")
+
+    def _create_container(self, name: str) -> None:
+        """
+        Create a container of the stack, attached to the private network under its name.
+
+        :param name: The name of the container within the stack.
+        :raises ServiceError: if the container cannot be created.
+        """
+        options = self._options.containers[name]
+
+        def create(client):
+            host_config = client.api.create_host_config(
+                port_bindings=options.ports,
+                binds=options.volumes,
+                network_mode=self._network,
+                **options.resource_limits()
+            )
+            networking_config = client.api.create_networking_config({
+                self._network: client.api.create_endpoint_config(aliases=[name]),
+            })
+            return client.api.create_container(
+                options.image,
+                name=self._container_name(name),
+                command=options.command,
+                environment=options.environment,
+                ports=list(options.ports),
+                host_config=host_config,
+                networking_config=networking_config,
+                healthcheck=options.healthcheck.to_docker() if options.healthcheck else None,
+                labels={SERVICE_LABEL: self.slug},
+            )
+        try:
+            self._client.run(create)
+        except APIError as e:
+            raise ServiceError(f"Failed to create container '{name}' of '{self.slug}': {e}")
+
+    def _ensure_containers(self) -> None:
+        """
+        Pull missing images and create the network and missing containers of the stack.
+
+        :raises ServiceError: if an image cannot be pulled or a container cannot be created.
+        """
+        self._pulls.pull_many([image for image in self._images() if not self._state.image_exists(image)])
+        self._ensure_network()
+        missing = [name for name in self._options.containers if self._state.container_state(self._container_name(name)) is None]
+        self._parallel(self._create_container, missing)
+
+    def _inspect_state(self, name: str) -> dict:
+        """
+        Get the current state of a container straight from the daemon, bypassing the state cache,
+        which follows the daemon's events with a delay.
+
+        :param name: The name of the container within the stack.
+        :raises ServiceError: if the container cannot be inspected.
+        :return: The `State` of the container as reported by the daemon.
+        """
+        try:
+            return self._client.run(lambda client: client.api.inspect_container(self._container_name(name)), retry=True)["State"]
+        except APIError as e:
+            raise ServiceError(f"Failed to inspect container '{name}' of '{self.slug}': {e}")
+
+    def _meets(self, name: str, condition: DependencyCondition, previous_run: Optional[str]) -> bool:
+        """
+        Check if the run of a container started by the current operation meets a dependency
+        condition. The state left over from an earlier run never does.
+
+        :param name: The name of the container within the stack.
+        :param condition: The condition.
+        :param previous_run: The start time of the container's earlier run, or None if it was
+            already running when it was started, so that the current run counts.
+        :raises ServiceError: if the container can no longer meet the condition.
+        :return: True if the condition is met, False if it may still be met.
+        """
+        state = self._inspect_state(name)
+        if previous_run is not None and state.get("StartedAt") == previous_run:
+            # the daemon has not started the new run yet
+            return False
+        status = state.get("Status")
+        match condition:
+            case DependencyCondition.STARTED:
+                return status in ("running", "exited")
+            case DependencyCondition.HEALTHY:
+                if status in ("exited", "dead"):
+                    raise ServiceError(f"Container '{name}' of '{self.slug}' exited before becoming healthy.")
+                return (state.get("Health") or {}).get("Status") == "healthy"
+            case DependencyCondition.COMPLETED:
+                if status == "dead":
+                    raise ServiceError(f"Container '{name}' of '{self.slug}' died.")
+                if status != "exited":
+                    return False
+                exit_code = state.get("ExitCode")
+                if exit_code != 0:
+                    raise ServiceError(f"Container '{name}' of '{self.slug}' exited with code {exit_code}.")
+                return True
+
+    def _start_containers(self) -> None:
+        """
+        Start all containers, each as soon as its dependencies meet their conditions, so that
+        independent containers start in parallel. Conditions are checked against the runs started
+        here, so a dependency that completed or was healthy before is waited for again.
+
+        :raises ServiceError: if a container cannot be started or a dependency does not meet its condition in time.
+        """
+        containers = self._options.containers
+        deadline = time.time() + self._options.ready_timeout
+        started = {name: threading.Event() for name in containers}
+        previous_runs: dict[str, Optional[str]] = {}
+        aborted = threading.Event()
+
+        def start(name: str) -> None:
+            try:
+                for dependency, config in containers[name].depends_on.items():
+                    while not (started[dependency].is_set() and self._meets(dependency, config.condition, previous_runs[dependency])):
+                        if aborted.is_set():
+                            raise ServiceError(f"Not starting container '{name}' of '{self.slug}', a dependency failed.")
+                        if time.time() >= deadline:
+                            raise ServiceError(f"Container '{dependency}' of '{self.slug}' did not meet '{config.condition.value}' in time.")
+                        time.sleep(self.POLL_INTERVAL)
+                state = self._inspect_state(name)
+                previous_runs[name] = None if state.get("Running") else state.get("StartedAt")
+                self._client.run(lambda client: client.api.start(self._container_name(name)))
+                started[name].set()
+            except Exception:
+                aborted.set()
+                raise
+
+        self._parallel(start, list(containers))
+
+    def _container_action(self, action: str, names: list[str]) -> None:
+        """
+        Perform an action on several containers in parallel, skipping containers that do not exist.
+
+        :param action: The name of the docker-py API method, e.g. `stop`.
+        :param names: The names of the containers within the stack.
+        :raises ServiceError: if the action fails.
+        """
+        def perform(name: str) -> None:
+            try:
+                self._client.run(lambda client: getattr(client.api, action)(self._container_name(name)))
+            except NotFound:
+                pass
+            except APIError as e:
+                raise ServiceError(f"Failed to {action} container '{name}' of '{self.slug}': {e}")
+        self._parallel(perform, names)
+
+    def _stop_containers(self) -> None:
+        """
+        Stop all containers in reverse dependency order, each wave in parallel.
+
+        :raises ServiceError: if a container cannot be stopped.
+        """
+        for wave in reversed(self._options.waves()):
+            self._container_action("stop", wave)
+
+    def _ready(self, target: ServiceStatus) -> bool:
+        """
+        Check if the stack has reached the target status and, when it is supposed to be running,
+        all of its containers with a healthcheck are healthy.
+
+        :param target: The status the stack is expected to reach.
+        :return: True if the stack is ready, False otherwise.
+        """
+        try:
+            if self._status() != target:
+                return False
+            if target != ServiceStatus.RUNNING:
+                return True
+            one_shot = self._options.one_shot()
+            return all(
+                self._state.container_health(self._container_name(name)) in (None, "healthy")
+                for name in self._options.containers if name not in one_shot
+            )
+        except ServiceError:
+            return False
+
+    def _hold_until_ready(self, target: ServiceStatus) -> None:
+        """
+        Keep the service reported as busy until the stack has reached the target status.
+
+        :param target: The status the stack is expected to reach.
+        """
+        self.lock.hold_until(lambda: self._ready(target), self._options.ready_timeout)
+
+    def _start(self) -> None:
+        """
+        Start the stack, creating missing containers first.
+
+        :raises ServiceError: if the stack cannot be started.
+        """
+        self._ensure_containers()
+        self._start_containers()
+        self._hold_until_ready(ServiceStatus.RUNNING)
+
+    def _stop(self) -> None:
+        """
+        Stop the stack.
+
+        :raises ServiceError: if the stack cannot be stopped.
+        """
+        self._stop_containers()
+        self._hold_until_ready(ServiceStatus.STOPPED)
+
+    def _restart(self) -> None:
+        """
+        Restart the stack, stopping and starting it in dependency order.
+
+        :raises ServiceError: if the stack cannot be restarted.
+        """
+        self._stop_containers()
+        self._ensure_containers()
+        self._start_containers()
+        self._hold_until_ready(ServiceStatus.RUNNING)
+
+    def _pause(self) -> None:
+        """
+        Pause all running containers of the stack.
+
+        :raises ServiceError: if a container cannot be paused.
+        """
+        running = [name for name in self._options.containers if self._state.container_state(self._container_name(name)) == "running"]
+        self._container_action("pause", running)
+        self._hold_until_ready(ServiceStatus.PAUSED)
+
+    def _unpause(self) -> None:
+        """
+        Unpause all paused containers of the stack.
+
+        :raises ServiceError: if a container cannot be unpaused.
+        """
+        paused = [name for name in self._options.containers if self._state.container_state(self._container_name(name)) == "paused"]
+        self._container_action("unpause", paused)
+        self._hold_until_ready(ServiceStatus.RUNNING)
+
+    def is_installed(self) -> bool:
+        """
+        Check if the stack is installed.
+
+        :return: True if the images of all containers are present, False otherwise.
+        """
+        return all(self._state.image_exists(image) for image in self._images())
+
+    def _install(self) -> None:
+        """
+        Install the stack by pulling all images in parallel and creating its network and containers.
+
+        :raises ServiceError: if an image cannot be pulled or a container cannot be created.
+        """
+        self._ensure_containers()
+        self._hold_until_ready(ServiceStatus.STOPPED)
+
+    def _uninstall(self) -> None:
+        """
+        Uninstall the stack by removing its containers, network and images. Images still used
+        by other containers are kept.
+
+        :raises ServiceError: if a container or the network cannot be removed.
+        """
+        def remove(name: str) -> None:
+            try:
+                self._client.run(lambda client: client.api.remove_container(self._container_name(name), force=True))
+            except NotFound:
+                pass
+            except APIError as e:
+                raise ServiceError(f"Failed to remove container '{name}' of '{self.slug}': {e}")
+        self._parallel(remove, list(self._options.containers))
+
+        try:
+            self._client.run(lambda client: client.api.remove_network(self._network))
+        except NotFound:
+            pass
+        except APIError as e:
+            raise ServiceError(f"Failed to remove Docker network: {e}")
+        for image in self._images():
+            try:
+                self._client.run(lambda client: client.api.remove_image(image))
+            except NotFound:
+                pass
+            except APIError as e:
+                logging.warning(f"Keeping image {image} of '{self.slug}': {e}")
+        self._hold_until_ready(ServiceStatus.NOT_FOUND)
+
+    def _pulling(self) -> list[ServiceProgress]:
+        """
+        Get the progress of the running pulls of the images of the stack.
+
+        :return: The progress of every image being pulled.
+        """
+        return [progress for progress in map(self._pulls.progress, self._images()) if progress is not None]
+
+    def progress(self) -> Optional[ServiceProgress]:
+        """
+        Get the combined progress of the running pulls of the images of the stack.
+
+        :return: The progress, or None if no image is being pulled.
+        """
+        return self._combine(self._pulling())
+
+    @staticmethod
+    def _combine(progresses: list[ServiceProgress]) -> Optional[ServiceProgress]:
+        """
+        Combine the progress of several pulls.
+
+        :param progresses: The progress of each pull.
+        :return: The combined progress, or None if there are no pulls.
+        """
+        if not progresses:
+            return None
+        return ServiceProgress(
+            bytes_done=sum(progress.bytes_done for progress in progresses),
+            bytes_total=sum(progress.bytes_total for progress in progresses),
+            layers_done=sum(progress.layers_done for progress in progresses),
+            layers_total=sum(progress.layers_total for progress in progresses),
+        )
+
+    def _status(self) -> ServiceStatus:
+        """
+        Get the status of the stack from the state cache.
+
+        :return: The status of the stack.
+        :raises ServiceError: if the status cannot be retrieved.
+        """
+        if self._pulling():
+            return ServiceStatus.UPDATING
+        states = {name: self._state.container_state(self._container_name(name)) for name in self._options.containers}
+        return self._resolve_status(states, self._options.one_shot(), self.is_installed())
+
+    @staticmethod
+    def _resolve_status(states: dict[str, Optional[str]], one_shot: set[str], installed: bool) -> ServiceStatus:
+        """
+        Resolve the status of a stack from the states of its containers.
+
+        The stack is running if all containers that are meant to keep running are running. It is
+        reported as an error if only some of them are, or if any container is dead.
+
+        :param states: The Docker states of the containers, None for containers that do not exist.
+        :param one_shot: The containers expected to exit after doing their work.
+        :param installed: Whether the images of the stack are present.
+        :return: The status of the stack.
+        """
+        if all(state is None for state in states.values()):
+            return ServiceStatus.STOPPED if installed else ServiceStatus.NOT_FOUND
+        if any(state == "dead" for state in states.values()):
+            return ServiceStatus.ERROR
+        statuses = {
+            container_status(state) if state is not None else ServiceStatus.STOPPED
+            for name, state in states.items() if name not in one_shot
+        }
+        if statuses <= {ServiceStatus.RUNNING}:
+            return ServiceStatus.RUNNING
+        if ServiceStatus.RESTARTING in statuses:
+            return ServiceStatus.RESTARTING
+        if len(statuses) == 1:
+            return statuses.pop()
+        return ServiceStatus.ERROR
+
+
+class DockerStack(Provider):
+    """
+    Provider for services made of several Docker containers, sharing the Docker provider's
+    client, state cache and pull manager.
+    """
+    def __init__(self, docker: Docker):
+        """
+        Initialize the stack provider.
+
+        :param docker: The Docker provider to share the daemon connection with.
+        """
+        self.client = docker.client
+        self.state = docker.state
+        self.pulls = docker.pulls
+
+    def create_service(self, slug: str, service_config: ServiceConfig, eigen_config: EigenConfig) -> DockerStackService:
+        """
+        Obtain a stack service by its name.
+
+        :param slug: The slug of the service.
+        :param service_config: Configuration for the stack service.
+        :return: An instance of the stack service.
+        """
+        return DockerStackService(slug, service_config, eigen_config, self.client, self.state, self.pulls)
+
+    def on_change(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Call a function whenever the daemon reports a change of a container or image of any
+        stack. The event stream of the daemon is followed from then on.
+
+        :param callback: The function to call, on the thread following the event stream. It must
+            return quickly.
+        :return: A function to stop calling the callback.
+        """
+        return self.state.add_listener(callback)
+
+    def bulk_status(self, services: list[DockerStackService]) -> StatusSnapshot:
+        """
+        Resolve the state of several stacks at once from the state cache.
+
+        :param services: The services to resolve.
+        :raises ServiceError: if the status cannot be retrieved.
+        :return: A snapshot of the states of the services.
+        """
+        timestamp = time.time()
+        containers, images = self.state.tables()
+        states = {}
+        for service in services:
+            options = service.config.provider.options
+            installed = all(normalize_image(image) in images for image in service._images())
+            progress = service.progress()
+            container_states = {name: containers.get(service._container_name(name)) for name in options.containers}
+            states[service.slug] = ServiceState(
+                status=ServiceStatus.UPDATING if progress is not None else service._resolve_status(container_states, options.one_shot(), installed),
+                installed=installed,
+                busy=service.is_busy(),
+                progress=progress,
+            )
+        return StatusSnapshot(timestamp=timestamp, states=states)
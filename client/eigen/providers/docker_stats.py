@@ -0,0 +1,83 @@
+from eigen.core import MetricsSample
+from typing import Optional
+
+def _network_bytes(stats: dict) -> tuple[int, int]:
+    """
+    Sum the received and sent bytes over all networks of a container.
+
+    :param stats: A sample of the Docker stats stream.
+    :return: The received and sent bytes since the container started.
+    """
+    networks = (stats.get("networks") or {}).values()
+    return sum(network.get("rx_bytes", 0) for network in networks), sum(network.get("tx_bytes", 0) for network in networks)
+
+def _block_bytes(stats: dict) -> tuple[int, int]:
+    """
+    Sum the bytes read from and written to block devices by a container.
+
+    :param stats: A sample of the Docker stats stream.
+    :return: The read and written bytes since the container started.
+    """
+    entries = (stats.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+    read = sum(entry.get("value", 0) for entry in entries if entry.get("op", "").lower() == "read")
+    write = sum(entry.get("value", 0) for entry in entries if entry.get("op", "").lower() == "write")
+    return read, write
+
+def _cpu_percent(stats: dict) -> float:
+    """
+    Compute the CPU usage of a container since the previous sample, the same way `docker stats` does.
+
+    :param stats: A sample of the Docker stats stream.
+    :return: The CPU usage in percent of one core.
+    """
+    cpu, precpu = stats.get("cpu_stats") or {}, stats.get("precpu_stats") or {}
+    cpu_delta = (cpu.get("cpu_usage") or {}).get("total_usage", 0) - (precpu.get("cpu_usage") or {}).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    if cpu_delta <= 0 or system_delta <= 0:
+        return 0.0
+    cpus = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+    return cpu_delta / system_delta * cpus * 100
+
+def _memory_bytes(stats: dict) -> tuple[int, int]:
+    """
+    Get the memory used by a container, excluding the page cache, and its limit.
+
+    :param stats: A sample of the Docker stats stream.
+    :return: The used memory and the memory limit in bytes.
+    """
+    memory = stats.get("memory_stats") or {}
+    details = memory.get("stats") or {}
+    # cgroup v2 reports inactive_file, cgroup v1 total_inactive_file
+    cache = details.get("inactive_file", details.get("total_inactive_file", 0))
+    return max(memory.get("usage", 0) - cache, 0), memory.get("limit", 0)
+
+def stats_sample(stats: dict, timestamp: float, previous: Optional[tuple[dict, float]] = None) -> MetricsSample:
+    """
+    Convert a sample of the Docker stats stream into a metrics sample.
+
+    Network and block I/O are reported as cumulative counters by Docker, so their rates are
+    computed against the previous sample of the same stream.
+
+    :param stats: The sample of the Docker stats stream.
+    :param timestamp: The time at which the sample was received.
+    :param previous: The previous sample of the stream and the time it was received, if any.
+    :return: The metrics sample.
+    """
+    memory_bytes, memory_limit = _memory_bytes(stats)
+    rates = [0.0, 0.0, 0.0, 0.0]
+    if previous is not None and timestamp > previous[1]:
+        elapsed = timestamp - previous[1]
+        current = (*_network_bytes(stats), *_block_bytes(stats))
+        before = (*_network_bytes(previous[0]), *_block_bytes(previous[0]))
+        # counters reset when the container restarts
+        rates = [max(now - then, 0) / elapsed for now, then in zip(current, before)]
+    return MetricsSample(
+        timestamp=timestamp,
+        cpu_percent=_cpu_percent(stats),
+        memory_bytes=memory_bytes,
+        memory_limit=memory_limit,
+        net_rx_rate=rates[0],
+        net_tx_rate=rates[1],
+        block_read_rate=rates[2],
+        block_write_rate=rates[3],
+    )
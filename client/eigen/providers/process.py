@@ -0,0 +1,593 @@
+from eigen.core import Provider, Service, ServiceError, ServiceStatus, ServiceUsage, MetricsSample, LogLine, EigenConfig
+from eigen.models import ServiceConfig, ProcessServiceConfig, RestartPolicy, parse_size
+from .docker import directory_size
+from .docker_logs import LogDecoder
+from collections import deque
+from typing import Iterator, Optional
+import subprocess
+import threading
+import logging
+import signal
+import socket
+import time
+import sys
+import os
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+def process_stat(pid: int) -> Optional[list[str]]:
+    """
+    Read the fields of `/proc/<pid>/stat` following the name of the process.
+
+    :param pid: The ID of the process.
+    :return: The fields, starting with the state of the process, or None if the process does not exist.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as file:
+            stat = file.read()
+    except OSError:
+        return None
+    return stat[stat.rfind(")") + 2:].split()
+
+def process_alive(pid: int, start_time: Optional[str] = None) -> bool:
+    """
+    Check if a process is alive and, if its start time is given, has not been replaced by another
+    process reusing its ID.
+
+    :param pid: The ID of the process.
+    :param start_time: The start time of the process in clock ticks after boot, as recorded when it was started.
+    :return: True if the process is alive, False otherwise.
+    """
+    stat = process_stat(pid)
+    if stat is None:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        # no procfs, the ID alone has to do
+        return True
+    return stat[0] != "Z" and (start_time is None or stat[19] == start_time)
+
+# applies the limits passed as arguments and replaces itself with the command following them
+LIMITS_WRAPPER = """
+import os, resource, sys
+limits, nice, command = sys.argv[1], sys.argv[2], sys.argv[3:]
+for limit in filter(None, limits.split(",")):
+    name, _, value = limit.partition("=")
+    resource.setrlimit(getattr(resource, name), (int(value), int(value)))
+if nice:
+    os.setpriority(os.PRIO_PROCESS, 0, int(nice))
+try:
+    os.execvp(command[0], command)
+except OSError as e:
+    print(f"Failed to run '{command[0]}': {e}", file=sys.stderr)
+    sys.exit(127)
+"""
+
+def limited_command(command: list[str], rlimits: dict[str, int], nice: Optional[int]) -> list[str]:
+    """
+    Wrap a command so that it runs with resource limits applied.
+
+    The limits are applied by a separate interpreter that then executes the command in its place,
+    keeping the process ID, as running Python code in the child between fork and exec is not safe
+    while other threads of Eigen hold locks.
+
+    :param command: The command.
+    :param rlimits: The limits keyed by the name of the rlimit in the `resource` module.
+    :param nice: The scheduling priority, or None to keep the one of Eigen.
+    :return: The wrapped command, or the command itself if there are no limits to apply.
+    """
+    if not rlimits and nice is None:
+        return command
+    limits = ",".join(f"{name}={value}" for name, value in rlimits.items())
+    return [sys.executable, "-I", "-S", "-c", LIMITS_WRAPPER, limits, "" if nice is None else str(nice), *command]
+
+class ProcessService(Service):
+    """
+    Service running as a native process, supervised by Eigen.
+
+    The process runs in its own session, so that signals reach all of its children. Its PID is
+    written to a file, so that it is still tracked after Eigen restarts, but it is only restarted
+    after exiting while Eigen supervises it. Output goes straight to a log file, without passing
+    through Eigen.
+    """
+    PROBE_HOST = "127.0.0.1"
+    PROBE_TIMEOUT = .2
+    LOG_POLL_INTERVAL = .5
+    METRICS_INTERVAL = 1
+    # seconds a process has to stay up for its restarts to no longer count as in a row
+    STABLE_RUN = 60
+
+    def __init__(self, slug: str, config: ServiceConfig, eigen_config: EigenConfig):
+        """
+        Initialize the process service.
+
+        :param config: Configuration for the process service.
+        :param eigen_config: An Eigen configuration, providing the directory for PID and log files.
+        """
+        super().__init__(slug, config, eigen_config, ProcessServiceConfig)
+        run_dir = eigen_config.services.run_dir or eigen_config.services.lock_dir
+        run_dir.mkdir(parents=True, exist_ok=True)
+        self._pid_file = run_dir / f"{slug}.pid"
+        self._log_file = run_dir / f"{slug}.log"
+        self._installed_file = run_dir / f"{slug}.installed"
+
+        # guards the fields below, notified whenever the process is replaced or stopped
+        self._guard = threading.Condition()
+        self._process: Optional[subprocess.Popen] = None
+        self._generation = 0
+        self._restarting = False
+        self._exit_code: Optional[int] = None
+
+    @property
+    def _options(self) -> ProcessServiceConfig:
+        return self._config.provider.options
+
+    def _read_pid(self) -> Optional[int]:
+        """
+        Get the ID of the running process from the PID file, discarding the file if the process is gone.
+
+        :return: The ID of the process, or None if it is not running.
+        """
+        try:
+            pid, _, start_time = self._pid_file.read_text().strip().partition(" ")
+        except OSError:
+            return None
+        if pid.isdigit() and process_alive(int(pid), start_time or None):
+            return int(pid)
+        self._pid_file.unlink(missing_ok=True)
+        return None
+
+    def _write_pid(self, pid: int) -> None:
+        """
+        Record the ID and start time of the process, so that a reused ID is not mistaken for it.
+
+        :param pid: The ID of the process.
+        """
+        stat = process_stat(pid)
+        self._pid_file.write_text(f"{pid} {stat[19]}" if stat is not None else str(pid))
+
+    def _rotate_log(self) -> None:
+        """
+        Move the log file aside if it exceeds the configured size, replacing the previous one.
+        """
+        try:
+            if self._log_file.stat().st_size > parse_size(self._options.log_size):
+                self._log_file.replace(self._log_file.with_name(f"{self._log_file.name}.1"))
+        except FileNotFoundError:
+            pass
+
+    def _environment(self) -> dict[str, str]:
+        """
+        Get the environment of the process.
+
+        :return: The environment of Eigen with the configured variables added.
+        """
+        return {**os.environ, **{name: str(value) for name, value in self._options.environment.items()}}
+
+    def _run(self, command: list[str]) -> None:
+        """
+        Run a command to completion, appending its output to the log file.
+
+        :param command: The command.
+        :raises ServiceError: if the command cannot be run or fails.
+        """
+        try:
+            with open(self._log_file, "ab") as log:
+                result = subprocess.run(command, cwd=self._options.cwd, env=self._environment(),
+                                        stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+        except OSError as e:
+            raise ServiceError(f"Failed to run '{command[0]}' for '{self.slug}': {e}")
+        if result.returncode != 0:
+            raise ServiceError(f"'{command[0]}' failed for '{self.slug}' with code {result.returncode}.")
+
+    def _spawn(self) -> subprocess.Popen:
+        """
+        Start the process with its resource limits applied and its output appended to the log file.
+        Must be called while holding the guard.
+
+        :raises ServiceError: if the process cannot be started.
+        :return: The process.
+        """
+        options = self._options
+        try:
+            with open(self._log_file, "ab") as log:
+                process = subprocess.Popen(
+                    limited_command(options.command, options.limits.rlimits(), options.limits.nice),
+                    cwd=options.cwd,
+                    env=self._environment(),
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True,
+                )
+        except (OSError, subprocess.SubprocessError) as e:
+            raise ServiceError(f"Failed to start process of '{self.slug}': {e}")
+        self._process = process
+        self._write_pid(process.pid)
+        return process
+
+    def _supervise(self, process: subprocess.Popen, generation: int) -> None:
+        """
+        Wait for the process to exit and restart it according to the restart policy, until it is
+        stopped or replaced by another start. Restarts are counted from the last time the process
+        stayed up for `STABLE_RUN` seconds.
+
+        :param process: The process started by the operation.
+        :param generation: The generation of the operation that started the process.
+        """
+        options = self._options
+        restarts = 0
+        while True:
+            started = time.monotonic()
+            exit_code = process.wait()
+            if time.monotonic() - started >= self.STABLE_RUN:
+                restarts = 0
+            with self._guard:
+                if self._generation != generation:
+                    return
+                self._exit_code = exit_code
+                self._process = None
+                self._pid_file.unlink(missing_ok=True)
+                if (options.restart == RestartPolicy.NO
+                        or (options.restart == RestartPolicy.ON_FAILURE and exit_code == 0)
+                        or restarts >= options.max_restarts):
+                    if exit_code != 0:
+                        logging.error(f"Process of '{self.slug}' exited with code {exit_code}, not restarting it.")
+                    return
+                self._restarting = True
+                self._guard.wait_for(lambda: self._generation != generation, options.restart_delay * 2 ** restarts)
+                self._restarting = False
+                if self._generation != generation:
+                    return
+                logging.warning(f"Restarting process of '{self.slug}' after it exited with code {exit_code}.")
+                try:
+                    process = self._spawn()
+                except ServiceError as e:
+                    logging.error(e)
+                    self._exit_code = -1
+                    return
+            restarts += 1
+
+    def _start_process(self) -> None:
+        """
+        Start the process and a thread supervising it, unless it is already running.
+
+        :raises ServiceError: if the process cannot be started.
+        """
+        with self._guard:
+            if self._read_pid() is not None:
+                return
+            self._generation += 1
+            self._guard.notify_all()
+            self._restarting = False
+            self._exit_code = None
+            self._rotate_log()
+            process = self._spawn()
+            threading.Thread(target=self._supervise, args=(process, self._generation), name=f"process-{self.slug}", daemon=True).start()
+
+    def _signal(self, sig: int) -> None:
+        """
+        Send a signal to the process group of the service, if it is running.
+
+        :param sig: The signal.
+        """
+        pid = self._read_pid()
+        if pid is None:
+            return
+        try:
+            os.killpg(pid, sig)
+        except ProcessLookupError:
+            pass
+        except PermissionError as e:
+            raise ServiceError(f"Failed to signal process of '{self.slug}': {e}")
+
+    def _stop_process(self) -> None:
+        """
+        Stop the process, ending its supervision. It receives SIGTERM and, if it is still alive
+        after the stop timeout, SIGKILL.
+
+        :raises ServiceError: if the process cannot be signalled.
+        """
+        with self._guard:
+            self._generation += 1
+            self._guard.notify_all()
+            self._restarting = False
+            self._exit_code = None
+            process = self._process
+            self._process = None
+        pid = self._read_pid()
+        if pid is None:
+            return
+        self._signal(signal.SIGCONT)
+        self._signal(signal.SIGTERM)
+        deadline = time.time() + self._options.stop_timeout
+        while time.time() < deadline:
+            if process is not None:
+                try:
+                    process.wait(timeout=.1)
+                except subprocess.TimeoutExpired:
+                    continue
+            elif process_alive(pid):
+                time.sleep(.1)
+                continue
+            break
+        else:
+            logging.warning(f"Killing process of '{self.slug}' as it did not stop in time.")
+            self._signal(signal.SIGKILL)
+            if process is not None:
+                process.wait()
+        self._pid_file.unlink(missing_ok=True)
+
+    def _ports_open(self) -> bool:
+        """
+        Check if the process accepts connections on all of its ports.
+
+        :return: True if every port accepts connections, False otherwise.
+        """
+        for port in self._options.ports:
+            try:
+                with socket.create_connection((self.PROBE_HOST, port), timeout=self.PROBE_TIMEOUT):
+                    pass
+            except OSError:
+                return False
+        return True
+
+    def _hold_until_ready(self, target: ServiceStatus) -> None:
+        """
+        Keep the service reported as busy until it has reached the target status and, when it is
+        supposed to be running, accepts connections on its ports.
+
+        :param target: The status the service is expected to reach.
+        """
+        def ready() -> bool:
+            if self._status() != target:
+                return False
+            return target != ServiceStatus.RUNNING or self._ports_open()
+
+        self.lock.hold_until(ready, self._options.ready_timeout)
+
+    def _start(self) -> None:
+        """
+        Start the process.
+
+        :raises ServiceError: if the service is not installed or the process cannot be started.
+        """
+        if not self.is_installed():
+            raise ServiceError(f"Service '{self.slug}' is not installed.")
+        self._start_process()
+        self._hold_until_ready(ServiceStatus.RUNNING)
+
+    def _stop(self) -> None:
+        """
+        Stop the process.
+
+        :raises ServiceError: if the process cannot be stopped.
+        """
+        self._stop_process()
+        self._hold_until_ready(ServiceStatus.STOPPED)
+
+    def _restart(self) -> None:
+        """
+        Restart the process.
+
+        :raises ServiceError: if the process cannot be restarted.
+        """
+        self._stop_process()
+        self._start()
+
+    def _pause(self) -> None:
+        """
+        Pause the process and its children with SIGSTOP.
+
+        :raises ServiceError: if the process cannot be paused.
+        """
+        self._signal(signal.SIGSTOP)
+        self._hold_until_ready(ServiceStatus.PAUSED)
+
+    def _unpause(self) -> None:
+        """
+        Resume the process and its children with SIGCONT.
+
+        :raises ServiceError: if the process cannot be unpaused.
+        """
+        self._signal(signal.SIGCONT)
+        self._hold_until_ready(ServiceStatus.RUNNING)
+
+    def is_installed(self) -> bool:
+        """
+        Check if the process service is installed.
+
+        :return: True if the install command has completed, False otherwise.
+        """
+        return self._installed_file.exists()
+
+    def _install(self) -> None:
+        """
+        Install the process service by running its install command, if any.
+
+        :raises ServiceError: if the install command fails.
+        """
+        if self._options.install_command:
+            self._run(self._options.install_command)
+        self._installed_file.touch()
+
+    def _uninstall(self) -> None:
+        """
+        Uninstall the process service by stopping the process and running its uninstall command,
+        if any. The log files are removed.
+
+        :raises ServiceError: if the process cannot be stopped or the uninstall command fails.
+        """
+        self._stop_process()
+        if self._options.uninstall_command:
+            self._run(self._options.uninstall_command)
+        self._installed_file.unlink(missing_ok=True)
+        for log_file in (self._log_file, self._log_file.with_name(f"{self._log_file.name}.1")):
+            log_file.unlink(missing_ok=True)
+        self._hold_until_ready(ServiceStatus.NOT_FOUND)
+
+    def _status(self) -> ServiceStatus:
+        """
+        Get the status of the process from its PID file and procfs.
+
+        :return: The status of the process.
+        """
+        with self._guard:
+            if self._restarting:
+                return ServiceStatus.RESTARTING
+            exit_code = self._exit_code
+        pid = self._read_pid()
+        if pid is not None:
+            stat = process_stat(pid)
+            return ServiceStatus.PAUSED if stat is not None and stat[0] == "T" else ServiceStatus.RUNNING
+        if not self.is_installed():
+            return ServiceStatus.NOT_FOUND
+        return ServiceStatus.ERROR if exit_code not in (None, 0) else ServiceStatus.STOPPED
+
+    def logs(self, tail: Optional[int] = None, follow: bool = False, since: Optional[float] = None,
+             until: Optional[float] = None) -> Iterator[LogLine]:
+        """
+        Stream the output of the process line by line from its log file. The lines carry no
+        timestamps, so `since` and `until` do not filter them.
+
+        :param tail: Only return this many of the most recent lines, or all lines if None.
+        :param follow: Whether to keep streaming new lines as they are written.
+        :param since: Ignored, as the lines carry no timestamps.
+        :param until: Ignored, as the lines carry no timestamps.
+        :return: An iterator over the lines, oldest first.
+        :raises ServiceError: if the log file cannot be read.
+        """
+        try:
+            file = open(self._log_file, "rb")
+        except FileNotFoundError:
+            raise ServiceError(f"Service '{self.slug}' has not written any output yet.")
+        except OSError as e:
+            raise ServiceError(f"Failed to read logs of '{self.slug}': {e}")
+        return self._read_logs(file, tail, follow)
+
+    def _read_logs(self, file, tail: Optional[int], follow: bool) -> Iterator[LogLine]:
+        """
+        Split the log file into lines, keeping only the last `tail` lines in memory.
+
+        :param file: The log file, opened in binary mode.
+        :param tail: Only return this many of the most recent lines, or all lines if None.
+        :param follow: Whether to keep streaming new lines as they are written.
+        :return: An iterator over the lines.
+        """
+        decoder = LogDecoder(timestamps=False)
+        with file:
+            lines = deque(maxlen=tail) if tail is not None else None
+            for chunk in iter(lambda: file.read(64 * 1024), b""):
+                if lines is None:
+                    yield from decoder.feed(chunk)
+                else:
+                    lines.extend(decoder.feed(chunk))
+            if lines is not None:
+                yield from lines
+            while follow:
+                chunk = file.read(64 * 1024)
+                if chunk:
+                    yield from decoder.feed(chunk)
+                    continue
+                try:
+                    if self._log_file.stat().st_ino != os.fstat(file.fileno()).st_ino:
+                        # rotated on a restart, the new file is picked up by the next request
+                        break
+                except FileNotFoundError:
+                    break
+                time.sleep(self.LOG_POLL_INTERVAL)
+        yield from decoder.flush()
+
+class Process(Provider):
+    """
+    Provider for services running as native processes, avoiding the memory and I/O of the Docker
+    daemon, docker-proxy and overlayfs.
+    """
+    def create_service(self, slug: str, service_config: ServiceConfig, eigen_config: EigenConfig) -> ProcessService:
+        """
+        Obtain a process service by its name.
+
+        :param slug: The slug of the service.
+        :param service_config: Configuration for the process service.
+        :return: An instance of the process service.
+        """
+        return ProcessService(slug, service_config, eigen_config)
+
+    def service_usage(self, service: ProcessService) -> ServiceUsage:
+        """
+        Measure the disk usage of a process service: its working directory and log files.
+
+        :param service: The service to measure.
+        :return: The disk usage of the service.
+        """
+        options = service.config.provider.options
+        log_bytes = sum(directory_size(path) for path in (service._log_file, service._log_file.with_name(f"{service._log_file.name}.1")))
+        volume_bytes = directory_size(options.cwd) if options.cwd is not None else 0
+        return ServiceUsage(container_bytes=log_bytes, volume_bytes=volume_bytes, measured_at=time.time())
+
+    @staticmethod
+    def _memory_total() -> int:
+        """
+        Get the memory of the host.
+
+        :return: The memory in bytes.
+        """
+        return os.sysconf("SC_PHYS_PAGES") * PAGE_SIZE
+
+    @staticmethod
+    def _io_bytes(pid: int) -> tuple[int, int]:
+        """
+        Get the bytes a process read from and wrote to block devices.
+
+        :param pid: The ID of the process.
+        :return: The read and written bytes since the process started, 0 if not accessible.
+        """
+        counters = {}
+        try:
+            with open(f"/proc/{pid}/io") as file:
+                for line in file:
+                    name, _, value = line.partition(":")
+                    counters[name] = int(value)
+        except (OSError, ValueError):
+            pass
+        return counters.get("read_bytes", 0), counters.get("write_bytes", 0)
+
+    def stream_metrics(self, service: ProcessService, stopped: threading.Event) -> Optional[Iterator[MetricsSample]]:
+        """
+        Sample the resource usage of a service's main process from procfs once a second. The
+        stream ends when the process exits. Network usage is not available per process.
+
+        :param service: The service to observe.
+        :param stopped: Set when the caller is no longer interested in samples.
+        :return: An iterator over the samples, or None if procfs is not available.
+        """
+        pid = service._read_pid()
+        if pid is None or process_stat(pid) is None:
+            return None
+        memory = service.config.provider.options.limits.memory
+        memory_limit = parse_size(memory) if memory else self._memory_total()
+        return self._sample(pid, memory_limit, stopped)
+
+    def _sample(self, pid: int, memory_limit: int, stopped: threading.Event) -> Iterator[MetricsSample]:
+        previous = None
+        while not stopped.is_set():
+            stat = process_stat(pid)
+            if stat is None or stat[0] == "Z":
+                return
+            timestamp = time.time()
+            cpu_ticks = int(stat[11]) + int(stat[12])
+            io = self._io_bytes(pid)
+            sample = MetricsSample(timestamp=timestamp, memory_bytes=int(stat[21]) * PAGE_SIZE, memory_limit=memory_limit)
+            if previous is not None:
+                elapsed = timestamp - previous[0]
+                if elapsed > 0:
+                    sample.cpu_percent = (cpu_ticks - previous[1]) / CLOCK_TICKS / elapsed * 100
+                    sample.block_read_rate = max(io[0] - previous[2][0], 0) / elapsed
+                    sample.block_write_rate = max(io[1] - previous[2][1], 0) / elapsed
+            yield sample
+            previous = (timestamp, cpu_ticks, io)
+            stopped.wait(ProcessService.METRICS_INTERVAL)
@@ -1 +1 @@
-from .service import get_eigen
+from .service import get_eigen, icon_url
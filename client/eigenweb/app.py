@@ -2,8 +2,9 @@ import streamlit as st
 
 def main():
     dashboard = st.Page("pages/dashboard.py", title="Dashboard", icon="🎈")
+    logs = st.Page("pages/logs.py", title="Logs", icon="📜")
     login = st.Page("pages/login.py", title="Login", icon="🔑")
-    nav = st.navigation([dashboard, login])
+    nav = st.navigation([dashboard, logs, login])
     nav.run()
 
 if __name__ == "__main__":
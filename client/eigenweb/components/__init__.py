@@ -1,3 +1,4 @@
 from .are_you_sure import are_you_sure
 from .spinner import spinner
 from .service import service
+from .logs import service_logs
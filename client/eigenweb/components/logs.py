@@ -0,0 +1,127 @@
+import streamlit as st
+from collections import deque
+from eigen import ServiceError
+
+PAGE_SIZE = 200
+MAX_LINES = 2000
+# seconds the boundary of a page is widened by, as timestamps lose precision on their way to the daemon
+BOUNDARY_MARGIN = .001
+
+def _state(slug):
+    key = f"logs_{slug}"
+    if key not in st.session_state:
+        # at_newest is the number of lines of the log written at the time of the newest line kept
+        st.session_state[key] = {"lines": deque(maxlen=MAX_LINES), "following": True, "at_newest": 0}
+    return st.session_state[key]
+
+def _count(lines, timestamp, reverse=False):
+    """
+    Count the lines in a row at one end of the kept lines that were written at a given time.
+
+    :param lines: The kept lines.
+    :param timestamp: The time.
+    :param reverse: Whether to count from the newest line rather than the oldest.
+    :return: The number of lines in a row written exactly at the timestamp.
+    """
+    count = 0
+    for line in (reversed(lines) if reverse else lines):
+        if line.timestamp != timestamp:
+            break
+        count += 1
+    return count
+
+def load_older(slug, service):
+    """
+    Prepend the page of lines written before the oldest line kept. Lines written at the same time
+    as the oldest line are told apart by how many of them are kept already. Once the cap is
+    reached, the newest lines are dropped and following new lines pauses, so that the page just
+    loaded stays.
+
+    :param slug: The unique identifier for the service.
+    :param service: The service instance to read the logs of.
+    """
+    state = _state(slug)
+    lines = state["lines"]
+    if not lines:
+        lines.extend(service.logs(tail=PAGE_SIZE))
+        newest = lines[-1].timestamp if lines else None
+        if newest is not None:
+            # the page may have cut off earlier lines written at the same time as its newest one
+            state["at_newest"] = sum(1 for line in service.logs(since=newest - BOUNDARY_MARGIN) if line.timestamp == newest)
+        return
+    boundary = lines[0].timestamp
+    if boundary is None:
+        # without timestamps, page by the number of lines from the end
+        page = list(service.logs(tail=len(lines) + PAGE_SIZE))
+        older = page[:max(len(page) - len(lines), 0)]
+    else:
+        # the kept lines the widened request returns again
+        overlap = sum(1 for line in lines if line.timestamp is not None and line.timestamp <= boundary + BOUNDARY_MARGIN)
+        page = [line for line in service.logs(tail=overlap + PAGE_SIZE, until=boundary + BOUNDARY_MARGIN) if line.timestamp is not None and line.timestamp <= boundary]
+        older = page[:max(len(page) - _count(lines, boundary), 0)]
+    if len(lines) + len(older) > MAX_LINES:
+        state["following"] = False
+    lines.extendleft(reversed(older))
+
+def load_newer(slug, service):
+    """
+    Append the lines written after the newest line kept, unless older lines are being browsed.
+    Once the cap is reached, the oldest lines are dropped.
+
+    :param slug: The unique identifier for the service.
+    :param service: The service instance to read the logs of.
+    """
+    state = _state(slug)
+    lines = state["lines"]
+    if not state["following"]:
+        return
+    if not lines:
+        load_older(slug, service)
+        return
+    since = lines[-1].timestamp
+    if since is None:
+        # without timestamps there is no way to tell which lines are new, reload the last page
+        lines.clear()
+        load_older(slug, service)
+        return
+    page = [line for line in service.logs(tail=MAX_LINES, since=since - BOUNDARY_MARGIN) if line.timestamp is not None and line.timestamp >= since]
+    # skip the lines written at the time of the newest line that have been seen already
+    seen = state["at_newest"] or 0
+    lines.extend(line for i, line in enumerate(page) if line.timestamp > since or i >= seen)
+    state["at_newest"] = _count(page, lines[-1].timestamp, reverse=True)
+
+def follow_latest(slug):
+    """
+    Drop the browsed history and follow the newest lines again.
+
+    :param slug: The unique identifier for the service.
+    """
+    state = _state(slug)
+    state["lines"].clear()
+    state["following"] = True
+
+def service_logs(slug, service):
+    """
+    Renders a log viewer for a service. The most recent page is loaded first, older pages only
+    on demand, and at most MAX_LINES lines are kept per session.
+
+    :param slug: The unique identifier for the service.
+    :param service: The service instance to read the logs of.
+    """
+    try:
+        load_newer(slug, service)
+    except ServiceError as e:
+        st.info(str(e))
+        return
+
+    state = _state(slug)
+    lines = state["lines"]
+    col1, col2, col3 = st.columns([1, 1, 3])
+    with col1:
+        st.button("Load older", icon=":material/history:", key=f"older_{slug}", on_click=load_older, args=(slug, service))
+    with col2:
+        st.button("Follow", icon=":material/vertical_align_bottom:", key=f"follow_{slug}", disabled=state["following"], on_click=follow_latest, args=(slug,))
+    with col3:
+        paused = "" if state["following"] else ", new lines paused"
+        st.caption(f"{len(lines)} lines kept, at most {MAX_LINES}{paused}.")
+    st.code("\n".join(line.text for line in lines) or " ", language=None, height=500)
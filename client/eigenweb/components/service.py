@@ -2,35 +2,42 @@ import streamlit as st
 from . import are_you_sure
 from time import sleep
 from eigen import ServiceStatus
+from ..service import icon_url
+import numpy as np
 
-def run_with_lock(service, func):
+def submit(scheduler, service, operation):
     """
-    Decorator to run a service function with a lock to prevent concurrent modifications.
+    Create a callback submitting an operation on a service to the scheduler.
 
-    :param service: The service instance to run the function on.
-    :param func: The function to run on the service.
+    :param scheduler: The operation scheduler.
+    :param service: The service instance to run the operation on.
+    :param operation: The name of the operation.
     """
-    def wrapper(*args, **kwargs):
-        with service.lock:
-            return func(*args, **kwargs)
-    return wrapper
+    def callback():
+        scheduler.submit(service, operation)
+    return callback
 
 def service_card_head(slug, service):
     with st.container():
         left_row, right_row = st.columns([1, 3])
         with left_row:
-            st.image(service.config.info.icon)
+            service_icon(service)
         with right_row:
             st.markdown(f"### {service.config.info.name}")
             st.markdown(service.config.info.description)
 
-def service_controls(slug, service, status, busy):
+def service_icon(service):
+    url = icon_url(service.config.info.icon)
+    if url is not None:
+        st.image(url)
+
+def service_controls(slug, service, status, busy, installed, scheduler):
     col1, col2, col3, col4, _ = st.columns([2, 2, 2, 2, 1])
     corrupted = status in [ServiceStatus.NOT_FOUND, ServiceStatus.UNKNOWN, ServiceStatus.ERROR]
     stopped = status in [ServiceStatus.STOPPED, ServiceStatus.NOT_FOUND]
     alive = status in [ServiceStatus.RUNNING, ServiceStatus.RESTARTING, ServiceStatus.PAUSED]
 
-    if not service.is_installed():
+    if not installed:
         with col4:
             st.button(
                 "",
@@ -38,18 +45,19 @@ def service_controls(slug, service, status, busy):
                 type="tertiary",
                 key=f"install_{slug}",
                 disabled=busy or alive,
-                on_click=run_with_lock(service, service.install),
+                on_click=submit(scheduler, service, "install"),
             )
         return
 
     with col1:
+        paused = status == ServiceStatus.PAUSED
         st.button(
             "",
             icon=":material/play_circle:",
             type="tertiary",
             key=f"start_{slug}",
-            disabled=alive or busy or corrupted,
-            on_click=run_with_lock(service, service.start),
+            disabled=(alive and not paused) or busy or corrupted,
+            on_click=submit(scheduler, service, "unpause" if paused else "start"),
         )
     with col2:
         st.button(
@@ -58,7 +66,7 @@ def service_controls(slug, service, status, busy):
             type="tertiary",
             key=f"restart_{slug}",
             disabled=stopped or status in [ServiceStatus.RESTARTING] or busy or corrupted,
-            on_click=run_with_lock(service, service.restart),
+            on_click=submit(scheduler, service, "restart"),
         )
     with col3:
         st.button(
@@ -67,13 +75,13 @@ def service_controls(slug, service, status, busy):
             type="tertiary",
             key=f"stop_{slug}",
             disabled=stopped or busy or corrupted,
-            on_click=run_with_lock(service, service.stop),
+            on_click=submit(scheduler, service, "stop"),
         )
     with col4:
         def uninstall_service():
             def perform_uninstall():
-                run_with_lock(service, service.uninstall)()
-                st.toast(f"Service `{service.config.info.name}` uninstalled successfully.", icon=":material/check_circle:")
+                scheduler.submit(service, "uninstall")
+                st.toast(f"Uninstalling service `{service.config.info.name}`.", icon=":material/check_circle:")
             are_you_sure(
                 message=f"Are you sure you want to uninstall the service `{service.config.info.name}`?",
                 confirm="Uninstall",
@@ -90,7 +98,56 @@ def service_controls(slug, service, status, busy):
             on_click=uninstall_service,
         )
 
-def service_badge(status, busy, installed):
+def service_progress(progress):
+    layers = f"{progress.layers_done}/{progress.layers_total} layers"
+    size = f"{progress.bytes_done / 1e6:.0f}/{progress.bytes_total / 1e6:.0f} MB" if progress.bytes_total else ""
+    st.progress(progress.fraction, text=f"{layers} {size}".strip())
+
+def human_bytes(value):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(value) < 1000:
+            return f"{value:.0f} {unit}"
+        value /= 1000
+    return f"{value:.1f} TB"
+
+def service_metrics(buffer):
+    """
+    Renders sparklines and current values of the resource usage of a service.
+
+    :param buffer: The metrics buffer of the service.
+    """
+    latest = buffer.latest()
+    cpu, memory, network, block = st.columns(4)
+    with cpu:
+        st.metric("CPU", f"{latest.cpu_percent:.1f} %")
+        st.line_chart(buffer.series("cpu_percent"), height=60)
+    with memory:
+        st.metric("Memory", human_bytes(latest.memory_bytes))
+        st.line_chart(buffer.series("memory_bytes"), height=60)
+    with network:
+        st.metric("Network", f"↓ {human_bytes(latest.net_rx_rate)}/s ↑ {human_bytes(latest.net_tx_rate)}/s")
+        st.line_chart(np.column_stack([buffer.series("net_rx_rate"), buffer.series("net_tx_rate")]), height=60)
+    with block:
+        st.metric("Disk", f"R {human_bytes(latest.block_read_rate)}/s W {human_bytes(latest.block_write_rate)}/s")
+        st.line_chart(np.column_stack([buffer.series("block_read_rate"), buffer.series("block_write_rate")]), height=60)
+
+def service_wake_stats(wake_stats):
+    for stats in wake_stats:
+        st.caption(
+            f"Woken from {stats.action.value} {stats.count}× in {stats.last:.1f}s "
+            f"(mean {stats.mean:.1f}s, p95 {stats.p95:.1f}s, max {stats.max:.1f}s)"
+        )
+
+def service_health(health):
+    if health.healthy is False:
+        st.caption(f"Probe failing: {health.error}")
+    elif health.samples:
+        st.caption(f"Responds in {health.p50 * 1000:.0f} ms (p95 {health.p95 * 1000:.0f} ms, p99 {health.p99 * 1000:.0f} ms)")
+
+def service_badge(status, busy, installed, healthy=None):
+    if status == ServiceStatus.UPDATING:
+        st.badge("Updating", icon=":material/downloading:", color="blue")
+        return
     if busy:
         st.badge("Busy", icon=":material/hourglass_top:", color="grey")
         return
@@ -98,6 +155,8 @@ def service_badge(status, busy, installed):
         st.badge("Not Installed", icon=":material/help:", color="violet")
         return
     match(status):
+        case ServiceStatus.RUNNING if healthy is False:
+            st.badge("Unhealthy", icon=":material/heart_broken:", color="orange")
         case ServiceStatus.RUNNING:
             st.badge("Running", icon=":material/check_circle:", color="green")
         case ServiceStatus.STOPPED:
@@ -117,29 +176,24 @@ def service_badge(status, busy, installed):
         case _:
             st.exception(f"Unknown status: {status}")
 
-@st.fragment(run_every="3s")
-def service(slug, service):
+def service(slug, service, state, scheduler, metrics=None, wake_stats=None, health=None):
     """
-    Renders a service card with its status and control buttons.
+    Renders a service card with its status, control buttons and resource usage.
 
     :param slug: The unique identifier for the service.
     :param service: The service instance to display.
+    :param state: The state of the service, taken from a status snapshot.
+    :param scheduler: The scheduler running operations on the service.
+    :param metrics: The metrics buffer of the service, if metrics are collected.
+    :param wake_stats: The wake-up latencies of the service, if it has an idle policy.
+    :param health: The outcome of the health probes of the service, if it has a health probe.
     """
-    service_status = service.status
-    service_busy = service.is_busy()
-    service_installed = service.is_installed()
-
-    if "callback_queue" not in st.session_state:
-        st.session_state.callback_queue = []
-
-    while st.session_state.callback_queue:
-        st.session_state.callback_queue.pop(0)()
-
+    busy = state.busy or scheduler.is_pending(slug)
     with st.container(border=True):
         with st.container():
             left_row, right_row = st.columns([1, 3])
             with left_row:
-                st.image(service.config.info.icon)
+                service_icon(service)
             with right_row:
                 st.markdown(f"### {service.config.info.name}")
                 st.markdown(service.config.info.description)
@@ -147,6 +201,16 @@ def service(slug, service):
         with st.container():
             col1, col2, col3 = st.columns([3, 5, 2])
             with col1:
-                service_badge(service_status, service_busy, service_installed)
+                service_badge(state.status, busy, state.installed, state.healthy)
+            with col2:
+                if state.progress is not None:
+                    service_progress(state.progress)
+                elif wake_stats:
+                    service_wake_stats(wake_stats)
+                elif health is not None and state.status == ServiceStatus.RUNNING:
+                    service_health(health)
             with col3:
-                service_controls(slug, service, service_status, service_busy)
+                service_controls(slug, service, state.status, busy, state.installed, scheduler)
+
+        if metrics is not None and len(metrics) and state.status == ServiceStatus.RUNNING:
+            service_metrics(metrics)
@@ -1,2 +1,3 @@
 from .dashboard import dashboard
+from .logs import logs
 from .login import login
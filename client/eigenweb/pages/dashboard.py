@@ -5,10 +5,89 @@ from eigen import Eigen
 import time
 
 eigen: Eigen = get_eigen()
+PAGE_SIZE = 20
+
+def reset_paging():
+    """
+    Go back to the first page of services, e.g. after the search changed.
+    """
+    st.session_state.catalog_cursors = [None]
+
+def previous_page():
+    """
+    Go back to the previous page of services.
+    """
+    if len(st.session_state.catalog_cursors) > 1:
+        st.session_state.catalog_cursors.pop()
+
+def next_page(cursor):
+    """
+    Create a callback going on to the next page of services.
+
+    :param cursor: The cursor of the next page.
+    """
+    def callback():
+        st.session_state.catalog_cursors.append(cursor)
+    return callback
+
+def search():
+    """
+    Renders the search field and the category filter, with the number of matching services per category.
+    """
+    if "catalog_cursors" not in st.session_state:
+        reset_paging()
+    query_column, category_column = st.columns([3, 1])
+    with query_column:
+        query = st.text_input("Search", key="catalog_query", placeholder="Search services", label_visibility="collapsed", on_change=reset_paging)
+    facets = eigen.catalog.search(query, limit=1).facets
+    with category_column:
+        st.selectbox(
+            "Category",
+            [None, *facets],
+            key="catalog_category",
+            format_func=lambda label: f"All categories ({sum(facets.values())})" if label is None else f"{label} ({facets[label]})",
+            label_visibility="collapsed",
+            on_change=reset_paging,
+        )
+
+@st.fragment(run_every="3s")
+def services():
+    """
+    Renders the service cards of the current page of the search from a single status snapshot.
+    """
+    if "callback_queue" not in st.session_state:
+        st.session_state.callback_queue = []
+
+    while st.session_state.callback_queue:
+        st.session_state.callback_queue.pop(0)()
+
+    try:
+        page = eigen.catalog.search(st.session_state.catalog_query, st.session_state.catalog_category, PAGE_SIZE, st.session_state.catalog_cursors[-1])
+    except ValueError:
+        reset_paging()
+        page = eigen.catalog.search(st.session_state.catalog_query, st.session_state.catalog_category, PAGE_SIZE)
+    # services may be removed by a configuration reload in the meantime
+    services = {slug: eigen.services[slug] for slug in page.slugs if slug in eigen.services}
+    snapshot = eigen.statuses(list(services))
+    for slug, _service in services.items():
+        buffer = eigen.metrics.buffer(slug) if eigen.metrics is not None else None
+        service(slug, _service, snapshot[slug], eigen.scheduler, buffer, eigen.idle.wake_stats(slug), eigen.prober.health(slug))
+
+    if page.total == 0:
+        st.caption("No services found.")
+        return
+    previous_column, info_column, next_column = st.columns([1, 3, 1])
+    with previous_column:
+        st.button("", icon=":material/chevron_left:", type="tertiary", key="previous_page", disabled=len(st.session_state.catalog_cursors) == 1, on_click=previous_page)
+    with info_column:
+        first = (len(st.session_state.catalog_cursors) - 1) * PAGE_SIZE + 1
+        st.caption(f"{first}–{first + len(page.slugs) - 1} of {page.total} services")
+    with next_column:
+        st.button("", icon=":material/chevron_right:", type="tertiary", key="next_page", disabled=page.cursor is None, on_click=next_page(page.cursor))
 
 def dashboard():
     st.markdown("# Dashboard")
-    for slug, _service in eigen.services.items():
-        service(slug, _service)
+    search()
+    services()
 
 dashboard()
@@ -0,0 +1,25 @@
+import streamlit as st
+from eigenweb.components import service_logs
+from eigenweb import get_eigen
+from eigen import Eigen
+
+eigen: Eigen = get_eigen()
+
+@st.fragment(run_every="2s")
+def follow(slug):
+    """
+    Renders the logs of a service, fetching new lines on every run.
+    """
+    service_logs(slug, eigen.services[slug])
+
+def logs():
+    st.markdown("# Logs")
+    slug = st.selectbox(
+        "Service",
+        list(eigen.services),
+        format_func=lambda slug: eigen.services[slug].config.info.name,
+    )
+    if slug is not None:
+        follow(slug)
+
+logs()
@@ -1,12 +1,57 @@
 from eigen import Eigen
+from eigen.core import AssetStore, AssetServer
 from pathlib import Path
+from typing import Optional
 import streamlit as st
+import logging
 
 DEFAULT_CONFIG_PATH = Path(__file__).parent.parent / "eigen/config.toml"
 
 @st.cache_resource
 def get_eigen():
     """
-    Create and return an instance of the Eigen class with the default configuration path.
+    Create and return an instance of the Eigen class with the default configuration path, managing
+    services in the background for as long as the web interface runs.
     """
-    return Eigen(DEFAULT_CONFIG_PATH)
+    eigen = Eigen(DEFAULT_CONFIG_PATH)
+    eigen.serve()
+    return eigen
+
+@st.cache_resource
+def get_asset_server() -> Optional[AssetServer]:
+    """
+    Start serving the asset store of Eigen, once for all sessions.
+
+    :return: The asset server, or None if it cannot listen on its port.
+    """
+    eigen = get_eigen()
+    server = AssetServer(eigen.assets, eigen.config.assets.host, eigen.config.assets.port)
+    try:
+        server.start()
+    except OSError as e:
+        logging.error(f"Cannot serve assets on port {eigen.config.assets.port}: {e}")
+        return None
+    return server
+
+def icon_url(icon: str) -> Optional[str]:
+    """
+    Get the URL or path to display an icon from. Icons in the asset store are displayed as
+    thumbnails. With a `base-url` configured, browsers load them from the asset server, which they
+    cache indefinitely; otherwise the web interface sends them itself, under its own origin and
+    scheme, so that they also load when it is reached over HTTPS.
+
+    :param icon: The icon of a service, an asset reference or a URL.
+    :return: The URL or local path of the icon, or None if it cannot be displayed.
+    """
+    if not AssetStore.is_reference(icon):
+        return icon
+    eigen = get_eigen()
+    try:
+        name = eigen.assets.thumbnail(icon)
+    except (ValueError, FileNotFoundError) as e:
+        logging.warning(f"Cannot display icon: {e}")
+        return None
+    base_url = eigen.config.assets.base_url
+    if base_url is None or get_asset_server() is None:
+        return str(eigen.assets.directory / name)
+    return f"{base_url.rstrip('/')}/{name}"
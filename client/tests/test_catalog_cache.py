@@ -0,0 +1,73 @@
+from eigen.core.config import ServiceConfig, CatalogCache
+from pathlib import Path
+import shutil
+import json
+import os
+
+SERVICES = Path(__file__).parent.parent / "services"
+
+def compile_config(filepath: Path) -> ServiceConfig:
+    return ServiceConfig.load(filepath)
+
+def test_bundled_service_survives_the_snapshot(tmp_path):
+    # nextcloud.toml holds inline tables, which the TOML parser returns as unpicklable local classes
+    filepath = tmp_path / "nextcloud.toml"
+    shutil.copy(SERVICES / "nextcloud.toml", filepath)
+    cache = CatalogCache(tmp_path / "catalog.cache")
+    cache.load()
+    compiled = cache.get(filepath, compile_config)
+    cache.save()
+    assert cache.misses == 1
+
+    restored_cache = CatalogCache(tmp_path / "catalog.cache")
+    restored_cache.load()
+    restored = restored_cache.get(filepath, compile_config)
+    assert restored_cache.hits == 1 and restored_cache.misses == 0
+    assert restored.model_dump(mode="json") == compiled.model_dump(mode="json")
+    assert restored.provider.options["ports"] == {"80/tcp": 8080, "443/tcp": 8443}
+
+def test_changed_file_is_compiled_again(tmp_path):
+    filepath = tmp_path / "nextcloud.toml"
+    shutil.copy(SERVICES / "nextcloud.toml", filepath)
+    cache = CatalogCache(tmp_path / "catalog.cache")
+    cache.get(filepath, compile_config)
+    filepath.write_text(filepath.read_text().replace('name = "Nextcloud"', 'name = "Cloud"'))
+    assert cache.get(filepath, compile_config).info.name == "Cloud"
+    assert cache.misses == 2
+
+def test_snapshot_writable_by_others_is_ignored(tmp_path):
+    filepath = tmp_path / "nextcloud.toml"
+    shutil.copy(SERVICES / "nextcloud.toml", filepath)
+    cache = CatalogCache(tmp_path / "catalog.cache")
+    cache.get(filepath, compile_config)
+    cache.save()
+    os.chmod(cache.path, 0o666)
+
+    restored_cache = CatalogCache(cache.path)
+    restored_cache.load()
+    restored_cache.get(filepath, compile_config)
+    assert restored_cache.misses == 1
+
+def test_snapshot_is_plain_json(tmp_path):
+    filepath = tmp_path / "nextcloud.toml"
+    shutil.copy(SERVICES / "nextcloud.toml", filepath)
+    cache = CatalogCache(tmp_path / "catalog.cache")
+    cache.get(filepath, compile_config)
+    cache.save()
+    snapshot = json.loads(cache.path.read_text())
+    assert snapshot["entries"][str(filepath.resolve())]["config"]["info"]["name"] == "Nextcloud"
+
+def test_corrupt_snapshot_is_replaced(tmp_path):
+    filepath = tmp_path / "nextcloud.toml"
+    shutil.copy(SERVICES / "nextcloud.toml", filepath)
+    path = tmp_path / "catalog.cache"
+    path.write_bytes(b"\x80\x05 not json")
+    os.chmod(path, 0o600)
+    cache = CatalogCache(path)
+    cache.load()
+    cache.get(filepath, compile_config)
+    cache.save()
+    restored_cache = CatalogCache(path)
+    restored_cache.load()
+    restored_cache.get(filepath, compile_config)
+    assert restored_cache.hits == 1
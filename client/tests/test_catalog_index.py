@@ -0,0 +1,59 @@
+from eigen.core import CatalogIndex, ServiceConfig
+from pathlib import Path
+import pytest
+import toml
+
+SERVICES = Path(__file__).parent.parent / "services"
+
+@pytest.fixture(scope="module")
+def template() -> dict:
+    return toml.loads((SERVICES / "nextcloud.toml").read_text())
+
+def make_config(template: dict, name: str, description: str = "", categories: tuple[str, ...] = ()) -> ServiceConfig:
+    info = {**template["info"], "name": name, "description": description, "categories": list(categories)}
+    return ServiceConfig(SERVICES / "nextcloud.toml", {**template, "info": info})
+
+def all_pages(index: CatalogIndex, **kwargs) -> list[list[str]]:
+    pages, cursor = [], None
+    while True:
+        page = index.search(cursor=cursor, **kwargs)
+        pages.append(page.slugs)
+        if page.cursor is None:
+            return pages
+        cursor = page.cursor
+
+def test_pages_cover_every_result_once(template):
+    index = CatalogIndex({f"app-{i:02}": make_config(template, f"App {i:02}") for i in range(7)})
+    pages = all_pages(index, limit=3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [slug for page in pages for slug in page] == [f"app-{i:02}" for i in range(7)]
+
+def test_cursor_survives_changes_before_it(template):
+    index = CatalogIndex({f"app-{i}": make_config(template, f"App {i}") for i in range(6)})
+    first = index.search(limit=3)
+    assert first.slugs == ["app-0", "app-1", "app-2"]
+    # removing or adding services sorting before the cursor neither repeats nor skips any
+    index.remove("app-1")
+    index.add("app-00", make_config(template, "App 00"))
+    second = index.search(limit=3, cursor=first.cursor)
+    assert second.slugs == ["app-3", "app-4", "app-5"]
+    assert second.cursor is None
+
+def test_cursor_orders_by_relevance_then_name(template):
+    index = CatalogIndex({
+        "files": make_config(template, "Files", "Share files", ("Storage",)),
+        "photos": make_config(template, "Photos", "Store photos as files", ("Media",)),
+        "archive": make_config(template, "Archive", "Keep files", ("Storage",)),
+    })
+    # a match in the name weighs more than one in the description
+    assert [slug for page in all_pages(index, query="files", limit=1) for slug in page] == ["files", "archive", "photos"]
+    page = index.search(query="files", category="storage", limit=1)
+    assert page.slugs == ["files"] and page.total == 2
+    assert page.facets == {"Storage": 2, "Media": 1}
+    assert index.search(query="files", category="storage", cursor=page.cursor).slugs == ["archive"]
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "WzEsMl0"])
+def test_invalid_cursor(template, cursor):
+    index = CatalogIndex({"app": make_config(template, "App")})
+    with pytest.raises(ValueError):
+        index.search(cursor=cursor)
@@ -0,0 +1,85 @@
+from eigen.core.service import OperationJournal, OPERATION_MERGES
+from eigen.models import ServiceStatus
+import pytest
+
+def operations(journal: OperationJournal) -> list[tuple[str, list[str]]]:
+    return [(pending.operation, pending.requesters) for pending in journal]
+
+def test_repeated_operations_merge_into_one():
+    journal = OperationJournal()
+    first = journal.record("restart", "a")
+    assert journal.record("restart", "b") is first
+    assert journal.record("start", "c") is first
+    assert operations(journal) == [("restart", ["a", "b", "c"])]
+    assert first.skip_if is None
+
+@pytest.mark.parametrize(("first", "second"), sorted(OPERATION_MERGES))
+def test_merge_table(first, second):
+    journal = OperationJournal()
+    journal.record(first, "a")
+    pending = journal.record(second, "b")
+    assert len(journal) == 1
+    assert (pending.operation, pending.skip_if) == OPERATION_MERGES[(first, second)]
+    assert pending.requesters == ["a", "b"]
+
+def test_start_then_stop_cancels_out_on_a_stopped_service():
+    journal = OperationJournal()
+    journal.record("start", "a")
+    pending = journal.record("stop", "b")
+    assert (pending.operation, pending.skip_if) == ("stop", ServiceStatus.STOPPED)
+    # repeating the last request keeps the cancellation
+    assert journal.record("stop", "c") is pending
+    assert pending.skip_if == ServiceStatus.STOPPED
+
+def test_unrelated_operations_queue_in_order():
+    journal = OperationJournal()
+    journal.record("start", "a")
+    journal.record("pause", "b")
+    journal.record("update", "c")
+    assert operations(journal) == [("start", ["a"]), ("pause", ["b"]), ("update", ["c"])]
+    assert journal.pop().operation == "start"
+    assert operations(journal) == [("pause", ["b"]), ("update", ["c"])]
+
+def test_only_the_last_pending_operation_merges():
+    journal = OperationJournal()
+    journal.record("restart", "a")
+    journal.record("update", "b")
+    journal.record("restart", "c")
+    assert operations(journal) == [("restart", ["a"]), ("update", ["b"]), ("restart", ["c"])]
+
+def test_withdraw_merges_the_remaining_requests_anew():
+    journal = OperationJournal()
+    journal.record("start", "a")
+    journal.record("stop", "b")
+    journal.record("start", "c")
+    assert operations(journal) == [("restart", ["a", "b", "c"])]
+    # without the stop, start and start merge into a plain start
+    assert journal.withdraw("b")
+    assert operations(journal) == [("start", ["a", "c"])]
+    assert next(iter(journal)).skip_if is None
+
+def test_withdraw_splits_requests_that_no_longer_merge():
+    journal = OperationJournal()
+    journal.record("pause", "a")
+    journal.record("unpause", "b")
+    journal.record("pause", "c")
+    assert operations(journal) == [("pause", ["a", "b", "c"])]
+    journal.record("update", "d")
+    assert journal.withdraw("a")
+    assert operations(journal) == [("pause", ["b", "c"]), ("update", ["d"])]
+    assert next(iter(journal)).skip_if == ServiceStatus.PAUSED
+
+def test_withdraw_unknown_requester():
+    journal = OperationJournal()
+    journal.record("start", "a")
+    assert not journal.withdraw("b")
+    assert journal.withdraw("a")
+    assert len(journal) == 0 and journal.pop() is None
+
+def test_clear_returns_every_requester():
+    journal = OperationJournal()
+    journal.record("start", "a")
+    journal.record("restart", "b")
+    journal.record("update", "c")
+    assert journal.clear() == ["a", "b", "c"]
+    assert len(journal) == 0
@@ -0,0 +1,44 @@
+from eigen.core import StorageManager
+from eigen.models import EigenStorage, ServiceUsage
+from types import SimpleNamespace
+
+class FakeProvider:
+    def __init__(self, sizes: dict[str, int]):
+        self.sizes = sizes
+        self.prunes = 0
+
+    def service_usage(self, service):
+        return ServiceUsage(volume_bytes=self.sizes[service.slug], measured_at=0)
+
+    def prune(self, policy, services):
+        self.prunes += 1
+        return 0
+
+def make_manager(sizes: dict[str, int], quotas: dict[str, str] = {}, **policy) -> tuple[StorageManager, FakeProvider, list[str]]:
+    services = {slug: SimpleNamespace(slug=slug, config=SimpleNamespace(quota=quotas.get(slug))) for slug in sizes}
+    provider = FakeProvider(sizes)
+    reported = []
+    manager = StorageManager(services, lambda _: provider, EigenStorage(**policy), lambda service, _: reported.append(service.slug))
+    for service in services.values():
+        manager.measure(service)
+    return manager, provider, reported
+
+def test_largest_services_exceed_the_global_quota():
+    manager, _, _ = make_manager({"a": 500, "b": 300, "c": 200, "d": 100}, **{"global-quota": "500"})
+    # without a and b, the others fit
+    assert set(manager.over_quota()) == {"a", "b"}
+
+def test_services_over_their_own_quota_count_towards_the_global_quota():
+    manager, _, _ = make_manager({"a": 500, "b": 300, "c": 200}, {"c": "100"}, **{"global-quota": "600"})
+    assert set(manager.over_quota()) == {"a", "c"}
+
+def test_within_the_global_quota():
+    manager, _, _ = make_manager({"a": 500, "b": 100}, **{"global-quota": "600"})
+    assert manager.over_quota() == {}
+
+def test_enforce_reports_and_prunes_once():
+    manager, provider, reported = make_manager({"a": 500, "b": 300}, **{"global-quota": "600"})
+    manager.enforce()
+    manager.enforce()
+    assert reported == ["a", "a"]
+    assert provider.prunes == 1